@@ -0,0 +1,238 @@
+# analytics.py
+
+"""
+Store-wide margin analytics: distributions of margin, profit and
+shipping-adjusted profit, overall and per garment type, the lowest-margin
+variants and how exposed the catalog is to cost increases.
+
+The numbers are kept as typed columns (array.array of cents and basis
+points), one set per product, built when the product is synced or written,
+so a catalog update only touches the products it changed. A report joins the
+columns of the selected shops per garment type, sorts them once (the overall
+columns merge the sorted per-type runs) and answers every percentile,
+histogram bin and cost scenario by index or bisection; reports are cached
+until the next change. Only enabled variants with a price count, since the
+others are never sold.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+# Margin histogram bucket edges, percent
+MARGIN_BINS = (0, 10, 20, 30, 40, 50, 60)
+# Cost increases (percent) the exposure section is computed for
+COST_SCENARIOS = (5, 10, 20)
+# Variants under this margin (percent) after a cost increase count as exposed
+MIN_MARGIN = float(os.environ.get("PRINTIFY_MIN_MARGIN", "20"))
+LOWEST = 25
+# Most lowest-margin variants a report can list (each product keeps this many candidates)
+MAX_LOWEST = 100
+PERCENTILES = (("p10", 10), ("p25", 25), ("median", 50), ("p75", 75), ("p90", 90))
+
+class ProductColumns:
+    """Enabled, priced variants of one product as columns; `lowest` holds their positions by margin, lowest first."""
+    __slots__ = ("product", "garment_type", "index", "price", "cost", "profit", "margin", "shipping", "shipped",
+                 "lowest")
+
+    def __init__(self, product, shipping=None):
+        self.product = product
+        self.garment_type = product.garment_type or "Unknown"
+        self.index = array("l")
+        self.price = array("l")
+        self.cost = array("l")
+        for i, v in enumerate(product.variants):
+            if v.is_enabled and v.price > 0:
+                self.index.append(i)
+                self.price.append(v.price)
+                self.cost.append(v.cost)
+        self.profit = array("l", [p - c for p, c in zip(self.price, self.cost)])
+        # basis points, floored, so 3999 is 39.99%
+        self.margin = array("l", [x * 10000 // p for x, p in zip(self.profit, self.price)])
+        self.shipping = shipping
+        self.shipped = None
+        self.lowest = sorted(range(len(self.margin)), key=self.margin.__getitem__)[:MAX_LOWEST]
+
+    def shipped_profit(self):
+        if self.shipped is None:
+            self.shipped = array("l", [x - self.shipping for x in self.profit])
+        return self.shipped
+
+def _distribution(values, scale=1):
+    """min, percentiles, max and mean of a sorted column; `scale` divides every figure (100 for basis points -> percent)."""
+    if not values:
+        return None
+    n = len(values)
+    out = {"min": values[0] / scale}
+    for name, pct in PERCENTILES:
+        out[name] = values[min(n - 1, n * pct // 100)] / scale
+    out["max"] = values[-1] / scale
+    out["mean"] = round(sum(values) / n / scale, 2)
+    return out
+
+def _histogram(margins):
+    """Variant counts per margin bucket of a sorted basis-point column."""
+    edges = [bisect_left(margins, pct * 100) for pct in MARGIN_BINS]
+    rows = [{"to": MARGIN_BINS[0], "variants": edges[0]}]
+    for i, pct in enumerate(MARGIN_BINS):
+        end = edges[i + 1] if i + 1 < len(edges) else len(margins)
+        rows.append({"from": pct, "to": MARGIN_BINS[i + 1] if i + 1 < len(MARGIN_BINS) else None,
+                     "variants": end - edges[i]})
+    return rows
+
+def _exposure(margins, total_cost):
+    """
+    Per COST_SCENARIOS increase: variants that would sell below cost or under
+    MIN_MARGIN at today's prices, and the profit lost across one sale of each.
+    A margin m becomes 1 - (1 - m)(1 + p), so each answer is one bisection.
+    """
+    rows = []
+    for pct in COST_SCENARIOS:
+        grow = 1 + pct / 100
+        below_cost = bisect_left(margins, (1 - 1 / grow) * 10000)
+        thin = bisect_left(margins, (1 - (1 - MIN_MARGIN / 100) / grow) * 10000)
+        rows.append({"increase": pct, "below_cost": below_cost, "below_min_margin": thin,
+                     "profit_change": -round(total_cost * pct / 100)})
+    return rows
+
+class Columns:
+    """The sorted margin, profit and shipping-adjusted profit columns of a group of products."""
+    __slots__ = ("products", "margin", "profit", "shipped", "total_cost")
+
+    def __init__(self, pieces):
+        margin, profit, shipped = array("l"), array("l"), array("l")
+        self.total_cost = 0
+        for c in pieces:
+            margin.extend(c.margin)
+            profit.extend(c.profit)
+            self.total_cost += sum(c.cost)
+            if c.shipping is not None:
+                shipped.extend(c.shipped_profit())
+        self.products = len(pieces)
+        self.margin, self.profit, self.shipped = sorted(margin), sorted(profit), sorted(shipped)
+
+    @classmethod
+    def merge(cls, groups):
+        """Columns of several groups at once; sorting their sorted runs back to back is close to linear."""
+        merged = cls(())
+        merged.products = sum(g.products for g in groups)
+        merged.total_cost = sum(g.total_cost for g in groups)
+        merged.margin = sorted(itertools.chain.from_iterable(g.margin for g in groups))
+        merged.profit = sorted(itertools.chain.from_iterable(g.profit for g in groups))
+        merged.shipped = sorted(itertools.chain.from_iterable(g.shipped for g in groups))
+        return merged
+
+    def stats(self):
+        return {
+            "products": self.products,
+            "variants": len(self.margin),
+            "shipping_known_variants": len(self.shipped),
+            "margin": _distribution(self.margin, 100),
+            "profit": _distribution(self.profit),
+            "shipping_adjusted_profit": _distribution(self.shipped),
+            "margin_histogram": _histogram(self.margin),
+            "cost_exposure": _exposure(self.margin, self.total_cost),
+        }
+
+def _lowest_rows(pieces, limit):
+    """
+    The `limit` lowest-margin variants. With at least `limit` priced products,
+    the limit-th lowest product minimum bounds the answer, so only variants at
+    or under it are looked into; with fewer, every variant is a candidate.
+    """
+    priced = [c for c in pieces if c.lowest]
+    if not priced or limit <= 0:
+        return []
+    bound = None
+    if len(priced) >= limit:
+        bound = heapq.nsmallest(limit, (c.margin[c.lowest[0]] for c in priced))[-1]
+    candidates = []
+    for n, c in enumerate(priced):
+        for i in c.lowest:
+            if bound is not None and c.margin[i] > bound:
+                break
+            candidates.append((c.margin[i], n, i, c))
+    rows = []
+    for margin, _, i, c in heapq.nsmallest(limit, candidates, key=lambda t: t[:3]):
+        p = c.product
+        v = p.variants[c.index[i]]
+        rows.append({
+            "shop_id": p.shop_id, "product_id": p.id, "title": p.title, "garment_type": c.garment_type,
+            "variant_id": v.id, "size": p.size_title(v), "color": p.color_title(v),
+            "price": c.price[i], "cost": c.cost[i], "profit": c.profit[i], "margin": margin / 100,
+            "shipping_adjusted_profit": None if c.shipping is None else c.profit[i] - c.shipping,
+        })
+    return rows
+
+class MarginAnalytics:
+    """Per-product columns of every cached shop, kept in step with catalog changes; safe to share between threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shops = {}      # shop_id -> {product_id: ProductColumns}
+        self.revision = 0
+        self.reports = {}    # (shops, garment type, lowest) -> report, for the current revision
+
+    def _changed(self):
+        self.revision += 1
+        self.reports = {}
+
+    def update_shop(self, shop_id, products, shipping_for=None):
+        """Replace a shop's columns after a full catalog load."""
+        columns = {str(p.id): ProductColumns(p, shipping_for(p) if shipping_for else p.shipping_cost) for p in products}
+        with self.lock:
+            self.shops[str(shop_id)] = columns
+            self._changed()
+
+    def update_product(self, product, shipping_for=None):
+        """Rebuild one product's columns after its prices (or anything else) changed."""
+        shipping = shipping_for(product) if shipping_for else product.shipping_cost
+        columns = ProductColumns(product, shipping)
+        with self.lock:
+            self.shops.setdefault(str(product.shop_id), {})[str(product.id)] = columns
+            self._changed()
+
+    def set_shipping(self, product, cost):
+        """Record a product's shipping cost once it is known; a no-op when it already is."""
+        with self.lock:
+            columns = self.shops.get(str(product.shop_id), {}).get(str(product.id))
+            if columns is None or columns.shipping == cost or cost is None:
+                return
+            columns.shipping = cost
+            columns.shipped = None
+            self._changed()
+
+    def report(self, shop_ids, garment_type=None, lowest=LOWEST):
+        """The analytics of these shops (optionally one garment type), computed once per catalog change."""
+        key = (tuple(str(s) for s in shop_ids), garment_type or None, lowest)
+        with self.lock:
+            cached = self.reports.get(key)
+            if cached is not None:
+                return cached
+            revision = self.revision
+            pieces = [c for s in key[0] for c in self.shops.get(s, {}).values()]
+        started = time.perf_counter()
+        if garment_type:
+            pieces = [c for c in pieces if c.garment_type == garment_type]
+        by_type = {}
+        for c in pieces:
+            by_type.setdefault(c.garment_type, []).append(c)
+        groups = {name: Columns(group) for name, group in sorted(by_type.items())}
+        report = {
+            "overall": Columns.merge(list(groups.values())).stats(),
+            "garment_types": {name: columns.stats() for name, columns in groups.items()},
+            "lowest_margin": _lowest_rows(pieces, lowest),
+            "settings": {"min_margin": MIN_MARGIN, "cost_scenarios": list(COST_SCENARIOS),
+                         "margin_bins": list(MARGIN_BINS)},
+            "computed_at": time.time(),
+            "compute_ms": None,
+        }
+        report["compute_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        with self.lock:
+            if self.revision == revision:
+                self.reports[key] = report
+        return report
@@ -1,27 +1,129 @@
 # app.py
 
+import csv
+import hashlib
+import hmac
+import io
+import itertools
+import json
 import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
 import requests
-from flask import Flask, render_template_string, request, redirect, url_for, flash, get_flashed_messages, jsonify
+from flask import Flask, Response, g, render_template_string, stream_template_string, request, redirect, url_for, flash, get_flashed_messages, jsonify, send_file
 from dotenv import load_dotenv
+from markupsafe import Markup, escape
+
+from analytics import LOWEST, MAX_LOWEST, MarginAnalytics
+from assets import ASSET_MAX_AGE, AssetRegistry
+from blueprints import fetch_blueprint, fetch_blueprints, load_index, store_index
+from cache import MISSING, open_shared_cache
+from compression import choose_encoding, compress, should_compress
+from costs import drift_report, history_for
+from journal import Journal, list_journals
+from models import Product
+from preflight import PreflightError, check_update, product_variants
+from pipeline import CircuitBreaker, CircuitOpenError, ShopBudgets, SingleFlight, parallel_map
+from pricesheet import FORMATS, SheetError, describe_changes, diff_sheet, iter_csv, read_rows, write_parquet
+from pricing import MODES, compute_prices, preview_product, to_cents
+import profiling
+from rules import RuleError, RuleStore
+from snapshots import Snapshot, list_snapshots
+from thumbnails import IMAGE_HOSTS, THUMB_MAX_AGE, ThumbnailCache, allowed_image_url
+from warmup import Warmup
 
 load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "not-so-secret")
+# Dashboard CSS/JS, served fingerprinted from /assets/ (see assets.py)
+assets = AssetRegistry()
+# Card-sized mockups, downloaded once (see thumbnails.py)
+thumbnails = ThumbnailCache()
 API_KEY = os.environ.get("PRINTIFY_API_KEY")
+# Point at a local stand-in (e.g. mock_printify.py) for offline runs
+API_BASE = os.environ.get("PRINTIFY_API_BASE", "https://api.printify.com/v1").rstrip("/")
 
 shipping_cache = {}
+# Last loaded catalog per shop: {shop_id: {product_id: Product}}
+catalog_cache = {}
+# Seconds before a Printify call is given up (connect and read each)
+REQUEST_TIMEOUT = float(os.environ.get("PRINTIFY_TIMEOUT", "20"))
+# Every Printify call from this process (sync and async app) goes through one breaker
+printify_breaker = CircuitBreaker()
+# Cross-worker cache (PRINTIFY_CACHE_DB, see cache.py); None keeps everything in-process
+shared_cache = open_shared_cache()
+# (generation, seq) of the shared catalog rows each shop's catalog_cache reflects
+catalog_versions = {}
+# Margin/profit columns of every cached product, updated with catalog_cache (see analytics.py)
+margin_analytics = MarginAnalytics()
+# When each shop's cached catalog was last fully loaded from Printify (epoch seconds)
+catalog_loaded_at = {}
+# Without the shared cache: bumped on every change to a shop's cached catalog (see catalog_version)
+catalog_revisions = {}
+_revision_counter = itertools.count(1)
+PROCESS_TOKEN = uuid.uuid4().hex
+# The dashboard serves a cached catalog up to this old as is; older ones are refreshed in the background
+CATALOG_FRESH_SECONDS = float(os.environ.get("PRINTIFY_CATALOG_FRESH_SECONDS", "60"))
+
+def api_request(method, url, **kwargs):
+    """
+    requests.request() with REQUEST_TIMEOUT, behind the circuit breaker: network
+    errors, timeouts and 5xx responses count as failures, anything else as success.
+    Raises CircuitOpenError without calling Printify while the circuit is open.
+    """
+    printify_breaker.before_call()
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    try:
+        resp = requests.request(method, url, **kwargs)
+    except Exception as e:
+        printify_breaker.record_failure(e)
+        raise
+    if resp.status_code >= 500:
+        printify_breaker.record_failure(f"HTTP {resp.status_code} from {url.split('?')[0]}")
+    else:
+        printify_breaker.record_success()
+    return resp
 
-def get_blueprint_map():
-    resp = requests.get(
-        "https://api.printify.com/v1/catalog/blueprints.json",
-        headers={"Authorization": f"Bearer {API_KEY}"}
-    )
-    resp.raise_for_status()
-    data = resp.json()
-    return {bp['id']: bp['title'] for bp in data}
+def get_blueprint_index():
+    """Searchable blueprint catalog, loaded once per process from the shared cache or Printify (see blueprints.py)."""
+    global BLUEPRINT_INDEX
+    if BLUEPRINT_INDEX is None:
+        BLUEPRINT_INDEX = load_index(lambda: fetch_blueprints(API_BASE, API_KEY, api_request), shared_cache)
+    return BLUEPRINT_INDEX
 
+def get_blueprint_map():
+    return get_blueprint_index().titles()
+
+def find_blueprint(blueprint_id):
+    """One blueprint by id; one missing from the index is fetched on its own, never the whole catalog."""
+    global BLUEPRINT_INDEX
+    index = get_blueprint_index()
+    blueprint = index.get(blueprint_id)
+    if blueprint is None:
+        blueprint = fetch_blueprint(API_BASE, API_KEY, blueprint_id, api_request)
+        if blueprint is not None:
+            BLUEPRINT_INDEX = index.with_blueprint(blueprint)
+            store_index(shared_cache, BLUEPRINT_INDEX)
+    return blueprint
+
+BLUEPRINT_INDEX = None
 BLUEPRINT_MAP = None
+SHOPS = None
+# Per-shop request budgets (see pipeline.py)
+shop_budgets = ShopBudgets()
+_SHOP_DONE = object()
+# Concurrent loads of the same shop catalog / product detail / shipping rate share one fetch (see pipeline.py)
+catalog_flight = SingleFlight()
+detail_flight = SingleFlight()
+shipping_flight = SingleFlight()
+# Concurrent product writes for price sheet imports (each shop's budget still applies)
+SHEET_WORKERS = int(os.environ.get("PRINTIFY_SHEET_WORKERS", "8"))
+# Named pricing rule sets (see rules.py)
+rule_store = RuleStore()
 
 # ---------- Option helpers (ID-based, robust) ----------
 
@@ -129,211 +231,798 @@ def get_large_variant(variants, product_options):
 
 # ---------- Core API helpers ----------
 
-def get_shop_and_products():
+def get_shops():
+    """Every shop on the account (cached for the process and in the shared cache, like BLUEPRINT_MAP)."""
+    global SHOPS
+    if SHOPS is None:
+        shops = shared_cache.get("shops") if shared_cache is not None else MISSING
+        if shops is MISSING:
+            shops = api_request("GET",
+                f"{API_BASE}/shops.json",
+                headers={"Authorization": f"Bearer {API_KEY}"}
+            ).json()
+            if not shops or not isinstance(shops, list) or not shops[0].get("id"):
+                raise Exception(f"No shops found in your account. Response: {shops}")
+            if shared_cache is not None:
+                shared_cache.set("shops", shops)
+        SHOPS = shops
+        shop_budgets.set_shop_count(len(shops))
+    return SHOPS
+
+def get_shop_id():
+    return get_shops()[0]["id"]
+
+def resolve_shop_ids(selection=None):
+    """"all" -> every shop; a shop id -> that shop; nothing -> the first shop."""
+    shops = get_shops()
+    if selection == "all":
+        return [s["id"] for s in shops]
+    if selection:
+        for s in shops:
+            if str(s["id"]) == str(selection):
+                return [s["id"]]
+        raise Exception(f"Shop {selection} not found in your account.")
+    return [shops[0]["id"]]
+
+def shop_titles():
+    return {str(s["id"]): s.get("title") or str(s["id"]) for s in get_shops()}
+
+def product_ref(shop_id, product_id):
+    """Cross-shop product reference used by selections and journals: "<shop_id>:<product_id>"."""
+    return f"{shop_id}:{product_id}"
+
+def parse_product_ref(ref, default_shop_id=None):
+    """(shop_id, product_id) from "<shop_id>:<product_id>"; a bare product id belongs to the default shop."""
+    ref = str(ref)
+    if ":" in ref:
+        shop_id, product_id = ref.split(":", 1)
+        return shop_id, product_id
+    return str(default_shop_id if default_shop_id is not None else get_shop_id()), ref
+
+def group_by_shop(refs, default_shop_id=None):
+    """{shop_id: [product_id, ...]} keeping the order products were given in."""
+    grouped = {}
+    for ref in refs:
+        shop_id, product_id = parse_product_ref(ref, default_shop_id)
+        grouped.setdefault(shop_id, []).append(product_id)
+    return grouped
+
+def list_shop_products(shop_id):
+    """All product summaries for the shop, following the list endpoint's pagination."""
+    products = []
+    page = 1
+    while True:
+        shop_budgets.acquire(shop_id)
+        body = api_request("GET",
+            f"{API_BASE}/shops/{shop_id}/products.json?limit=50&page={page}",
+            headers={"Authorization": f"Bearer {API_KEY}"}
+        ).json()
+        products.extend(body.get("data", []) or [])
+        if page >= (body.get("last_page") or 1):
+            break
+        page += 1
+    if not products:
+        raise Exception("No products found for this shop.")
+    return products
+
+def garment_type_for(blueprint_id):
     global BLUEPRINT_MAP
     if BLUEPRINT_MAP is None:
         BLUEPRINT_MAP = get_blueprint_map()
-    shops = requests.get(
-        "https://api.printify.com/v1/shops.json",
-        headers={"Authorization": f"Bearer {API_KEY}"}
-    ).json()
-    if not shops or not shops[0].get("id"):
-        raise Exception(f"No shops found in your account. Response: {shops}")
-    shop_id = shops[0]["id"]
+    return BLUEPRINT_MAP.get(blueprint_id, f"Blueprint {blueprint_id}")
 
-    products_resp = requests.get(
-        f"https://api.printify.com/v1/shops/{shop_id}/products.json?limit=50",
-        headers={"Authorization": f"Bearer {API_KEY}"}
-    )
-    products = products_resp.json().get("data", [])
-    if not products:
-        raise Exception("No products found for this shop.")
+def load_product_details(shop_id, prod):
+    """
+    Fetch one product and convert it into the compact Product model used by the
+    dashboard. Concurrent loads of the same product share one GET.
+    """
+    prod_details = detail_flight.do(product_ref(shop_id, prod["id"]), lambda: fetch_product(shop_id, prod["id"]))
+
+    product = Product.from_api(prod_details, garment_type_for(prod_details.get("blueprint_id")), shop_id=shop_id)
+    log_key_variant(product)
+    return product
+
+def log_key_variant(product):
+    large_variant = product.large_variant
+    large_size = product.default_size
+    if large_variant and large_size.lower() == "large":
+        print(f"[INFO] Product '{product.title}' — using variant '{large_variant.id}' as KEY (Large, size={large_size}).")
+    elif large_variant:
+        print(f"[WARN] Product '{product.title}' — no Large variant; using FIRST variant '{large_variant.id}', size={large_size}.")
+    else:
+        print(f"[ERROR] Product '{product.title}' — no variants found!")
+
+def list_catalog_summaries(shop_ids):
+    """{shop_id: [product summary, ...]}, listing every shop concurrently."""
+    summaries = {}
+    for shop_id, products, error in parallel_map(list_shop_products, shop_ids, max_workers=len(shop_ids)):
+        if error is not None:
+            raise error
+        summaries[shop_id] = products
+    return {shop_id: summaries[shop_id] for shop_id in shop_ids}
+
+def iter_catalog_details(summaries, workers_per_shop=1):
+    """
+    Yield Products as their detail fetches complete. Each shop loads on its own
+    worker (or `workers_per_shop` of them) against its own request budget, so
+    shops fill in side by side.
+    """
+    garment_type_for(None)  # warm BLUEPRINT_MAP once before the workers start
 
-    detailed = []
-    used_blueprint_ids = set()
+    def load_shop(shop_id):
+        loaded = {}
+        try:
+            fetches = parallel_map(lambda prod: load_product_details(shop_id, prod),
+                                   summaries[shop_id], max_workers=workers_per_shop)
+            for prod, product, error in fetches:
+                if error is not None:
+                    print(f"[ERROR] Product '{prod.get('id')}' — failed to load details: {error}")
+                    continue
+                loaded[str(prod["id"])] = product
+                results.put(product)
+            remember_catalog(shop_id, [loaded[str(p["id"])] for p in summaries[shop_id] if str(p["id"]) in loaded])
+        finally:
+            results.put(_SHOP_DONE)
+
+    results = queue.Queue()
+    workers = [threading.Thread(target=load_shop, args=(shop_id,), daemon=True) for shop_id in summaries]
+    for w in workers:
+        w.start()
+    pending = len(workers)
+    while pending:
+        item = results.get()
+        if item is _SHOP_DONE:
+            pending -= 1
+        else:
+            yield item
 
-    for prod in products:
-        prod_details = requests.get(
-            f"https://api.printify.com/v1/shops/{shop_id}/products/{prod['id']}.json",
-            headers={"Authorization": f"Bearer {API_KEY}"}
-        ).json()
+def load_shop_catalog(shop_id, workers_per_shop=1):
+    """
+    One shop's Products in list order, freshly loaded and cached. Callers that
+    arrive while the same shop is already loading wait for that load instead of
+    crawling the shop again.
+    """
+    def load():
+        summaries = {shop_id: list_shop_products(shop_id)}
+        loaded = list(iter_catalog_details(summaries, workers_per_shop))
+        order = {str(p["id"]): i for i, p in enumerate(summaries[shop_id])}
+        loaded.sort(key=lambda p: order.get(str(p.id), len(order)))
+        return loaded
+    return catalog_flight.do(str(shop_id), load)
+
+def get_catalogs(shop_ids, workers_per_shop=1):
+    """(detailed, found_types) for several shops, loaded concurrently and cached per shop."""
+    garment_type_for(None)  # warm BLUEPRINT_MAP once before the shops start
+    by_shop = {}
+    for shop_id, products, error in parallel_map(lambda s: load_shop_catalog(s, workers_per_shop),
+                                                 shop_ids, max_workers=len(shop_ids)):
+        if error is not None:
+            raise error
+        by_shop[shop_id] = products
+    # keep the dashboard order stable: shop by shop, in list order
+    loaded = [p for shop_id in shop_ids for p in by_shop[shop_id]]
+    found_types = sorted({p.garment_type for p in loaded})
+    return loaded, found_types
+
+def get_shop_and_products(shop_id=None):
+    shop_id = shop_id or get_shop_id()
+    detailed, found_types = get_catalogs([shop_id])
+    return shop_id, detailed, found_types
 
-        product_options = prod_details.get("options", []) or []
-        variants = prod_details.get("variants", []) or []
+def remember_catalog(shop_id, detailed):
+    catalog_cache[str(shop_id)] = {str(p.id): p for p in detailed}
+    catalog_loaded_at[str(shop_id)] = time.time()
+    touch_catalog(shop_id)
+    margin_analytics.update_shop(shop_id, detailed, known_shipping_cost)
+    if shared_cache is not None:
+        catalog_versions[str(shop_id)] = shared_cache.replace_catalog(shop_id, [p.to_dict() for p in detailed])
+    record_costs(shop_id, detailed)
+
+def record_costs(shop_id, detailed):
+    """Append this sync's cost changes to the shop's cost history (see costs.py)."""
+    try:
+        moved = history_for(shop_id).record(detailed)
+    except Exception as e:
+        # cost tracking must never break a catalog load
+        print(f"[WARN] Could not record costs for shop {shop_id}: {e}")
+        return
+    if moved and len(moved) < len(detailed):
+        print(f"[INFO] Costs changed on {len(moved)} product(s) in shop {shop_id}.")
 
-        # annotate each variant with resolved size/color (per product)
-        for var in variants:
-            sz, col = extract_size_color_titles(var, product_options)
-            var["__size_title"] = sz
-            var["__color_title"] = col
+def touch_catalog(shop_id):
+    catalog_revisions[str(shop_id)] = next(_revision_counter)
 
-        large_variant = get_large_variant(variants, product_options)
-        large_size = get_human_readable_size(large_variant, product_options) if large_variant else "N/A"
-        if large_variant and large_size.lower() == "large":
-            print(f"[INFO] Product '{prod_details.get('title')}' — using variant '{large_variant.get('id')}' as KEY (Large, size={large_size}).")
-        elif large_variant:
-            print(f"[WARN] Product '{prod_details.get('title')}' — no Large variant; using FIRST variant '{large_variant.get('id')}', size={large_size}.")
+def catalog_version(shop_ids):
+    """
+    A value that changes whenever any of these shops' cached catalogs does. With
+    the shared cache it is the (generation, seq) every worker agrees on, so an
+    ETag from one worker is valid on the others.
+    """
+    if shared_cache is not None:
+        return [catalog_versions.get(str(s)) for s in shop_ids]
+    return [PROCESS_TOKEN] + [catalog_revisions.get(str(s)) for s in shop_ids]
+
+def refresh_from_shared(shop_ids):
+    """Pull catalog rows other workers loaded or changed since this worker last looked."""
+    if shared_cache is None:
+        return
+    for shop_id in shop_ids:
+        key = str(shop_id)
+        generation, seq = catalog_versions.get(key, (None, 0))
+        generation, seq, rows, full = shared_cache.catalog_since(key, generation, seq)
+        if generation is None:
+            continue
+        if full:
+            catalog_cache[key] = {str(row["id"]): Product.from_dict(row) for row in rows}
+            catalog_loaded_at[key] = shared_cache.catalog_loaded(key) or time.time()
+            margin_analytics.update_shop(key, catalog_cache[key].values(), known_shipping_cost)
         else:
-            print(f"[ERROR] Product '{prod_details.get('title')}' — no variants found!")
-
-        # One-line summary on card
-        prod_details["default_size"] = large_size
-        prod_details["variants"] = [large_variant] if large_variant else []
+            shop = catalog_cache.setdefault(key, {})
+            for row in rows:
+                shop[str(row["id"])] = product = Product.from_dict(row)
+                margin_analytics.update_product(product, known_shipping_cost)
+        catalog_versions[key] = (generation, seq)
 
-        # Full list for the expandable table
-        prod_details["all_variants"] = variants or []
+# Longest a worker may take over a shop's first crawl before another one steps in
+CATALOG_LEASE_SECONDS = float(os.environ.get("PRINTIFY_CATALOG_LEASE", "300"))
 
-        # Provider/print area for shipping lookup
-        prod_details["provider_id"] = (
-            prod_details.get("print_provider_id")
-            or prod_details.get("provider", {}).get("id")
-            or (large_variant.get("print_provider_id") if large_variant else None)
-        )
-        prod_details["print_area_key"] = large_variant.get("print_area_key") if large_variant else None
+def claim_catalog_loads(shop_ids):
+    """
+    The shops whose load lease this worker took, with what another worker
+    stored just before the claim already read in; the rest are being loaded elsewhere.
+    """
+    mine = [s for s in shop_ids if shared_cache.claim(f"loading:{s}", PROCESS_TOKEN, CATALOG_LEASE_SECONDS)]
+    if mine:
+        refresh_from_shared(mine)
+    return mine
 
-        blueprint_id = prod_details.get("blueprint_id")
-        garment_type = BLUEPRINT_MAP.get(blueprint_id, f"Blueprint {blueprint_id}")
-        prod_details["garment_type"] = garment_type
-        prod_details["type_display"] = garment_type
-        used_blueprint_ids.add(blueprint_id)
-        detailed.append(prod_details)
+def release_catalog_loads(shop_ids):
+    for s in shop_ids:
+        shared_cache.release(f"loading:{s}", PROCESS_TOKEN)
 
-    found_types = sorted({p["garment_type"] for p in detailed})
-    return shop_id, detailed, found_types
+def load_missing_catalogs(shop_ids):
+    """
+    Load shops this worker has no catalog for. With the shared cache, one worker
+    crawls each shop while it holds the shop's lease, and the others wait for
+    the rows it stores. Cold workers then do not crawl the same shop side by side.
+    If the crawling worker fails or dies, a waiting worker takes the lease over.
+    """
+    if shared_cache is None:
+        get_catalogs(shop_ids)
+        return
+    pending = [str(s) for s in shop_ids]
+    while pending:
+        mine = claim_catalog_loads(pending)
+        if mine:
+            try:
+                todo = [s for s in mine if s not in catalog_cache]
+                if todo:
+                    get_catalogs(todo)
+            finally:
+                release_catalog_loads(mine)
+        refresh_from_shared(pending)
+        pending = [s for s in pending if s not in catalog_cache]
+        if pending:
+            time.sleep(0.2)
+
+def get_cached_catalog(shop_ids=None):
+    """Cached Products for the given shops (default: the first shop); shops not cached yet are loaded once."""
+    shop_ids = shop_ids or [get_shop_id()]
+    refresh_from_shared(shop_ids)
+    missing = [s for s in shop_ids if not catalog_cache.get(str(s))]
+    if missing:
+        load_missing_catalogs(missing)
+    return [p for s in shop_ids for p in catalog_cache.get(str(s), {}).values()]
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def claim_refresh(shop_ids):
+    """The shops not already being refreshed in the background, now marked as refreshing."""
+    with _refreshing_lock:
+        todo = [s for s in shop_ids if str(s) not in _refreshing]
+        _refreshing.update(str(s) for s in todo)
+    return todo
+
+def release_refresh(shop_ids):
+    with _refreshing_lock:
+        _refreshing.difference_update(str(s) for s in shop_ids)
+
+def is_refreshing(shop_ids):
+    with _refreshing_lock:
+        return any(str(s) in _refreshing for s in shop_ids)
+
+def refresh_catalogs_in_background(shop_ids):
+    """Reload the shops' catalogs on a background thread; shops already refreshing are skipped."""
+    todo = claim_refresh(shop_ids)
+    if not todo:
+        return
+
+    def run():
+        try:
+            get_catalogs(todo)
+        except Exception as e:
+            print(f"[WARN] Background catalog refresh failed: {e}")
+        finally:
+            release_refresh(todo)
+    threading.Thread(target=run, daemon=True).start()
+
+def stale_shops(shop_ids):
+    """Shops whose cached catalog is older than CATALOG_FRESH_SECONDS."""
+    now = time.time()
+    return [s for s in shop_ids if now - catalog_loaded_at.get(str(s), 0) > CATALOG_FRESH_SECONDS]
+
+def format_age(seconds):
+    if seconds < 90:
+        return f"{int(seconds)}s"
+    if seconds < 90 * 60:
+        return f"{int(seconds // 60)} min"
+    if seconds < 48 * 3600:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.1f} days"
+
+def catalog_snapshot(shop_ids, error=None):
+    """Template/JSON info about the catalog being served: age of its oldest shop, refresh and circuit state."""
+    loaded = [catalog_loaded_at.get(str(s)) for s in shop_ids]
+    age = time.time() - min(t for t in loaded if t) if any(loaded) else 0
+    refreshing = is_refreshing(shop_ids)
+    return {
+        "loaded_at": min((t for t in loaded if t), default=None),
+        "age": round(age, 1),
+        "age_text": format_age(age),
+        "stale": age > CATALOG_FRESH_SECONDS,
+        "refreshing": refreshing,
+        "circuit": printify_breaker.state,
+        "error": None if error is None else str(error),
+    }
+
+def dashboard_catalog(shop_ids, force=False):
+    """
+    (detailed, found_types, snapshot) for the dashboard, stale-while-revalidate:
+    a cached catalog is served at once and, when older than CATALOG_FRESH_SECONDS,
+    refreshed in the background. Only shops never loaded (or `force`) wait for
+    Printify; if that fails and a cached copy exists, the copy is served with the error.
+    """
+    refresh_from_shared(shop_ids)
+    missing = [s for s in shop_ids if not catalog_cache.get(str(s))]
+    error = None
+    if force or missing:
+        try:
+            if force:
+                get_catalogs(shop_ids)
+            else:
+                load_missing_catalogs(missing)
+        except Exception as e:
+            if force and not missing:
+                error = e
+            else:
+                raise
+    stale = stale_shops(shop_ids)
+    if stale:
+        refresh_catalogs_in_background(stale)
+    detailed = [p for s in shop_ids for p in catalog_cache.get(str(s), {}).values()]
+    found_types = sorted({p.garment_type for p in detailed})
+    return detailed, found_types, catalog_snapshot(shop_ids, error)
+
+def select_products(products, product_ids=None, garment_type=None, blueprint_id=None):
+    """
+    Filter Products by explicit ids (bare or "<shop_id>:<product_id>"), garment type
+    and/or blueprint; no filter means all.
+    """
+    selected = list(products)
+    if product_ids:
+        wanted = {str(pid) for pid in product_ids}
+        selected = [p for p in selected if str(p.id) in wanted or product_ref(p.shop_id, p.id) in wanted]
+    if garment_type and garment_type != "all":
+        selected = [p for p in selected if p.garment_type == garment_type]
+    if blueprint_id is not None:
+        selected = [p for p in selected if str(p.blueprint_id) == str(blueprint_id)]
+    return selected
+
+def fetch_product(shop_id, product_id):
+    shop_budgets.acquire(shop_id)
+    return api_request("GET",
+        f"{API_BASE}/shops/{shop_id}/products/{product_id}.json",
+        headers={"Authorization": f"Bearer {API_KEY}"}
+    ).json()
 
 def get_all_variants(product_id, shop_id):
-    r = requests.get(
-        f"https://api.printify.com/v1/shops/{shop_id}/products/{product_id}.json",
-        headers={"Authorization": f"Bearer {API_KEY}"}
-    )
-    prod = r.json()
+    prod = fetch_product(shop_id, product_id)
     return prod.get("variants", [])
 
-def get_variant_shipping_cost(provider_id, print_area_key, country_code="US"):
-    key = (provider_id, print_area_key, country_code)
+def cached_shipping_cost(key):
+    """Shipping cost for (provider_id, print_area_key, country) from this process or the shared cache, else MISSING."""
     if key in shipping_cache:
         return shipping_cache[key]
+    if shared_cache is not None:
+        cost = shared_cache.get("shipping:" + ":".join(str(k) for k in key))
+        if cost is not MISSING:
+            shipping_cache[key] = cost
+        return cost
+    return MISSING
+
+def remember_shipping_cost(key, cost):
+    shipping_cache[key] = cost
+    if shared_cache is not None:
+        shared_cache.set("shipping:" + ":".join(str(k) for k in key), cost)
+    return cost
+
+def get_variant_shipping_cost(provider_id, print_area_key, country_code="US"):
+    key = (provider_id, print_area_key, country_code)
+    cost = cached_shipping_cost(key)
+    if cost is not MISSING:
+        return cost
     if not provider_id or not print_area_key:
         return None
-    url = f"https://api.printify.com/v1/shipping.json?country={country_code}&provider_id={provider_id}&print_area_key={print_area_key}"
-    resp = requests.get(url, headers={"Authorization": f"Bearer {API_KEY}"})
+
+    def fetch():
+        url = f"{API_BASE}/shipping.json?country={country_code}&provider_id={provider_id}&print_area_key={print_area_key}"
+        resp = api_request("GET", url, headers={"Authorization": f"Bearer {API_KEY}"})
+        return remember_shipping_cost(key, standard_shipping_cost(resp))
+    return shipping_flight.do(key, fetch)
+
+def standard_shipping_cost(resp):
+    """Standard shipping cost (cents) from a shipping.json response, or None."""
     if resp.status_code == 200:
         data = resp.json()
         if "standard" in data:
-            price = data["standard"].get("cost", None)
-            if price is not None:
-                shipping_cache[key] = price
-                return price
-    shipping_cache[key] = None
+            return data["standard"].get("cost", None)
     return None
 
+def attach_shipping_cost(prod):
+    """Resolve the product's shipping cost; it applies to every variant of the product."""
+    prod.shipping_cost = get_variant_shipping_cost(prod.provider_id, prod.print_area_key)
+    margin_analytics.set_shipping(prod, prod.shipping_cost)
+    return prod.shipping_cost
+
+def known_shipping_cost(prod):
+    """The product's shipping cost if this process or the shared cache already has it; never calls Printify."""
+    if prod.shipping_cost is not None:
+        return prod.shipping_cost
+    cost = cached_shipping_cost((prod.provider_id, prod.print_area_key, "US"))
+    return None if cost is MISSING else cost
+
 # ---------- Pricing helpers ----------
 
-def build_uniform_update(variants, uniform_retail):
-    """Return payload list setting the same retail price for every variant."""
-    uniform_cents = int(round(float(uniform_retail) * 100))
+def build_price_update(variants, prices):
+    """Return payload list pairing each variant with its new price (cents)."""
     updated = []
-    for v in variants or []:
+    for v, price in zip(variants or [], prices):
         updated.append({
             "id": v["id"],
-            "price": uniform_cents,
+            "price": price,
             "is_enabled": v.get("is_enabled", True),
             "is_visible": v.get("is_visible", True)
         })
     return updated
 
-def update_all_prices_based_on_large(product_id, shop_id, target_retail):
-    """Existing per-cost pricing (non-flat)."""
-    prod_resp = requests.get(
-        f"https://api.printify.com/v1/shops/{shop_id}/products/{product_id}.json",
-        headers={"Authorization": f"Bearer {API_KEY}"}
+def build_uniform_update(variants, uniform_retail):
+    """Return payload list setting the same retail price for every variant."""
+    uniform_cents = to_cents(uniform_retail)
+    return build_price_update(variants, [uniform_cents] * len(variants or []))
+
+def put_variant_prices(shop_id, product_id, updated):
+    shop_budgets.acquire(shop_id)
+    return api_request("PUT",
+        f"{API_BASE}/shops/{shop_id}/products/{product_id}.json",
+        headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
+        json={"variants": updated}
     )
-    prod_data = prod_resp.json()
+
+def changed_price_rows(variants, updated):
+    """Entries of `updated` whose price (cents) or enabled flag differs from the variant's current one."""
+    current = {v["id"]: (v.get("price"), v.get("is_enabled", True)) for v in variants or []}
+    return [u for u in updated if current.get(u["id"]) != (u["price"], u.get("is_enabled", True))]
+
+def put_changed_prices(shop_id, product_id, variants, updated, snapshot=None):
+    """
+    PUT only the variants whose price actually moves, once they pass the
+    pre-flight checks (PreflightError instead of a PUT Printify would refuse).
+    Their old prices go to `snapshot` first. Returns (resp, sent), the rows
+    PUT including any trimmed variants; resp is None when every price already
+    matches.
+    """
+    changed = changed_price_rows(variants, updated)
+    if not changed:
+        return None, changed
+    checked = check_update(variants, changed)
+    if not checked.ok:
+        raise PreflightError(checked)
+    if snapshot is not None:
+        snapshot.record(product_ref(shop_id, product_id), variants, checked.payload)
+    return put_variant_prices(shop_id, product_id, checked.payload), checked.payload
+
+def local_preflight(product, prices):
+    """Pre-flight of new prices (cents, one per variant) for a cached Product, before any Printify call."""
+    variants = product_variants(product)
+    return check_update(variants, changed_price_rows(variants, build_price_update(variants, prices)))
+
+def rejected_result(product_id, checked):
+    """A write_product_prices()-shaped result for an update pre-flight refused."""
+    return {"id": str(product_id), "status": "rejected", "error": checked.message(), "resp": None,
+            "variants": [], "product_options": [], "updated": [], "changed": [], "preflight": checked.to_dict()}
+
+def preflight_rejections(keys, cached, mode, value, flat, journal=None):
+    """
+    {(shop_id, product_id): rejected result} of the products whose mode repricing
+    fails pre-flight on the cached catalog; they need no Printify call at all.
+    Products that are not cached (or have no Large variant) are left to the write.
+    """
+    rejected = {}
+    for shop_id, pid in keys:
+        product = cached.get(product_ref(shop_id, pid))
+        large = product.large_variant if product is not None else None
+        if large is None:
+            continue
+        checked = local_preflight(product, compute_prices([v.cost for v in product.variants], large.cost, mode, value, flat))
+        if not checked.ok:
+            rejected[(shop_id, pid)] = rejected_result(pid, checked)
+            if journal is not None:
+                journal.record_outcome(product_ref(shop_id, pid), "rejected", checked.message())
+    return rejected
+
+def response_error(resp):
+    if resp is None:
+        return "Unknown error"
+    try:
+        return resp.json()
+    except Exception:
+        return resp.text
+
+def write_product_prices(shop_id, product_id, price_fn, journal=None, expected_updated_at=None, journal_key=None,
+                         snapshot=None, enabled=None):
+    """
+    Fetch one product, get its new prices from `price_fn(variants, product_options)`
+    (cents, one per variant; ValueError fails the product) and PUT only the variants
+    that change. With a journal, the payload and the `updated_at` seen are recorded
+    before the PUT and the outcome after it (keyed by `journal_key`, default
+    "<shop_id>:<product_id>"); with a snapshot, the prices being replaced. If
+    `expected_updated_at` is given and the product has changed since, nothing is
+    written and the result is a conflict. `enabled`, {variant_id: is_enabled},
+    sets enabled flags along with the prices (a rollback re-enabling variants).
+    """
+    pid = str(product_id)
+    journal_key = journal_key or product_ref(shop_id, pid)
+    prod_data = fetch_product(shop_id, pid)
     product_options = prod_data.get("options", []) or []
     variants = prod_data.get("variants", []) or []
-    large_variant = get_large_variant(variants, product_options)
-    if not large_variant:
-        return None, variants, [], product_options
+    result = {
+        "id": pid, "status": None, "error": None, "resp": None,
+        "variants": variants, "product_options": product_options,
+        "updated": [], "changed": [], "updated_at": prod_data.get("updated_at"),
+    }
+
+    def finish(status, error=None):
+        result["status"] = status
+        result["error"] = error
+        if journal is not None:
+            journal.record_outcome(journal_key, status, None if error is None else str(error))
+        return result
+
+    if expected_updated_at and result["updated_at"] != expected_updated_at:
+        return finish("conflict", f"Product changed in Printify since it was loaded ({result['updated_at']}).")
 
-    cost = large_variant.get("cost", 0) / 100
-    retail = float(target_retail)
-    margin = ((retail - cost) / retail) if retail > 0 else 0
+    try:
+        prices = price_fn(variants, product_options)
+    except ValueError as ex:
+        return finish("failed", str(ex))
+    result["updated"] = build_price_update(variants, prices)
+    if enabled:
+        flags = {str(vid): on for vid, on in enabled.items()}
+        for u in result["updated"]:
+            u["is_enabled"] = flags.get(str(u["id"]), u["is_enabled"])
+    result["changed"] = changed_price_rows(variants, result["updated"])
+    if not result["changed"]:
+        return finish("skipped")
+    checked = check_update(variants, result["changed"])
+    result["preflight"] = checked.to_dict()
+    if not checked.ok:
+        return finish("rejected", checked.message())
+    result["payload"] = checked.payload
+
+    if snapshot is not None:
+        snapshot.record(journal_key, variants, result["payload"], result["updated_at"])
+    if journal is not None:
+        journal.record_intent(journal_key, result["updated_at"], result["payload"])
+    try:
+        resp = put_variant_prices(shop_id, pid, result["payload"])
+    except Exception as ex:
+        return finish("failed", str(ex))
+    result["resp"] = resp
+    if resp.status_code != 200:
+        return finish("failed", response_error(resp))
+    return finish("done")
+
+def mode_price_fn(mode, value, flat_prices):
+    """price_fn for write_product_prices(): retail/profit/margin keyed off the Large variant."""
+    def price_fn(variants, product_options):
+        large_variant = get_large_variant(variants, product_options)
+        if not large_variant:
+            raise ValueError("No Large or fallback variant found.")
+        return compute_prices([v.get("cost", 0) for v in variants], large_variant.get("cost", 0), mode, value, flat_prices)
+    return price_fn
+
+def explicit_price_fn(new_prices):
+    """price_fn for write_product_prices(): {variant_id: cents}; variants not listed keep their price."""
+    new_prices = {str(vid): cents for vid, cents in new_prices.items()}
+
+    def price_fn(variants, product_options):
+        return [new_prices.get(str(v["id"]), v.get("price")) for v in variants]
+    return price_fn
+
+def reprice_product(shop_id, product_id, mode, value, flat_prices, journal=None, expected_updated_at=None, journal_key=None,
+                    snapshot=None):
+    """Retail/profit/margin repricing of one product through write_product_prices()."""
+    return write_product_prices(shop_id, product_id, mode_price_fn(mode, value, flat_prices),
+                                journal, expected_updated_at, journal_key, snapshot)
+
+def set_product_prices(shop_id, product_id, new_prices, journal=None, expected_updated_at=None, journal_key=None,
+                       snapshot=None, enabled=None):
+    """Explicit prices for one product, {variant_id: cents}, through write_product_prices()."""
+    return write_product_prices(shop_id, product_id, explicit_price_fn(new_prices),
+                                journal, expected_updated_at, journal_key, snapshot, enabled)
+
+def cached_product(shop_id, product_id):
+    """This worker's cached Product (after pulling other workers' changes), or None; never calls Printify."""
+    refresh_from_shared([shop_id])
+    return catalog_cache.get(str(shop_id), {}).get(str(product_id))
+
+def sync_cached_product(product, res):
+    """Keep a cached Product in step with what a successful reprice_product() wrote."""
+    if product is None or res["status"] != "done":
+        return
+    sent = {u["id"]: u for u in res.get("payload") or res["changed"]}
+    for v in product.variants:
+        if v.id in sent:
+            v.price = sent[v.id]["price"]
+            v.is_enabled = sent[v.id].get("is_enabled", v.is_enabled)
+    if res.get("resp") is None:
+        # nothing sent now: the write had already landed, `updated_at` was read after it
+        product.updated_at = res.get("updated_at")
+    else:
+        try:
+            product.updated_at = res["resp"].json().get("updated_at")
+        except Exception:
+            product.updated_at = None
+    touch_catalog(product.shop_id)
+    margin_analytics.update_product(product, known_shipping_cost)
+    if shared_cache is not None:
+        shared_cache.put_products(product.shop_id, [product.to_dict()])
 
-    updated = []
-    for v in variants:
-        v_cost = v.get("cost", 0) / 100
-        v_price = round(v_cost / (1 - margin) + 0.00001, 2) if margin < 1.0 else v_cost
-        updated.append({
-            "id": v["id"],
-            "price": int(round(v_price * 100)),
-            "is_enabled": v.get("is_enabled", True),
-            "is_visible": v.get("is_visible", True)
-        })
+def resume_price_item(shop_id, journal, product_id, journal_key):
+    """
+    Settle a product whose journaled PUT may or may not have landed:
+    already applied -> done; changed elsewhere since we read it -> conflict;
+    otherwise re-send the recorded payload. Either way the cached product is
+    brought up to date.
+    """
+    intent = journal.intents[journal_key]
+    prod_data = fetch_product(shop_id, product_id)
+    current = {v["id"]: (v.get("price"), v.get("is_enabled", True)) for v in prod_data.get("variants", []) or []}
+    settled = {"status": "done", "payload": intent["payload"], "changed": intent["payload"], "resp": None,
+               "updated_at": prod_data.get("updated_at")}
+    if all(current.get(u["id"]) == (u["price"], u.get("is_enabled", True)) for u in intent["payload"]):
+        journal.record_outcome(journal_key, "done", "already applied")
+        sync_cached_product(cached_product(shop_id, product_id), settled)
+        return "done", None
+    if prod_data.get("updated_at") != intent["updated_at"]:
+        error = f"Product changed in Printify since the journaled read ({prod_data.get('updated_at')})."
+        journal.record_outcome(journal_key, "conflict", error)
+        return "conflict", error
+    resp = put_variant_prices(shop_id, product_id, intent["payload"])
+    if resp.status_code != 200:
+        error = str(response_error(resp))
+        journal.record_outcome(journal_key, "failed", error)
+        return "failed", error
+    journal.record_outcome(journal_key, "done")
+    sync_cached_product(cached_product(shop_id, product_id), dict(settled, resp=resp))
+    return "done", None
+
+# Publish only the retail prices; everything else in the store listing is left alone
+PUBLISH_PAYLOAD = {
+    "title": False,
+    "description": False,
+    "images": False,
+    "variants": False,
+    "tags": False,
+    "keyFeatures": False,
+    "shipping_template": False,
+    "retail_price": True
+}
+
+def publish_product(shop_id, product_id):
+    """Publish one product's retail prices to the store; returns (success, error)."""
+    try:
+        shop_budgets.acquire(shop_id)
+        publish_resp = api_request("POST",
+            f"{API_BASE}/shops/{shop_id}/products/{product_id}/publish.json",
+            headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
+            json=PUBLISH_PAYLOAD
+        )
+        if publish_resp.status_code == 200:
+            return True, None
+        err_msg = publish_resp.json() if publish_resp.content else publish_resp.text
+        return False, str(err_msg)
+    except Exception as ex:
+        return False, str(ex)
+
+def resume_job(job_id, force=False):
+    """
+    Continue an interrupted journaled job. Completed products are skipped, in-flight
+    ones are reconciled with Printify first, and conflicts are only redone with `force`
+    (prices are then recomputed from the product's current state). Shops are resumed
+    side by side, each within its own request budget.
+    """
+    journal = Journal.open(job_id)
+    # keeps adding to the job's snapshot; prices recorded before the interruption stay
+    snapshot = Snapshot.create(journal.params.get("source") or journal.kind, snapshot_id=journal.job_id)
+    default_shop = get_shop_id()
+    by_shop = {}
+    for key in journal.pending():
+        shop_id, pid = parse_product_ref(key, default_shop)
+        by_shop.setdefault(shop_id, []).append((key, pid))
+
+    def resume_shop(shop_id):
+        out = []
+        for key, pid in by_shop[shop_id]:
+            last = journal.outcomes.get(key)
+            if last and last["status"] == "conflict" and not force and not journal.in_flight(key):
+                out.append({"id": key, "status": "conflict", "error": last.get("detail")})
+            elif journal.kind == "publish":
+                journal.record_intent(key, None, {"retail_price": True})
+                ok, error = publish_product(shop_id, pid)
+                journal.record_outcome(key, "done" if ok else "failed", error)
+                out.append({"id": key, "status": "done" if ok else "failed", "error": error})
+            elif journal.in_flight(key) and not force:
+                status, error = resume_price_item(shop_id, journal, pid, key)
+                out.append({"id": key, "status": status, "error": error})
+            elif journal.kind == "sheet":
+                res = set_product_prices(shop_id, pid, journal.params["prices"][key],
+                                         journal=journal, journal_key=key, snapshot=snapshot,
+                                         enabled=journal.params.get("enabled", {}).get(key))
+                sync_cached_product(cached_product(shop_id, pid), res)
+                out.append({"id": key, "status": res["status"], "error": None if res["error"] is None else str(res["error"])})
+            else:
+                p = journal.params
+                res = reprice_product(shop_id, pid, p["mode"], p["value"], p.get("flat", False),
+                                      journal=journal, journal_key=key, snapshot=snapshot)
+                sync_cached_product(cached_product(shop_id, pid), res)
+                out.append({"id": key, "status": res["status"], "error": None if res["error"] is None else str(res["error"])})
+        return out
 
-    patch_url = f"https://api.printify.com/v1/shops/{shop_id}/products/{product_id}.json"
-    payload = {"variants": updated}
-    resp = requests.put(
-        patch_url,
-        headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
-        json=payload
-    )
-    return resp, variants, updated, product_options
+    results = []
+    for shop_id, out, error in parallel_map(resume_shop, list(by_shop), max_workers=len(by_shop) or 1):
+        if error is not None:
+            out = [{"id": key, "status": "failed", "error": str(error)} for key, _ in by_shop[shop_id]]
+        results.extend(out)
+    journal.finish()
+    return journal, results
 
-# ---------- Flask routes ----------
 
-@app.route("/", methods=["GET"])
-def index():
-    messages = get_flashed_messages(with_categories=True)
-    try:
-        shop_id, detailed, found_types = get_shop_and_products()
-    except Exception as e:
-        return str(e), 400
+# ---------- Templates ----------
 
-    html = '''<!DOCTYPE html>
+DASHBOARD_HTML = '''<!DOCTYPE html>
     <html>
     <head>
         <title>Printify Product Price Breakdown</title>
-        <style>
-            body { font-family: sans-serif; margin: 2em; background: #f9f9fb;}
-            .prod { background: #fff; border-radius: 14px; margin-bottom: 2em; padding: 1.5em; box-shadow: 0 2px 8px #0001; position: relative;}
-            .prod h2 { margin: 0 0 0.5em; }
-            .default-size { font-size: 1em; font-weight: 600; color: #4c5799; margin-left: 0.5em;}
-            table { width: 100%; border-collapse: collapse; table-layout: fixed;}
-            th, td { padding: 0.4em 0.6em; text-align: center; vertical-align: middle;}
-            th { background: #f0f0f7; }
-            td { border-top: 1px solid #eee; }
-            .margin-high { color: green; }
-            .margin-med { color: orange; }
-            .margin-low { color: red; }
-            img { width: 80px; height: 80px; object-fit: contain; background: #f2f2f2; border-radius: 10px;}
-            #filter-wrap { margin-bottom: 2em; }
-            .editform { display: inline; }
-            .edit-icons button {border:none;background:none;cursor:pointer;}
-            .editbox { background:#eef; padding:1em; border-radius:8px; margin-bottom:1em;}
-            .editlabel { font-weight: bold; }
-            .updated-row { background: #e4fcd7; }
-            .flash-success {padding:1em; background:#dff0d8; color:#3c763d; margin-bottom:1em; border-radius:8px;}
-            .flash-error {padding:1em; background:#ffe1e1; color:#a32c2c; margin-bottom:1em; border-radius:8px;}
-            .select-checkbox {position:absolute;top:16px;left:16px;zoom:1.3;}
-            .scroll-table {max-height:320px;overflow:auto;border-radius:8px;box-shadow:0 1px 6px #0002;}
-            .scroll-table table {line-height:2;}
-            #bulk-edit-bar {display:none; margin-bottom: 2em; background: #222; color: #fff; padding: 1.2em 1.2em 0.9em 1.2em; border-radius: 1em; box-shadow: 0 2px 16px #0005;}
-            #bulk-edit-bar input {margin-left:0.5em;margin-right:1em;}
-            #bulk-edit-bar label {font-weight:600;}
-            #bulk-edit-bar .editlabel {color:#6fa84f;}
-            #bulk-edit-bar button {margin-left:1em;}
-            #job-flash-messages {position:relative;}
-            #close-job-msg { position: absolute; right: 12px; top: 12px; background: #ccc; color: #222; border: none; border-radius: 50%; width: 28px; height: 28px; font-size: 1.6em; line-height: 1; cursor:pointer; z-index: 10;}
-            #bulk-publish-bar {display:none; margin-bottom:2em;}
-            .expand-btn {margin-top:0.8em; border: 1px solid #ddd; background:#f8f8ff; padding:0.5em 0.8em; border-radius:8px; cursor:pointer;}
-            .allvars-wrap {margin-top:0.8em; display:none;}
-            .inline-note { color:#bbb; font-size:0.9em; display:block; margin-top:0.25em; }
-            .flat-row { margin-left:1em; }
-        </style>
+        <link rel="stylesheet" href="{{ asset_url('dashboard.css') }}">
     </head>
-    <body>
+    <body data-preview-url="{{ url_for('price_preview') }}" data-publish-url="{{ url_for('publish_selected') }}" data-shop="{{ current_shop }}">
         <h1>Printify Product Price Breakdown</h1>
 
+        {% if snapshot %}
+        {% set down = snapshot.error or snapshot.circuit != 'closed' %}
+        <div id="snapshot-age" class="{% if down %}snapshot-down{% endif %}">
+            Catalog as of <span data-loaded="{{ snapshot.loaded_at or '' }}">{{ snapshot.age_text }}</span> ago
+            {% if down %}
+            &middot; Printify is unreachable{% if snapshot.error %} ({{ snapshot.error }}){% endif %}; showing the last good copy
+            {% elif snapshot.refreshing %}
+            &middot; refreshing in the background, reload for the latest
+            {% endif %}
+            &middot; <a href="{{ url_for('index', shop=current_shop, refresh=1) }}">Reload from Printify</a>
+        </div>
+        {% endif %}
+
         <div id="job-flash-messages">
             {% set has_msg = false %}
             {% for category, msg in messages %}
@@ -341,7 +1030,7 @@ def index():
                     {% if not has_msg %}
                         {% set has_msg = true %}
                     {% endif %}
-                    <div class="flash-{{category}}">{{ msg|safe }}</div>
+                    <div class="flash-{{category}}">{{ msg }}</div>
                 {% endif %}
             {% endfor %}
             {% if has_msg %}
@@ -350,6 +1039,16 @@ def index():
         </div>
 
         <div id="filter-wrap">
+            {% if shops|length > 1 %}
+            <label for="shop-select" style="font-weight:bold;">Shop: </label>
+            <select id="shop-select">
+                <option value="all" {% if current_shop == 'all' %}selected{% endif %}>All shops</option>
+                {% for s in shops %}
+                <option value="{{s.id}}" {% if current_shop == s.id|string %}selected{% endif %}>{{ s.title or s.id }}</option>
+                {% endfor %}
+            </select>
+            &nbsp;
+            {% endif %}
             <label for="gtype" style="font-weight:bold;">Filter by product type: </label>
             <select id="gtype">
                 <option value="all">All</option>
@@ -358,6 +1057,14 @@ def index():
                 {% endfor %}
             </select>
             &nbsp; <label><input type="checkbox" id="select-all-cb"> Select All Visible</label>
+            &nbsp; Price sheet:
+            <a href="{{ url_for('export_price_sheet', fmt='csv', shop=current_shop) }}">CSV</a> |
+            <a href="{{ url_for('export_price_sheet', fmt='parquet', shop=current_shop) }}">Parquet</a>
+            &nbsp; <a href="{{ url_for('default_variant_report', shop=current_shop) }}">Default variants</a>
+            &nbsp; <a href="{{ url_for('margin_analytics_view', shop=current_shop) }}">Analytics</a>
+            {% if cost_drift %}
+            &nbsp; <a class="cost-drift" href="{{ url_for('cost_drift', shop=current_shop) }}">&#9888; Costs changed on {{ cost_drift|length }} product(s)</a>
+            {% endif %}
         </div>
 
         <form id="bulk-edit-bar" method="POST" action="{{ url_for('bulk_edit') }}">
@@ -377,11 +1084,13 @@ def index():
             </span>
             &nbsp;&nbsp;
             <button type="submit">Save All</button>
+            <button type="button" id="bulk-preview">Preview</button>
             <button type="button" id="bulk-cancel">Cancel</button>
             <div style="margin-top:0.5em;color:#ccc;font-size:0.96em;">
                 Set a retail price (all other variants follow margin, based on Large), a profit (adds $ to each cost), <b>or</b> a margin percentage (profit relative to cost, based on Large).<br>
                 <span class="inline-note">If <b>Flat prices</b> is checked, one final retail is applied to every variant. For Profit or Margin %, the final retail is computed from the Large variant and used for all variants.</span>
             </div>
+            <div id="bulk-preview-panel"></div>
         </form>
 
         <div id="bulk-publish-bar">
@@ -390,15 +1099,15 @@ def index():
         </div>
 
         {% for p in products %}
-        <div class="prod" data-gtype="{{p.garment_type}}">
-            <input class="select-checkbox" type="checkbox" value="{{p.id}}">
+        <div class="prod" data-gtype="{{p.garment_type}}" data-shop="{{p.shop_id}}">
+            <input class="select-checkbox" type="checkbox" value="{{p.shop_id}}:{{p.id}}">
             <div style="display: flex; align-items: center; gap: 1em;">
-                {% if p.images and p.images[0] %}
-                <img src="{{ p.images[0].src }}">
+                {% if p.image_src %}
+                <img src="{{ thumb_url(p.image_src) }}" loading="lazy" decoding="async" width="80" height="80" alt="">
                 {% endif %}
                 <div>
-                    <h2>{{ p.title }} <span class="default-size">(Large-Ref Size: {{ p.default_size }})</span></h2>
-                    <div style="color:#888;">{{ p.vendor }}</div>
+                    <h2>{{ p.title }} <span class="default-size">(Large-Ref Size: {{ p.default_size }})</span>{% if cost_drift and (p.shop_id|string ~ ':' ~ p.id) in cost_drift %} <span class="cost-drift" title="Variant costs changed since the prices were set">cost changed</span>{% endif %}</h2>
+                    <div style="color:#888;">{{ p.vendor }}{% if multi_shop %} &middot; <span class="shop-label">{{ shop_names.get(p.shop_id|string, p.shop_id) }}</span>{% endif %}</div>
                 </div>
             </div>
 
@@ -419,13 +1128,13 @@ def index():
                     </tr>
                 </thead>
                 <tbody>
-                    {% for v in p.variants %}
+                    {% for v in p.summary_variants %}
                     {% if v %}
                     {% set prof = v.price - v.cost %}
                     {% set percent = ((prof / v.price) * 100) | round if v.price > 0 else 0 %}
                     <tr>
-                        <td>{{ v.__size_title if v.__size_title is defined else 'N/A' }}</td>
-                        <td>{{ v.__color_title if v.__color_title is defined else 'N/A' }}</td>
+                        <td>{{ p.size_title(v) }}</td>
+                        <td>{{ p.color_title(v) }}</td>
                         <td>${{ '%.2f' % (v.price / 100) }}</td>
                         <td><span id="cost_{{v.id}}">{{ '%.2f' % (v.cost / 100) }}</span></td>
                         <td>${{ '%.2f' % (prof / 100) }}</td>
@@ -435,8 +1144,8 @@ def index():
                             </span>
                         </td>
                         <td>
-                            {% if v.get('shipping_cost') %}
-                                ${{ '%.2f' % (v.get('shipping_cost') / 100) }}
+                            {% if p.shipping_cost %}
+                                ${{ '%.2f' % (p.shipping_cost / 100) }}
                             {% else %}
                                 N/A
                             {% endif %}
@@ -449,6 +1158,7 @@ def index():
                         <td colspan="8">
                             <form class="editform" method="POST" action="{{ url_for('edit_price_all') }}">
                                 <input type="hidden" name="product_id" value="{{p.id}}">
+                                <input type="hidden" name="shop_id" value="{{p.shop_id}}">
                                 <input type="hidden" name="variant_id" value="{{v.id}}">
                                 <span class="editlabel">Retail:</span>
                                 $<input type="number" step="0.01" min="0" name="new_price" id="retail_{{p.id}}"
@@ -503,13 +1213,13 @@ def index():
                             </tr>
                         </thead>
                         <tbody>
-                            {% for av in p.all_variants %}
+                            {% for av in p.variants %}
                             {% if av.is_enabled %}
                             {% set a_prof = av.price - av.cost %}
                             {% set a_percent = ((a_prof / av.price) * 100) | round if av.price > 0 else 0 %}
                             <tr>
-                                <td>{{ av.__size_title if av.__size_title is defined else 'N/A' }}</td>
-                                <td>{{ av.__color_title if av.__color_title is defined else 'N/A' }}</td>
+                                <td>{{ p.size_title(av) }}</td>
+                                <td>{{ p.color_title(av) }}</td>
                                 <td>${{ '%.2f' % (av.price / 100) }}</td>
                                 <td>${{ '%.2f' % (av.cost / 100) }}</td>
                                 <td>${{ '%.2f' % (a_prof / 100) }}</td>
@@ -519,8 +1229,8 @@ def index():
                                     </span>
                                 </td>
                                 <td>
-                                    {% if av.get('shipping_cost') %}
-                                        ${{ '%.2f' % (av.get('shipping_cost') / 100) }}
+                                    {% if p.shipping_cost %}
+                                        ${{ '%.2f' % (p.shipping_cost / 100) }}
                                     {% else %}
                                         N/A
                                     {% endif %}
@@ -536,301 +1246,313 @@ def index():
         </div>
         {% endfor %}
 
-        <script>
-        let selectedProducts = [];
-        function updateBulkBar() {
-            let bar = document.getElementById("bulk-edit-bar");
-            if (selectedProducts.length > 0) {
-                bar.style.display = 'block';
-            } else {
-                bar.style.display = 'none';
-                document.getElementById("bulk_retail").value = "";
-                document.getElementById("bulk_profit").value = "";
-                document.getElementById("bulk_percent").value = "";
-            }
-            document.getElementById("bulk_count").innerText = selectedProducts.length;
-            document.getElementById("bulk_products").value = selectedProducts.join(",");
-        }
-        function updatePublishBar() {
-            let bar = document.getElementById("bulk-publish-bar");
-            if (selectedProducts.length > 0) {
-                bar.style.display = 'block';
-            } else {
-                bar.style.display = 'none';
-                document.getElementById("publish-status").style.display = "none";
-            }
-        }
-        function toggleProduct(id, checked) {
-            if (checked) {
-                if (!selectedProducts.includes(id)) selectedProducts.push(id);
-            } else {
-                selectedProducts = selectedProducts.filter(pid => pid !== id);
-            }
-            updateBulkBar();
-            updatePublishBar();
-        }
-        function selectAllVisible(checked) {
-            let products = document.querySelectorAll('.prod');
-            products.forEach(prod => {
-                if(prod.style.display !== "none") {
-                    let cb = prod.querySelector('.select-checkbox');
-                    cb.checked = checked;
-                    toggleProduct(cb.value, checked);
-                }
-            });
-        }
-        function clearSelections() {
-            selectedProducts = [];
-            document.querySelectorAll('.select-checkbox').forEach(cb=>{ cb.checked=false; });
-            updateBulkBar();
-            updatePublishBar();
-        }
-        function filterByType() {
-            var t = document.getElementById('gtype').value;
-            document.querySelectorAll('.prod').forEach(function(p){
-                var thisType = p.getAttribute('data-gtype');
-                p.style.display = (!t || t=='all' || thisType==t) ? '' : 'none';
-            });
-        }
-        function showEdit(id) { document.getElementById("editbox_" + id).style.display = ""; }
-        function hideEdit(id) { document.getElementById("editbox_" + id).style.display = "none"; }
-        function updateFromProfit(id, costId, retailId, profitId, percentId) {
-            let cost = parseFloat(document.getElementById(costId).textContent);
-            let profit = parseFloat(document.getElementById(profitId).value);
-            let retail = cost + profit;
-            document.getElementById(retailId).value = retail.toFixed(2);
-            let percent = (profit / retail) * 100;
-            document.getElementById(percentId).value = isFinite(percent) ? Math.round(percent) : 0;
-        }
-        function updateFromPercent(id, costId, retailId, profitId, percentId) {
-            let cost = parseFloat(document.getElementById(costId).textContent);
-            let percent = parseFloat(document.getElementById(percentId).value);
-            let retail = cost / (1 - percent/100);
-            let profit = retail - cost;
-            document.getElementById(retailId).value = retail.toFixed(2);
-            document.getElementById(profitId).value = profit.toFixed(2);
-        }
-        function updateFromRetail(id, costId, retailId, profitId, percentId) {
-            let cost = parseFloat(document.getElementById(costId).textContent);
-            let retail = parseFloat(document.getElementById(retailId).value);
-            let profit = retail - cost;
-            let percent = (profit / retail) * 100;
-            document.getElementById(profitId).value = profit.toFixed(2);
-            document.getElementById(percentId).value = isFinite(percent) ? Math.round(percent) : 0;
-        }
-        function toggleAllVariants(id){
-            const el = document.getElementById('allvars_' + id);
-            const btn = document.getElementById('expand_btn_' + id);
-            if(el.style.display === 'none' || el.style.display === ''){
-                el.style.display = 'block';
-                if(btn) btn.textContent = 'Hide all variants';
-            } else {
-                el.style.display = 'none';
-                if(btn) btn.textContent = 'Show all variants';
-            }
-        }
-        document.addEventListener("DOMContentLoaded", function() {
-            document.getElementById("gtype").addEventListener("change", function(){
-                filterByType();
-                clearSelections();
-            });
-            document.getElementById("select-all-cb").addEventListener("change", function() {
-                selectAllVisible(this.checked);
-            });
-            document.getElementById("bulk-cancel").addEventListener("click", function() {
-                clearSelections();
-            });
-            document.querySelectorAll('.select-checkbox').forEach(cb=>{
-                cb.addEventListener("change", function() {
-                    toggleProduct(cb.value, cb.checked);
-                });
-            });
-            filterByType();
-            updateBulkBar();
-            updatePublishBar();
-            let closeBtn = document.getElementById('close-job-msg');
-            if (closeBtn) {
-                closeBtn.addEventListener('click', function() {
-                    document.getElementById('job-flash-messages').style.display = 'none';
-                });
-            }
-            // Publish action
-            document.getElementById("bulk-publish-btn").addEventListener("click", async function() {
-                if(selectedProducts.length === 0) return;
-                let status = document.getElementById("publish-status");
-                status.style.display = "inline";
-                status.textContent = "Publishing...";
-                let resp = await fetch("{{ url_for('publish_selected') }}", {
-                    method: "POST",
-                    headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({ product_ids: selectedProducts })
-                });
-                let data = await resp.json();
-                let msgs = data.results.map(
-                    r => r.success
-                        ? `✔️ ${r.title || r.id}: Published`
-                        : `❌ ${r.title || r.id}: ${r.error || 'Failed'}`
-                ).join(" | ");
-                status.textContent = msgs;
-            });
-        });
-        </script>
+        <script src="{{ asset_url('dashboard.js') }}"></script>
     </body>
     </html>'''
 
-    # Attach shipping to both summary variant and all variants
-    for prod in detailed:
-        provider_id = prod.get("provider_id")
-        print_area_key = prod.get("print_area_key")
-        ship_cost = get_variant_shipping_cost(provider_id, print_area_key)
-        for v in prod.get("variants", []):
-            if v is not None:
-                v["shipping_cost"] = ship_cost
-        for av in prod.get("all_variants", []):
-            av["shipping_cost"] = ship_cost
+BLUEPRINTS_HTML = '''
+    <h2>Printify Blueprint Catalog</h2>
+    <form method="GET" action="{{ url_for('blueprint_browser') }}">
+        <input type="text" name="q" value="{{ query }}" placeholder="Title, brand, model or id" autofocus>
+        <button type="submit">Search</button>
+        &nbsp; <a href="{{ url_for('index') }}">Dashboard</a>
+    </form>
+    <p>{{ results|length }} of {{ total }} blueprints{% if query %} matching "{{ query }}"{% endif %}.</p>
+    <table border="1" cellpadding="6" cellspacing="0">
+        <tr><th>ID</th><th>Title</th><th>Brand</th><th>Model</th></tr>
+        {% for bp in results %}
+        <tr>
+            <td><a href="{{ url_for('blueprint_detail', blueprint_id=bp.id) }}">{{ bp.id }}</a></td>
+            <td>{{ bp.title }}</td>
+            <td>{{ bp.brand }}</td>
+            <td>{{ bp.model }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+    '''
+
+DEFAULT_VARIANTS_HTML = '''
+    <h2>Printify Product Default Variants</h2>
+    <p>
+        <a href="{{ url_for('default_variant_report', fmt='json', shop=current_shop) }}">JSON</a> |
+        <a href="{{ url_for('default_variant_report', fmt='csv', shop=current_shop) }}">CSV</a> |
+        <a href="{{ url_for('index', shop=current_shop) }}">Dashboard</a>
+    </p>
+    <table border="1" cellpadding="6" cellspacing="0">
+        <tr>
+            {% if multi_shop %}<th>Shop</th>{% endif %}
+            <th>Product Title</th>
+            <th>Product ID</th>
+            <th>Default Variant ID</th>
+            <th>Size</th>
+            <th>Color</th>
+            <th>Retail</th>
+            <th>Dashboard Key Variant</th>
+        </tr>
+        {% for p in rows %}
+        <tr>
+            {% if multi_shop %}<td>{{ shop_names.get(p.shop_id|string, p.shop_id) }}</td>{% endif %}
+            <td>{{p.title}}</td>
+            <td>{{p.product_id}}</td>
+            <td>{{p.variant_id}}</td>
+            <td>{{p.size}}</td>
+            <td>{{p.color}}</td>
+            <td>{% if p.price is not none %}${{ '%.2f' % (p.price / 100) }}{% else %}N/A{% endif %}</td>
+            <td>{{p.key_variant_id}}{% if p.is_key_variant %} (same){% endif %}</td>
+        </tr>
+        {% endfor %}
+    </table>
+    '''
+
+ANALYTICS_HTML = '''
+    <h2>Margin Analytics</h2>
+    <form method="GET" action="{{ url_for('margin_analytics_view') }}">
+        {% if shops|length > 1 %}
+        <select name="shop">
+            {% for s in shops %}<option value="{{ s.id }}" {% if current_shop == s.id|string %}selected{% endif %}>{{ s.title }}</option>{% endfor %}
+            <option value="all" {% if current_shop == 'all' %}selected{% endif %}>All shops</option>
+        </select>
+        {% endif %}
+        <select name="garment_type">
+            <option value="">All garment types</option>
+            {% for name in garment_types %}<option {% if name == garment_type %}selected{% endif %}>{{ name }}</option>{% endfor %}
+        </select>
+        <button type="submit">Show</button>
+        &nbsp; <a href="{{ url_for('margin_analytics_api', shop=current_shop, garment_type=garment_type) }}">JSON</a> |
+        <a href="{{ url_for('index', shop=current_shop) }}">Dashboard</a>
+    </form>
+    {% macro money(c) %}{% if c is not none %}${{ '%.2f' % (c / 100) }}{% else %}N/A{% endif %}{% endmacro %}
+    {% macro pct(m) %}{% if m is not none %}{{ '%.1f' % m }}%{% else %}N/A{% endif %}{% endmacro %}
+    {% set o = report.overall %}
+    <p>{{ o.variants }} enabled variants in {{ o.products }} products; shipping known for {{ o.shipping_known_variants }}.
+       <span style="color:#888;">Computed in {{ report.compute_ms }} ms.</span></p>
+    <table border="1" cellpadding="6" cellspacing="0">
+        <tr><th rowspan="2">Garment type</th><th rowspan="2">Variants</th>
+            <th colspan="3">Margin</th><th colspan="3">Profit</th><th colspan="2">Profit after shipping</th></tr>
+        <tr><th>P10</th><th>Median</th><th>P90</th><th>P10</th><th>Median</th><th>Mean</th><th>Median</th><th>Mean</th></tr>
+        {% for name, g in [('All', o)] + report.garment_types|dictsort %}
+        <tr{% if loop.first %} style="font-weight:bold;"{% endif %}>
+            <td>{{ name }}</td><td>{{ g.variants }}</td>
+            {% if g.margin %}
+            <td>{{ pct(g.margin.p10) }}</td><td>{{ pct(g.margin.median) }}</td><td>{{ pct(g.margin.p90) }}</td>
+            <td>{{ money(g.profit.p10) }}</td><td>{{ money(g.profit.median) }}</td><td>{{ money(g.profit.mean) }}</td>
+            {% else %}<td colspan="6">No priced variants</td>{% endif %}
+            {% if g.shipping_adjusted_profit %}
+            <td>{{ money(g.shipping_adjusted_profit.median) }}</td><td>{{ money(g.shipping_adjusted_profit.mean) }}</td>
+            {% else %}<td colspan="2">N/A</td>{% endif %}
+        </tr>
+        {% endfor %}
+    </table>
+
+    <h3>Margin distribution</h3>
+    <table border="1" cellpadding="6" cellspacing="0">
+        <tr>{% for b in o.margin_histogram %}<th>{% if b.from is not defined %}&lt; {{ b.to }}%{% elif b.to is none %}{{ b.from }}%+{% else %}{{ b.from }}–{{ b.to }}%{% endif %}</th>{% endfor %}</tr>
+        <tr>{% for b in o.margin_histogram %}<td>{{ b.variants }}</td>{% endfor %}</tr>
+    </table>
+
+    <h3>Exposure to cost increases</h3>
+    <table border="1" cellpadding="6" cellspacing="0">
+        <tr><th>Cost increase</th><th>Variants below cost</th><th>Variants under {{ report.settings.min_margin|round|int }}% margin</th><th>Profit change (one sale of each)</th></tr>
+        {% for e in o.cost_exposure %}
+        <tr><td>+{{ e.increase }}%</td><td>{{ e.below_cost }}</td><td>{{ e.below_min_margin }}</td><td>{{ money(e.profit_change) }}</td></tr>
+        {% endfor %}
+    </table>
+
+    <h3>Lowest-margin variants</h3>
+    <table border="1" cellpadding="6" cellspacing="0">
+        <tr>{% if multi_shop %}<th>Shop</th>{% endif %}<th>Product</th><th>Garment type</th><th>Size</th><th>Color</th>
+            <th>Retail</th><th>Cost</th><th>Profit</th><th>Margin</th><th>Profit after shipping</th></tr>
+        {% for r in report.lowest_margin %}
+        <tr>
+            {% if multi_shop %}<td>{{ shop_names.get(r.shop_id|string, r.shop_id) }}</td>{% endif %}
+            <td>{{ r.title }}</td><td>{{ r.garment_type }}</td><td>{{ r.size }}</td><td>{{ r.color }}</td>
+            <td>{{ money(r.price) }}</td><td>{{ money(r.cost) }}</td><td>{{ money(r.profit) }}</td>
+            <td{% if r.margin < report.settings.min_margin %} style="color:#c00;"{% endif %}>{{ pct(r.margin) }}</td>
+            <td>{{ money(r.shipping_adjusted_profit) }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+    '''
 
-    return render_template_string(html, products=detailed, found_types=found_types, messages=messages)
+# ---------- Flask routes ----------
 
-@app.route("/bulk_edit", methods=["POST"])
-def bulk_edit():
-    product_ids = request.form.get("product_ids", "")
-    retail_val = request.form.get("retail_val", "").strip()
-    profit_val = request.form.get("profit_val", "").strip()
-    percent_val = request.form.get("percent_val", "").strip()
-    flat_prices = request.form.get("flat_prices") is not None  # checkbox present => True
+@app.route("/", methods=["GET"])
+def index():
+    messages = get_flashed_messages(with_categories=True)
+    selection = request.args.get("shop") or ""
+    try:
+        shop_ids = resolve_shop_ids(selection)
+    except Exception as e:
+        return str(e), 400
+    if request.args.get("stream") == "1":
+        return stream_index(messages, shop_ids, selection)
+    try:
+        detailed, found_types, snapshot = dashboard_catalog(shop_ids, force=request.args.get("refresh") == "1")
+    except Exception as e:
+        return unavailable_page(e)
 
-    if not product_ids:
-        flash("No products selected.", "error")
-        return redirect(url_for("index"))
-    ids = [pid for pid in product_ids.split(",") if pid]
+    cost_drift = drifted_refs(detailed)
+    etag = None if messages else dashboard_etag(shop_ids, selection, snapshot, cost_drift)
+    if etag and request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
 
+    for prod in detailed:
+        try:
+            attach_shipping_cost(prod)
+        except Exception:
+            pass  # shipping shows as N/A while Printify is unreachable
+
+    resp = app.make_response(render_template_string(
+        DASHBOARD_HTML, products=detailed, found_types=found_types, messages=messages,
+        snapshot=snapshot, cost_drift=cost_drift, **shop_context(shop_ids, selection)))
+    return with_dashboard_etag(resp, etag)
+
+# Part of every dashboard ETag: a new template or asset invalidates cached pages
+DASHBOARD_VERSION = hashlib.sha256((DASHBOARD_HTML + assets.version).encode()).hexdigest()[:12]
+
+def dashboard_etag(shop_ids, selection, snapshot, cost_drift):
+    """
+    Weak ETag of a dashboard page, from the catalog snapshot version instead of
+    the rendered body, so an unchanged dashboard is answered 304 before rendering.
+    The snapshot age is left out; the page works it out from loaded_at.
+    """
+    state = [DASHBOARD_VERSION, selection, [str(s) for s in shop_ids], catalog_version(shop_ids),
+             snapshot["loaded_at"], snapshot["refreshing"], snapshot["circuit"], snapshot["error"], sorted(cost_drift)]
+    return hashlib.sha1(json.dumps(state, default=str).encode()).hexdigest()
+
+def not_modified(etag):
+    resp = Response(status=304)
+    return with_dashboard_etag(resp, etag)
+
+def with_dashboard_etag(resp, etag):
+    # always revalidate: the page is cheap to confirm and must not outlive a price change
+    resp.headers["Cache-Control"] = "no-cache"
+    if etag:
+        resp.set_etag(etag, weak=True)
+    return resp
+
+def unavailable_page(error):
+    """(body, status, headers) for a dashboard that has nothing cached to fall back on."""
+    headers = {}
+    if isinstance(error, CircuitOpenError):
+        headers["Retry-After"] = str(int(printify_breaker.reset_seconds))
+    return f"<b>Printify is not reachable right now and no catalog is cached yet.</b><br>{error}", 503, headers
+
+def drifted_refs(products):
+    """Refs of the products whose costs moved, for the dashboard's drift badges."""
     try:
-        shop_id, detailed, _ = get_shop_and_products()
+        return {product_ref(r["shop_id"], r["id"]) for r in drift_report(products)}
     except Exception as e:
-        flash(str(e), "error")
-        return redirect(url_for("index"))
+        print(f"[WARN] Could not check cost drift: {e}")
+        return set()
+
+def shop_context(shop_ids, selection):
+    """Template variables for the shop selector and per-card shop labels."""
+    return {
+        "shops": get_shops(),
+        "current_shop": selection or str(shop_ids[0]),
+        "multi_shop": len(shop_ids) > 1,
+        "shop_names": shop_titles(),
+    }
+
+def stream_index(messages, shop_ids, selection=""):
+    """
+    Streaming dashboard: header, filter bar and bulk bar go out with the first
+    chunk, then each product card is flushed as soon as its detail fetch returns.
+    """
+    try:
+        summaries = list_catalog_summaries(shop_ids)
+        # The list endpoint already carries blueprint_id, so the filter bar can be
+        # rendered before any detail fetch completes.
+        found_types = sorted({garment_type_for(p.get("blueprint_id")) for products in summaries.values() for p in products})
+    except Exception as e:
+        return str(e), 400
 
-    product_lookup = {str(p['id']): p.get('title', str(p['id'])) for p in detailed}
-    set_count = sum(1 for x in [retail_val, profit_val, percent_val] if x)
-    if set_count != 1:
-        flash("Set either Retail, Profit, or Margin %, not more than one.", "error")
-        return redirect(url_for("index"))
+    def cards():
+        for detailed in iter_catalog_details(summaries):
+            attach_shipping_cost(detailed)
+            yield detailed
 
-    summary_lines = []
+    resp = Response(stream_template_string(DASHBOARD_HTML, products=cards(), found_types=found_types, messages=messages,
+                                           **shop_context(shop_ids, selection)))
+    # Keep reverse proxies from buffering the whole page before sending it on
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
 
-    for pid in ids:
-        variants = []
-        updated = []
-        product_options = []
+def parse_bulk_form(form):
+    """(mode, value, flat_prices, msg_title) from the bulk editor form; raises ValueError with the flash message."""
+    retail_val = form.get("retail_val", "").strip()
+    profit_val = form.get("profit_val", "").strip()
+    percent_val = form.get("percent_val", "").strip()
+    flat_prices = form.get("flat_prices") is not None  # checkbox present => True
 
-        # Fetch product (we need variants & Large sometimes)
-        prod_resp = requests.get(
-            f"https://api.printify.com/v1/shops/{shop_id}/products/{pid}.json",
-            headers={"Authorization": f"Bearer {API_KEY}"}
-        )
-        prod_data = prod_resp.json()
-        product_options = prod_data.get("options", []) or []
-        variants = prod_data.get("variants", []) or []
-        large_variant = get_large_variant(variants, product_options)
-        large_cost = (large_variant.get("cost", 0) / 100) if large_variant else 0.0
-
-        if retail_val:
-            target_retail = float(retail_val)
-            if flat_prices:
-                updated = build_uniform_update(variants, target_retail)
-                resp = requests.put(
-                    f"https://api.printify.com/v1/shops/{shop_id}/products/{pid}.json",
-                    headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
-                    json={"variants": updated}
-                )
-            else:
-                resp, variants, updated, product_options = update_all_prices_based_on_large(pid, shop_id, target_retail)
-            msg_title = f"Set Large-variant to retail: ${target_retail:.2f} ({'Flat' if flat_prices else 'others follow margin'})"
+    set_count = sum(1 for x in [retail_val, profit_val, percent_val] if x)
+    if set_count != 1:
+        raise ValueError("Set either Retail, Profit, or Margin %, not more than one.")
 
-        elif profit_val:
-            try:
-                value = float(profit_val)
-            except Exception:
-                flash("Invalid profit value.", "error")
-                return redirect(url_for("index"))
-
-            if flat_prices:
-                target_retail = large_cost + value
-                updated = build_uniform_update(variants, target_retail)
-            else:
-                updated = []
-                for v in variants:
-                    cost = v.get("cost", 0) / 100
-                    price = cost + value
-                    updated.append({
-                        "id": v["id"],
-                        "price": int(round(price * 100)),
-                        "is_enabled": v.get("is_enabled", True),
-                        "is_visible": v.get("is_visible", True)
-                    })
-            resp = requests.put(
-                f"https://api.printify.com/v1/shops/{shop_id}/products/{pid}.json",
-                headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
-                json={"variants": updated}
-            )
-            msg_title = f"Set all variants to profit: ${value:.2f} ({'Flat retail from Large' if flat_prices else 'per-variant'})"
+    if retail_val:
+        try:
+            mode, value = "retail", float(retail_val)
+        except Exception:
+            raise ValueError("Invalid retail value.")
+        msg_title = f"Set Large-variant to retail: ${value:.2f} ({'Flat' if flat_prices else 'others follow margin'})"
+    elif profit_val:
+        try:
+            mode, value = "profit", float(profit_val)
+        except Exception:
+            raise ValueError("Invalid profit value.")
+        msg_title = f"Set all variants to profit: ${value:.2f} ({'Flat retail from Large' if flat_prices else 'per-variant'})"
+    else:
+        try:
+            mode, value = "margin", float(percent_val)
+        except Exception:
+            raise ValueError("Invalid percent value.")
+        if value >= 100:
+            raise ValueError("Margin percent must be <100%.")
+        msg_title = f"Set all variants to margin: {round(value)}% ({'Flat retail from Large' if flat_prices else 'per-variant'})"
+    return mode, value, flat_prices, msg_title
 
-        elif percent_val:
-            try:
-                value = float(percent_val)
-                if value >= 100:
-                    flash("Margin percent must be <100%.", "error")
-                    return redirect(url_for("index"))
-            except Exception:
-                flash("Invalid percent value.", "error")
-                return redirect(url_for("index"))
-
-            margin = value / 100.0
-            if flat_prices:
-                target_retail = (large_cost / (1 - margin)) if margin < 1.0 else large_cost
-                updated = build_uniform_update(variants, target_retail)
-            else:
-                updated = []
-                for v in variants:
-                    v_cost = v.get("cost", 0) / 100
-                    v_price = round(v_cost / (1 - margin) + 0.00001, 2) if margin < 1.0 else v_cost
-                    updated.append({
-                        "id": v["id"],
-                        "price": int(round(v_price * 100)),
-                        "is_enabled": v.get("is_enabled", True),
-                        "is_visible": v.get("is_visible", True)
-                    })
-            resp = requests.put(
-                f"https://api.printify.com/v1/shops/{shop_id}/products/{pid}.json",
-                headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
-                json={"variants": updated}
-            )
-            msg_title = f"Set all variants to margin: {round(value)}% ({'Flat retail from Large' if flat_prices else 'per-variant'})"
+def bulk_edit_summary(msg_title, ordered, results, product_lookup, job_id):
+    """
+    Flash HTML (Markup) for a bulk edit; `results` maps (shop_id, product_id) to
+    reprice_product() results. Titles, options and Printify's errors are escaped.
+    """
+    summary_lines = []
+    counts = {"done": 0, "skipped": 0, "failed": 0, "rejected": 0}
+    msg_title = escape(msg_title)
 
-        else:
-            flash("No pricing field set.", "error")
-            return redirect(url_for("index"))
+    for shop_id, pid in ordered:
+        product_title = escape(product_lookup.get(product_ref(shop_id, pid), str(pid)))
+        res = results[(shop_id, pid)]
+        pid = escape(pid)
+        counts[res["status"]] = counts.get(res["status"], 0) + 1
 
-        product_title = product_lookup.get(str(pid), str(pid))
+        if res["status"] == "skipped":
+            summary_lines.append(f"<b>{product_title} ({pid}):</b> prices already match, nothing sent.<br>")
+            continue
 
-        if resp is None or resp.status_code != 200:
-            try:
-                err = resp.json()
-                if isinstance(err, dict) and err.get('code') == 8251:
-                    reason = err.get("errors", {}).get("reason", "")
-                    summary_lines.append(
-                        f"<b>{product_title} ({pid}): Failed to update:</b> {reason} "
-                        "<br><span style='color:#c00;'>You likely have >100 enabled variants (may include hidden/archived). Disable some in Printify, then try again.</span><br>"
-                    )
-                    continue
-            except Exception:
-                err = resp.text if resp is not None else "Unknown error"
-            summary_lines.append(f"<b>{product_title} ({pid}): Failed to update:</b> {err}<br>")
+        if res["status"] == "rejected":
+            summary_lines.append(f"<b>{product_title} ({pid}): Not sent, failed pre-flight checks:</b> {escape(res['error'])}<br>")
             continue
 
+        if res["status"] != "done":
+            err = res["error"]
+            if isinstance(err, dict) and err.get('code') == 8251:
+                reason = err.get("errors", {}).get("reason", "")
+                summary_lines.append(
+                    f"<b>{product_title} ({pid}): Failed to update:</b> {escape(reason)} "
+                    "<br><span style='color:#c00;'>You likely have >100 enabled variants (may include hidden/archived). Disable some in Printify, then try again.</span><br>"
+                )
+                continue
+            summary_lines.append(f"<b>{product_title} ({pid}): Failed to update:</b> {escape(err)}<br>")
+            continue
+
+        variants, updated = res["variants"], res["updated"]
+        changed_ids = {u["id"] for u in res["changed"]}
+
         # Ensure size/color labels are right in the confirmation
         for v in variants:
-            sz, col = extract_size_color_titles(v, product_options or [])
+            sz, col = extract_size_color_titles(v, res["product_options"])
             v["__size_title"] = sz
             v["__color_title"] = col
 
@@ -842,44 +1564,100 @@ def bulk_edit():
                 price = new_row["price"] / 100
                 profitx = price - cost
                 marginx = (profitx / price * 100) if price > 0 else 0
-                sz = v.get("__size_title", "N/A")
-                col = v.get("__color_title", "N/A")
+                sz = escape(v.get("__size_title", "N/A"))
+                col = escape(v.get("__color_title", "N/A"))
+                row_class = "updated-row" if v["id"] in changed_ids else ""
                 confirm_rows.append(
-                    f"<tr class='updated-row'><td>{sz}</td><td>{col}</td>"
+                    f"<tr class='{row_class}'><td>{sz}</td><td>{col}</td>"
                     f"<td>${price:.2f}</td><td>${cost:.2f}</td>"
                     f"<td>${profitx:.2f}</td><td>{round(marginx)}%</td></tr>"
                 )
 
+        trimmed = (res.get("preflight") or {}).get("trimmed") or []
+        trim_note = (f"<span style='color:#a60;'>Disabled {len(trimmed)} hidden variant(s) to stay within "
+                     f"Printify's enabled-variant limit.</span><br>") if trimmed else ""
         summary_lines.append(
             f"<b>{msg_title}</b><br>"
-            f"<b>{product_title} (Product ID: {pid})</b><br>"
+            f"<b>{product_title} (Product ID: {pid})</b> — {len(changed_ids)} of {len(updated)} variant prices changed<br>"
+            + trim_note +
             "<div class='scroll-table'><table style='width:100%;background:#f8fff8;'>"
             "<tr><th>Size</th><th>Color</th><th>Retail</th><th>Cost</th><th>Profit</th><th>Margin %</th></tr>"
             + "".join(confirm_rows) + "</table></div>"
         )
 
-    flash("<br>".join(summary_lines), "success")
-    return redirect(url_for("index"))
+    summary_lines.insert(
+        0, f"<b>Updated {counts['done']} product(s), skipped {counts['skipped']} unchanged, {counts['failed']} failed"
+           + (f", {counts['rejected']} rejected by pre-flight checks (nothing sent)" if counts["rejected"] else "") + ".</b> "
+           f"<span style='color:#888;'>(job {job_id}"
+           + (f"; undo with POST /api/snapshots/{job_id}/rollback" if counts["done"] else "") + ")</span><br>"
+    )
+    return Markup("<br>".join(summary_lines))
 
-@app.route("/edit_price_all", methods=["POST"])
-def edit_price_all():
-    product_id = request.form.get("product_id")
-    new_price = request.form.get("new_price")
-    profit_val = request.form.get("profit_val")
-    percent_val = request.form.get("percent_val")
-    flat_prices = request.form.get("flat_prices") is not None  # checkbox present => True
+@app.route("/bulk_edit", methods=["POST"])
+def bulk_edit():
+    product_ids = request.form.get("product_ids", "")
+    if not product_ids:
+        flash("No products selected.", "error")
+        return redirect(url_for("index"))
+    refs = [ref for ref in product_ids.split(",") if ref]
 
     try:
-        shop_id, _, _ = get_shop_and_products()
+        grouped = group_by_shop(refs)
+        detailed = get_cached_catalog(list(grouped))
     except Exception as e:
         flash(str(e), "error")
         return redirect(url_for("index"))
 
-    prod_resp = requests.get(
-        f"https://api.printify.com/v1/shops/{shop_id}/products/{product_id}.json",
-        headers={"Authorization": f"Bearer {API_KEY}"}
-    )
-    prod_data = prod_resp.json()
+    cached = {product_ref(p.shop_id, p.id): p for p in detailed}
+    product_lookup = {ref: p.title or str(p.id) for ref, p in cached.items()}
+    try:
+        mode, value, flat_prices, msg_title = parse_bulk_form(request.form)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("index"))
+
+    ordered = [(shop_id, pid) for shop_id, pids in grouped.items() for pid in pids]
+    journal = Journal.create("price", {"mode": mode, "value": value, "flat": flat_prices, "source": "bulk_edit"},
+                             [product_ref(shop_id, pid) for shop_id, pid in ordered])
+    snapshot = Snapshot.create("bulk_edit", journal.params, snapshot_id=journal.job_id)
+    rejected = preflight_rejections(ordered, cached, mode, value, flat_prices, journal)
+
+    def reprice_shop(shop_id):
+        out = {}
+        for pid in grouped[shop_id]:
+            if (shop_id, pid) in rejected:
+                out[pid] = rejected[(shop_id, pid)]
+                continue
+            try:
+                out[pid] = reprice_product(shop_id, pid, mode, value, flat_prices, journal=journal, snapshot=snapshot)
+                sync_cached_product(cached.get(product_ref(shop_id, pid)), out[pid])
+            except Exception as ex:
+                journal.record_outcome(product_ref(shop_id, pid), "failed", str(ex))
+                out[pid] = {"status": "failed", "error": str(ex)}
+        return out
+
+    # one worker per shop: shops progress side by side, each within its own budget
+    results = {}
+    for shop_id, out, _ in parallel_map(reprice_shop, list(grouped), max_workers=len(grouped)):
+        results.update({(shop_id, pid): res for pid, res in out.items()})
+
+    journal.finish()
+    flash(bulk_edit_summary(msg_title, ordered, results, product_lookup, journal.job_id), "success")
+    return redirect(url_for("index"))
+
+def edit_product_prices(shop_id, product_id, form):
+    """
+    The per-card editor: apply whichever of retail/profit/margin moved furthest from
+    the Large variant's current values. Returns (flash category, message); HTML
+    messages are Markup, with the variant options in them escaped.
+    """
+    new_price = form.get("new_price")
+    profit_val = form.get("profit_val")
+    percent_val = form.get("percent_val")
+    flat_prices = form.get("flat_prices") is not None  # checkbox present => True
+
+    prod_data = fetch_product(shop_id, product_id)
+    snapshot = Snapshot.create("edit_price_all", {"product_id": product_ref(shop_id, product_id)})
     product_options = prod_data.get("options", []) or []
     variants = prod_data.get("variants", []) or []
 
@@ -891,11 +1669,11 @@ def edit_price_all():
 
     large_variant = get_large_variant(variants, product_options)
     if not large_variant:
-        flash("No Large or fallback variant found.", "error")
-        return redirect(url_for("index"))
+        return "error", "No Large or fallback variant found."
 
     old_retail = large_variant.get("price", 0) / 100
     old_cost = large_variant.get("cost", 0) / 100
+    costs = [v.get("cost", 0) for v in variants]
     old_profit = old_retail - old_cost
     old_percent = (old_profit / old_retail * 100) if old_retail > 0 else 0
 
@@ -904,85 +1682,53 @@ def edit_price_all():
         new_profit = float(profit_val)
         new_percent = float(percent_val)
     except Exception:
-        flash("Invalid field values.", "error")
-        return redirect(url_for("index"))
+        return "error", "Invalid field values."
 
     diff_retail = abs(new_retail - old_retail)
     diff_profit = abs(new_profit - old_profit)
     diff_percent = abs(new_percent - old_percent)
 
-    # Choose the field that changed most
-    if diff_retail >= diff_profit and diff_retail >= diff_percent:
-        if flat_prices:
-            updated = build_uniform_update(variants, new_retail)
-            resp = requests.put(
-                f"https://api.printify.com/v1/shops/{shop_id}/products/{product_id}.json",
-                headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
-                json={"variants": updated}
-            )
-        else:
-            resp, variants2, updated, _ = update_all_prices_based_on_large(product_id, shop_id, new_retail)
-            if variants2:
-                variants = variants2
-        msg_title = f"Set Large-variant to retail: ${new_retail:.2f} ({'Flat' if flat_prices else 'others follow margin'})"
-
-    elif diff_profit >= diff_retail and diff_profit >= diff_percent:
-        value = new_profit
-        if flat_prices:
-            target_retail = old_cost + value  # compute from Large
-            updated = build_uniform_update(variants, target_retail)
-        else:
-            updated = []
-            for v in variants:
-                cost = v.get("cost", 0) / 100
-                price = cost + value
-                updated.append({
-                    "id": v["id"],
-                    "price": int(round(price * 100)),
-                    "is_enabled": v.get("is_enabled", True),
-                    "is_visible": v.get("is_visible", True)
-                })
-        resp = requests.put(
-            f"https://api.printify.com/v1/shops/{shop_id}/products/{product_id}.json",
-            headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
-            json={"variants": updated}
-        )
-        msg_title = f"Set all variants to profit: ${value:.2f} ({'Flat retail from Large' if flat_prices else 'per-variant'})"
+    try:
+        # Choose the field that changed most
+        if diff_retail >= diff_profit and diff_retail >= diff_percent:
+            # flat: every variant gets the retail; else the others follow the Large margin
+            prices = compute_prices(costs, large_variant.get("cost", 0), "retail", new_retail, flat_prices)
+            updated = build_price_update(variants, prices)
+            resp, sent = put_changed_prices(shop_id, product_id, variants, updated, snapshot)
+            msg_title = f"Set Large-variant to retail: ${new_retail:.2f} ({'Flat' if flat_prices else 'others follow margin'})"
+
+        elif diff_profit >= diff_retail and diff_profit >= diff_percent:
+            value = new_profit
+            # flat: retail computed from Large
+            prices = compute_prices(costs, large_variant.get("cost", 0), "profit", value, flat_prices)
+            updated = build_price_update(variants, prices)
+            resp, sent = put_changed_prices(shop_id, product_id, variants, updated, snapshot)
+            msg_title = f"Set all variants to profit: ${value:.2f} ({'Flat retail from Large' if flat_prices else 'per-variant'})"
 
-    else:
-        value = new_percent
-        margin = value / 100.0
-        if value >= 100:
-            flash("Margin percent must be <100%.", "error")
-            return redirect(url_for("index"))
-        if flat_prices:
-            target_retail = (old_cost / (1 - margin)) if margin < 1.0 else old_cost  # compute from Large
-            updated = build_uniform_update(variants, target_retail)
         else:
-            updated = []
-            for v in variants:
-                v_cost = v.get("cost", 0) / 100
-                v_price = round(v_cost / (1 - margin) + 0.00001, 2) if margin < 1.0 else v_cost
-                updated.append({
-                    "id": v["id"],
-                    "price": int(round(v_price * 100)),
-                    "is_enabled": v.get("is_enabled", True),
-                    "is_visible": v.get("is_visible", True)
-                })
-        resp = requests.put(
-            f"https://api.printify.com/v1/shops/{shop_id}/products/{product_id}.json",
-            headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
-            json={"variants": updated}
-        )
-        msg_title = f"Set all variants to margin: {round(value)}% ({'Flat retail from Large' if flat_prices else 'per-variant'})"
+            value = new_percent
+            if value >= 100:
+                return "error", "Margin percent must be <100%."
+            # flat: retail computed from Large
+            prices = compute_prices(costs, large_variant.get("cost", 0), "margin", value, flat_prices)
+            updated = build_price_update(variants, prices)
+            resp, sent = put_changed_prices(shop_id, product_id, variants, updated, snapshot)
+            msg_title = f"Set all variants to margin: {round(value)}% ({'Flat retail from Large' if flat_prices else 'per-variant'})"
+    except PreflightError as e:
+        return "error", f"Not sent to Printify, failed pre-flight checks: {e}"
+
+    changed_ids = {u["id"] for u in changed_price_rows(variants, updated)}
+    if updated and not changed_ids:
+        return "success", Markup(f"<b>{escape(msg_title)}</b><br>Prices already match; nothing was sent to Printify.")
 
     if resp is None or resp.status_code != 200:
         try:
             err = resp.json()
         except Exception:
-            err = resp.text
-        flash(f"Failed to update: {err}", "error")
-        return redirect(url_for("index"))
+            err = resp.text if resp is not None else "Unknown error"
+        return "error", f"Failed to update: {err}"
+    sync_cached_product(cached_product(shop_id, product_id),
+                        {"status": "done", "payload": sent, "changed": sent, "resp": resp})
 
     # Re-annotate just in case
     for v in variants:
@@ -998,22 +1744,35 @@ def edit_price_all():
             price = new_row["price"] / 100
             profit = price - cost
             margin = (profit / price * 100) if price > 0 else 0
-            sz = v.get("__size_title", "N/A")
-            col = v.get("__color_title", "N/A")
+            sz = escape(v.get("__size_title", "N/A"))
+            col = escape(v.get("__color_title", "N/A"))
+            row_class = "updated-row" if v["id"] in changed_ids else ""
             confirm_rows.append(
-                f"<tr class='updated-row'><td>{sz}</td><td>{col}</td>"
+                f"<tr class='{row_class}'><td>{sz}</td><td>{col}</td>"
                 f"<td>${price:.2f}</td><td>${cost:.2f}</td>"
                 f"<td>${profit:.2f}</td><td>{round(margin)}%</td></tr>"
             )
 
-    table = (
-        f"<b>{msg_title}</b><br>"
-        "<b>All variants updated. Changes are in Printify, not yet published in your store.</b>"
+    table = Markup(
+        f"<b>{escape(msg_title)}</b><br>"
+        f"<b>{len(changed_ids)} of {len(updated)} variant prices updated. Changes are in Printify, not yet published in your store.</b>"
+        f"<br><span style='color:#888;'>Old prices saved as snapshot {snapshot.snapshot_id} "
+        f"(undo with POST /api/snapshots/{snapshot.snapshot_id}/rollback).</span>"
         "<div class='scroll-table'><table style='width:100%;background:#f8fff8;'>"
         "<tr><th>Size</th><th>Color</th><th>Retail</th><th>Cost</th><th>Profit</th><th>Margin %</th></tr>"
         + "".join(confirm_rows) + "</table></div>"
     )
-    flash(table, "success")
+    return "success", table
+
+@app.route("/edit_price_all", methods=["POST"])
+def edit_price_all():
+    try:
+        shop_id = request.form.get("shop_id") or get_shop_id()
+    except Exception as e:
+        flash(str(e), "error")
+        return redirect(url_for("index"))
+    category, message = edit_product_prices(shop_id, request.form.get("product_id"), request.form)
+    flash(message, category)
     return redirect(url_for("index"))
 
 @app.route("/publish_selected", methods=["POST"])
@@ -1022,36 +1781,1048 @@ def publish_selected():
     product_ids = data.get("product_ids", [])
 
     try:
-        shop_id, detailed, _ = get_shop_and_products()
+        grouped = group_by_shop(product_ids)
+        detailed = get_cached_catalog(list(grouped))
     except Exception as e:
         return jsonify({"results": [{"id": None, "success": False, "error": str(e)}]}), 500
 
-    id_title = {str(p["id"]): p.get("title", "") for p in detailed}
+    id_title = {product_ref(p.shop_id, p.id): p.title for p in detailed}
+    ordered = [(shop_id, pid) for shop_id, pids in grouped.items() for pid in pids]
+    journal = Journal.create("publish", {"retail_price": True}, [product_ref(s, p) for s, p in ordered])
+
+    def publish_shop(shop_id):
+        out = {}
+        for pid in grouped[shop_id]:
+            key = product_ref(shop_id, pid)
+            journal.record_intent(key, None, {"retail_price": True})
+            out[pid] = publish_product(shop_id, pid)
+            journal.record_outcome(key, "done" if out[pid][0] else "failed", out[pid][1])
+        return out
+
+    by_shop = {}
+    for shop_id, out, _ in parallel_map(publish_shop, list(grouped), max_workers=len(grouped)):
+        by_shop[shop_id] = out or {}
+
+    outcomes = {(shop_id, pid): res for shop_id, out in by_shop.items() for pid, res in out.items()}
+    journal.finish()
+    return jsonify({"results": publish_results(ordered, outcomes, id_title), "job_id": journal.job_id})
+
+def publish_results(ordered, outcomes, id_title):
+    """Per-product JSON rows for a publish; `outcomes` maps (shop_id, product_id) to (success, error)."""
     results = []
-    for pid in product_ids:
-        try:
-            publish_resp = requests.post(
-                f"https://api.printify.com/v1/shops/{shop_id}/products/{pid}/publish.json",
-                headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
-                json={
-                    "title": False,
-                    "description": False,
-                    "images": False,
-                    "variants": False,
-                    "tags": False,
-                    "keyFeatures": False,
-                    "shipping_template": False,
-                    "retail_price": True
-                }
-            )
-            if publish_resp.status_code == 200:
-                results.append({"id": pid, "title": id_title.get(str(pid), ""), "success": True})
-            else:
-                err_msg = publish_resp.json() if publish_resp.content else publish_resp.text
-                results.append({"id": pid, "title": id_title.get(str(pid), ""), "success": False, "error": str(err_msg)})
-        except Exception as ex:
-            results.append({"id": pid, "title": id_title.get(str(pid), ""), "success": False, "error": str(ex)})
-    return jsonify({"results": results})
+    for shop_id, pid in ordered:
+        ok, error = outcomes.get((shop_id, pid), (False, "Not attempted"))
+        title = id_title.get(product_ref(shop_id, pid), "")
+        if ok:
+            results.append({"id": pid, "shop_id": shop_id, "title": title, "success": True})
+        else:
+            results.append({"id": pid, "shop_id": shop_id, "title": title, "success": False, "error": error})
+    return results
+
+def parse_pricing_request(data):
+    """Validate a JSON pricing request: selection + mode/value/flat. Raises ValueError."""
+    mode = (data.get("mode") or "").lower()
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}.")
+    try:
+        value = float(data.get("value"))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {mode} value.")
+    if value < 0:
+        raise ValueError(f"Invalid {mode} value.")
+    if mode == "margin" and value >= 100:
+        raise ValueError("Margin percent must be <100%.")
+    return mode, value, bool(data.get("flat"))
+
+def preview_selection(data):
+    """Run the pricing math over the cached catalog for a JSON request; no Printify calls once cached."""
+    mode, value, flat = parse_pricing_request(data)
+    products = get_cached_catalog(resolve_shop_ids(data.get("shop")))
+    selected = select_products(
+        products,
+        product_ids=data.get("product_ids"),
+        garment_type=data.get("garment_type"),
+        blueprint_id=data.get("blueprint_id"),
+    )
+    previews = [preview_product(p, mode, value, flat) for p in selected]
+    return selected, previews
+
+def price_preview_payload(data):
+    """(JSON body, status) for /api/price_preview."""
+    started = time.perf_counter()
+    try:
+        selected, previews = preview_selection(data)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        return {"error": str(e)}, 500
+    for product, preview in zip(selected, previews):
+        if preview["changed_variants"]:
+            preview["preflight"] = local_preflight(product, [r["price_after"] for r in preview["variants"]]).to_dict()
+    if data.get("changed_only"):
+        previews = [p for p in previews if p["changed_variants"]]
+    return {
+        "products": previews,
+        "summary": {
+            "products": len(previews),
+            "changed_products": sum(1 for p in previews if p["changed_variants"]),
+            "variants": sum(len(p["variants"]) for p in previews),
+            "changed_variants": sum(p["changed_variants"] for p in previews),
+            "rejected_products": sum(1 for p in previews if not p.get("preflight", {"ok": True})["ok"]),
+            "trimmed_products": sum(1 for p in previews if p.get("preflight", {}).get("trimmed")),
+        },
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }, 200
+
+@app.route("/api/price_preview", methods=["POST"])
+def price_preview():
+    body, status = price_preview_payload(request.get_json(silent=True) or {})
+    return jsonify(body), status
+
+def plan_price_apply(data):
+    """
+    (mode, value, flat, selected, changed, rejected) for an apply request: `changed`
+    are the selected cached Products whose computed prices differ, `rejected` maps
+    (shop_id, product_id) of those that fail pre-flight to their result. Raises ValueError.
+    """
+    mode, value, flat = parse_pricing_request(data)
+    selected, previews = preview_selection(data)
+    changed = []
+    rejected = {}
+    for product, preview in zip(selected, previews):
+        if not preview["changed_variants"]:
+            continue
+        changed.append(product)
+        checked = local_preflight(product, [r["price_after"] for r in preview["variants"]])
+        if not checked.ok:
+            rejected[(product.shop_id, product.id)] = rejected_result(product.id, checked)
+    return mode, value, flat, selected, changed, rejected
+
+def price_apply_payload(selected, changed, outcomes, job_id):
+    """JSON body for an apply; `outcomes` maps (shop_id, product_id) to reprice_product() results."""
+    skipped = len(selected) - len(changed)
+    results = []
+    for product in changed:
+        res = outcomes.get((product.shop_id, product.id), {"status": "failed", "error": "Not attempted"})
+        row = {"id": product.id, "shop_id": product.shop_id, "title": product.title}
+        if res["status"] == "skipped":
+            skipped += 1
+        elif res["status"] == "done":
+            results.append(dict(row, success=True, changed_variants=len(res["changed"])))
+        else:
+            results.append(dict(row, success=False, status=res["status"], error=str(res["error"])))
+    return {"results": results, "skipped": skipped, "job_id": job_id,
+            "updated": sum(1 for r in results if r["success"]),
+            "rejected": sum(1 for r in results if r.get("status") == "rejected")}
+
+@app.route("/api/price_apply", methods=["POST"])
+def price_apply():
+    """Diff-only apply: PUT just the products whose computed prices differ from the cached ones."""
+    data = request.get_json(silent=True) or {}
+    try:
+        mode, value, flat, selected, changed, rejected = plan_price_apply(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    journal = Journal.create(
+        "price",
+        {"mode": mode, "value": value, "flat": flat, "source": "price_apply"},
+        [product_ref(product.shop_id, product.id) for product in changed]
+    )
+    snapshot = Snapshot.create("price_apply", journal.params, snapshot_id=journal.job_id)
+    for (shop_id, pid), res in rejected.items():
+        journal.record_outcome(product_ref(shop_id, pid), "rejected", res["error"])
+    by_shop = {}
+    for product in changed:
+        if (product.shop_id, product.id) not in rejected:
+            by_shop.setdefault(product.shop_id, []).append(product)
+
+    def apply_one(product):
+        """Re-read right before writing: a product edited elsewhere since the cached
+        load comes back as a conflict instead of being overwritten."""
+        res = reprice_product(product.shop_id, product.id, mode, value, flat, journal=journal,
+                              expected_updated_at=product.updated_at, snapshot=snapshot)
+        sync_cached_product(product, res)
+        return res
+
+    def apply_shop(shop_id):
+        out = {}
+        for product in by_shop[shop_id]:
+            try:
+                out[product.id] = apply_one(product)
+            except Exception as ex:
+                journal.record_outcome(product_ref(shop_id, product.id), "failed", str(ex))
+                out[product.id] = {"status": "failed", "error": str(ex)}
+        return out
+
+    outcomes = dict(rejected)
+    for shop_id, out, _ in parallel_map(apply_shop, list(by_shop), max_workers=len(by_shop) or 1):
+        outcomes.update({(shop_id, pid): res for pid, res in (out or {}).items()})
+    journal.finish()
+    return jsonify(price_apply_payload(selected, changed, outcomes, journal.job_id))
+
+@app.route("/export/prices.<fmt>", methods=["GET"])
+def export_price_sheet(fmt):
+    """Every variant of the selected shop(s) as a CSV or Parquet price sheet, written product by product."""
+    if fmt not in FORMATS:
+        return f"Unknown format {fmt}; use one of {', '.join(FORMATS)}.", 404
+    try:
+        products = get_cached_catalog(resolve_shop_ids(request.args.get("shop")))
+    except Exception as e:
+        return str(e), 400
+    filename = f"printify-prices.{fmt}"
+    if fmt == "csv":
+        resp = Response(iter_csv(products, prepare=attach_shipping_cost), mimetype="text/csv")
+        resp.headers["Content-Disposition"] = f"attachment; filename={filename}"
+        return resp
+    # Parquet needs a seekable sink: spool row groups to disk, then stream the file
+    sink = tempfile.TemporaryFile()
+    try:
+        write_parquet(products, sink, prepare=attach_shipping_cost)
+    except SheetError as e:
+        sink.close()
+        return str(e), 501
+    sink.seek(0)
+    return send_file(sink, mimetype="application/vnd.apache.parquet", as_attachment=True, download_name=filename)
+
+def sheet_format(upload, fmt=None):
+    fmt = (fmt or "").lower()
+    if not fmt and upload is not None and upload.filename:
+        fmt = upload.filename.rsplit(".", 1)[-1].lower()
+    return fmt if fmt in FORMATS else "csv"
+
+def price_sheet_payload(stream, fmt, shop_selection=None, dry_run=False):
+    """
+    (JSON body, status) for a price sheet import: rows are validated against the
+    cached catalog and only prices that differ are sent, products in parallel.
+    A sheet with any invalid row is rejected as a whole; `dry_run` returns the diff.
+    """
+    try:
+        shop_ids = resolve_shop_ids(shop_selection)
+        products = get_cached_catalog(shop_ids)
+        changes, errors, stats = diff_sheet(read_rows(stream, fmt), products, shop_ids[0])
+    except SheetError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+    stats["changed_products"] = len(changes)
+    stats["changed_variants"] = sum(len(prices) for prices in changes.values())
+    if errors:
+        return {"error": "The price sheet has invalid rows; nothing was applied.",
+                "errors": errors, "summary": stats}, 400
+    if dry_run:
+        return {"summary": stats, "products": describe_changes(changes, products)}, 200
+    if not changes:
+        return {"summary": stats, "results": [], "updated": 0, "skipped": 0, "job_id": None}, 200
+
+    body = apply_price_changes(changes, products, "price_sheet")
+    body["summary"] = stats
+    return body, 200
+
+def apply_price_changes(changes, products, source):
+    """
+    Write explicit prices {(shop_id, product_id): {variant_id: cents}} for cached
+    `products`, several at a time, as one journaled "sheet" job. Returns the JSON
+    body: results (updated and failed products), updated, skipped and job_id.
+    """
+    catalog = {(str(p.shop_id), str(p.id)): p for p in products}
+    journal = Journal.create(
+        "sheet",
+        {"source": source, "prices": {product_ref(s, pid): prices for (s, pid), prices in changes.items()}},
+        [product_ref(s, pid) for s, pid in changes]
+    )
+    snapshot = Snapshot.create(source, {"source": source}, snapshot_id=journal.job_id)
+    results = []
+    todo = []
+    for key, prices in changes.items():
+        product = catalog[key]
+        checked = local_preflight(product, [prices.get(v.id, prices.get(str(v.id), v.price)) for v in product.variants])
+        if checked.ok:
+            todo.append(key)
+            continue
+        journal.record_outcome(product_ref(*key), "rejected", checked.message())
+        results.append({"id": key[1], "shop_id": key[0], "title": product.title, "success": False,
+                        "status": "rejected", "error": checked.message()})
+
+    def apply_one(key):
+        product = catalog[key]
+        res = set_product_prices(key[0], key[1], changes[key], journal=journal,
+                                 expected_updated_at=product.updated_at, snapshot=snapshot)
+        sync_cached_product(product, res)
+        return res
+
+    skipped = 0
+    for key, res, error in parallel_map(apply_one, todo, max_workers=SHEET_WORKERS):
+        if error is not None:
+            journal.record_outcome(product_ref(*key), "failed", str(error))
+            res = {"status": "failed", "error": str(error), "changed": []}
+        row = {"id": key[1], "shop_id": key[0], "title": catalog[key].title}
+        if res["status"] == "skipped":
+            skipped += 1
+        elif res["status"] == "done":
+            results.append(dict(row, success=True, changed_variants=len(res["changed"])))
+        else:
+            results.append(dict(row, success=False, status=res["status"], error=str(res["error"])))
+    journal.finish()
+    return {"results": results, "skipped": skipped, "job_id": journal.job_id,
+            "updated": sum(1 for r in results if r["success"]),
+            "rejected": sum(1 for r in results if r.get("status") == "rejected")}
+
+@app.route("/api/price_sheet", methods=["POST"])
+def import_price_sheet():
+    """Import a price sheet (multipart field "sheet", or the raw request body); `?dry_run=1` only diffs."""
+    upload = request.files.get("sheet")
+    fmt = sheet_format(upload, request.args.get("format"))
+    stream = upload.stream if upload is not None else request.stream
+    body, status = price_sheet_payload(stream, fmt, request.args.get("shop"), request.args.get("dry_run") == "1")
+    return jsonify(body), status
+
+def catalog_selection(data):
+    """Cached products picked by a JSON/query selection (shop, product_ids, garment_type, blueprint_id); refresh=1 re-syncs first."""
+    shop_ids = resolve_shop_ids(data.get("shop"))
+    if str(data.get("refresh") or "") in ("1", "true", "True"):
+        products, _ = get_catalogs(shop_ids)
+    else:
+        products = get_cached_catalog(shop_ids)
+    return select_products(
+        products,
+        product_ids=data.get("product_ids"),
+        garment_type=data.get("garment_type"),
+        blueprint_id=data.get("blueprint_id"),
+    )
+
+def cost_drift_selection(data):
+    """(products, drift report) for a JSON/query selection."""
+    selected = catalog_selection(data)
+    return selected, drift_report(selected)
+
+def cost_drift_payload(data):
+    """(JSON body, status) for GET /api/cost_drift."""
+    try:
+        selected, report = cost_drift_selection(data)
+    except Exception as e:
+        return {"error": str(e)}, 500
+    return {
+        "products": report,
+        "summary": {
+            "products": len(selected),
+            "drifted_products": len(report),
+            "drifted_variants": sum(r["drifted_variants"] for r in report),
+            "reprice_variants": sum(1 for r in report for v in r["variants"] if v["price_after"] != v["price_before"]),
+        },
+    }, 200
+
+def acknowledge_drift(report):
+    """Take the current costs as the baseline of the reported products."""
+    by_shop = {}
+    for r in report:
+        by_shop.setdefault(r["shop_id"], []).append(r["id"])
+    for shop_id, product_ids in by_shop.items():
+        history_for(shop_id).acknowledge(product_ids)
+
+def cost_drift_apply_payload(data):
+    """
+    (JSON body, status) for POST /api/cost_drift/apply: reprice the drifted
+    variants to their margin-keeping prices and clear the drift flag of every
+    product that ends up done; `dry_run` only returns the plan.
+    """
+    try:
+        selected, report = cost_drift_selection(data)
+    except Exception as e:
+        return {"error": str(e)}, 500
+    changes = {}
+    for r in report:
+        prices = {v["id"]: v["price_after"] for v in r["variants"] if v["price_after"] != v["price_before"]}
+        if prices:
+            changes[(str(r["shop_id"]), str(r["id"]))] = prices
+    summary = {"drifted_products": len(report), "changed_products": len(changes),
+               "changed_variants": sum(len(prices) for prices in changes.values())}
+    if data.get("dry_run"):
+        return {"summary": summary, "products": report}, 200
+    body = {"results": [], "updated": 0, "skipped": 0, "rejected": 0, "job_id": None}
+    if changes:
+        body = apply_price_changes(changes, selected, "cost_drift")
+    failed = {(str(r["shop_id"]), str(r["id"])) for r in body["results"] if not r["success"]}
+    acknowledge_drift([r for r in report if (str(r["shop_id"]), str(r["id"])) not in failed])
+    body["summary"] = summary
+    return body, 200
+
+def cost_drift_acknowledge_payload(data):
+    """(JSON body, status) for POST /api/cost_drift/acknowledge: accept the new costs without repricing."""
+    try:
+        _, report = cost_drift_selection(data)
+    except Exception as e:
+        return {"error": str(e)}, 500
+    acknowledge_drift(report)
+    return {"acknowledged": [product_ref(r["shop_id"], r["id"]) for r in report]}, 200
+
+@app.route("/api/cost_drift", methods=["GET"])
+def cost_drift():
+    """Products whose variant costs moved since their prices were set, with margin-keeping prices."""
+    data = {k: request.args.get(k) for k in ("shop", "garment_type", "blueprint_id", "refresh")}
+    if request.args.get("ids"):
+        data["product_ids"] = request.args.get("ids").split(",")
+    body, status = cost_drift_payload(data)
+    return jsonify(body), status
+
+@app.route("/api/cost_drift/apply", methods=["POST"])
+def cost_drift_apply():
+    body, status = cost_drift_apply_payload(request.get_json(silent=True) or {})
+    return jsonify(body), status
+
+@app.route("/api/cost_drift/acknowledge", methods=["POST"])
+def cost_drift_acknowledge():
+    body, status = cost_drift_acknowledge_payload(request.get_json(silent=True) or {})
+    return jsonify(body), status
+
+def rule_sets_payload():
+    """(JSON body, status) for GET /api/rule_sets."""
+    try:
+        specs = rule_store.all()
+    except Exception as e:
+        return {"error": f"Could not read {rule_store.path}: {e}"}, 500
+    return {"rule_sets": [dict(spec, name=name) for name, spec in sorted(specs.items())]}, 200
+
+def save_rule_set_payload(name, data):
+    """(JSON body, status) for PUT /api/rule_sets/<name>; the rule set is compiled first, so a bad one is never stored."""
+    try:
+        stored = rule_store.save(name, data)
+    except RuleError as e:
+        return {"error": str(e)}, 400
+    return dict(stored, name=name), 200
+
+def delete_rule_set_payload(name):
+    try:
+        rule_store.delete(name)
+    except KeyError as e:
+        return {"error": e.args[0]}, 404
+    return {"deleted": name}, 200
+
+def rule_set_apply_payload(name, data):
+    """
+    (JSON body, status) for POST /api/rule_sets/<name>/apply: evaluate the rule
+    set over the selected cached products in one pass, then write only the
+    variants whose price moves, several products at a time. `dry_run` only
+    returns the plan.
+    """
+    try:
+        rule_set = rule_store.get(name)
+    except KeyError as e:
+        return {"error": e.args[0]}, 404
+    except RuleError as e:
+        return {"error": f"Rule set {name} is invalid: {e}"}, 400
+    try:
+        selected = catalog_selection(data)
+    except Exception as e:
+        return {"error": str(e)}, 500
+    changes, report = rule_set.evaluate(selected)
+    summary = {"products": len(selected), "changed_products": len(changes),
+               "changed_variants": sum(len(prices) for prices in changes.values())}
+    if data.get("dry_run"):
+        return {"rule_set": name, "summary": summary, "products": report}, 200
+    body = {"results": [], "updated": 0, "skipped": 0, "rejected": 0, "job_id": None}
+    if changes:
+        body = apply_price_changes(changes, selected, f"rule_set:{name}")
+    body["rule_set"] = name
+    body["summary"] = summary
+    return body, 200
+
+@app.route("/api/rule_sets", methods=["GET"])
+def list_rule_sets():
+    body, status = rule_sets_payload()
+    return jsonify(body), status
+
+@app.route("/api/rule_sets/<name>", methods=["PUT"])
+def save_rule_set(name):
+    body, status = save_rule_set_payload(name, request.get_json(silent=True) or {})
+    return jsonify(body), status
+
+@app.route("/api/rule_sets/<name>", methods=["DELETE"])
+def delete_rule_set(name):
+    body, status = delete_rule_set_payload(name)
+    return jsonify(body), status
+
+@app.route("/api/rule_sets/<name>/apply", methods=["POST"])
+def apply_rule_set(name):
+    """Reprice the selection with a named rule set (dry_run=true to preview)."""
+    body, status = rule_set_apply_payload(name, request.get_json(silent=True) or {})
+    return jsonify(body), status
+
+def snapshot_refs(snapshot, product_ids=None):
+    """The snapshot's product refs, limited to `product_ids` (bare ids or refs) when given."""
+    wanted = set(product_ids) if product_ids else None
+    return [ref for ref in snapshot.prices
+            if wanted is None or ref in wanted or ref.split(":", 1)[-1] in wanted]
+
+def rollback_changes(snapshot, products, product_ids=None):
+    """
+    (changes, unchanged, missing) restoring `snapshot` over cached `products`:
+    changes holds only the variants whose cached price differs from the snapshot,
+    unchanged counts products already back at their snapshot prices and missing
+    lists refs no longer in the catalog. `product_ids` limits it to some refs.
+    Only a preview: the cache may lag writes made elsewhere, so a real rollback
+    diffs against Printify (rollback_prices()).
+    """
+    catalog = {product_ref(p.shop_id, p.id): p for p in products}
+    changes = {}
+    unchanged = 0
+    missing = []
+    for ref in snapshot_refs(snapshot, product_ids):
+        prices = snapshot.prices[ref]
+        product = catalog.get(ref)
+        if product is None:
+            missing.append(ref)
+            continue
+        differ = {v.id: prices[v.id] for v in product.variants if v.id in prices and v.price != prices[v.id]}
+        if differ:
+            changes[(str(product.shop_id), str(product.id))] = differ
+        else:
+            unchanged += 1
+    return changes, unchanged, missing
+
+def rollback_prices(snapshot, refs, products):
+    """
+    Write `snapshot`'s prices and enabled flags back for `refs`, several products
+    at a time, as one journaled "sheet" job with its own snapshot. Every product
+    is read from Printify and only the variants that still differ are sent, so
+    writes the cached `products` never saw are undone too. There is no conflict
+    check: the snapshot wins. Returns the JSON body of apply_price_changes() plus
+    a summary.
+    """
+    catalog = {product_ref(p.shop_id, p.id): p for p in products}
+    source = f"rollback:{snapshot.snapshot_id}"
+    journal = Journal.create("sheet", {"source": source, "prices": {ref: snapshot.prices[ref] for ref in refs},
+                                       "enabled": {ref: snapshot.enabled.get(ref, {}) for ref in refs}}, refs)
+    undo = Snapshot.create(source, {"source": source}, snapshot_id=journal.job_id)
+
+    def restore_one(ref):
+        shop_id, pid = parse_product_ref(ref)
+        res = set_product_prices(shop_id, pid, snapshot.prices[ref], journal=journal, snapshot=undo,
+                                 enabled=snapshot.enabled.get(ref))
+        sync_cached_product(catalog.get(ref), res)
+        return res
+
+    results = []
+    skipped = 0
+    missing = []
+    for ref, res, error in parallel_map(restore_one, refs, max_workers=SHEET_WORKERS):
+        if error is not None:
+            journal.record_outcome(ref, "failed", str(error))
+            res = {"status": "failed", "error": str(error), "changed": []}
+        elif not res["variants"]:
+            missing.append(ref)  # deleted in Printify since
+            continue
+        shop_id, pid = parse_product_ref(ref)
+        product = catalog.get(ref)
+        row = {"id": pid, "shop_id": shop_id, "title": product.title if product is not None else None}
+        if res["status"] == "skipped":
+            skipped += 1
+        elif res["status"] == "done":
+            results.append(dict(row, success=True, changed_variants=len(res["changed"])))
+        else:
+            results.append(dict(row, success=False, status=res["status"], error=str(res["error"])))
+    journal.finish()
+    updated = [r for r in results if r["success"]]
+    return {"results": results, "skipped": skipped, "job_id": journal.job_id, "updated": len(updated),
+            "rejected": sum(1 for r in results if r.get("status") == "rejected"),
+            "summary": {"products": len(refs), "changed_products": len(updated),
+                        "changed_variants": sum(r["changed_variants"] for r in updated),
+                        "unchanged_products": skipped, "missing": missing}}
+
+def snapshots_payload():
+    return {"snapshots": list_snapshots()}, 200
+
+def snapshot_payload(snapshot_id):
+    """(JSON body, status) for GET /api/snapshots/<id>: the summary and every stored price."""
+    try:
+        snapshot = Snapshot.open(snapshot_id)
+    except KeyError as e:
+        return {"error": e.args[0]}, 404
+    return dict(snapshot.summary(), prices={ref: [[vid, cents, snapshot.enabled.get(ref, {}).get(vid)]
+                                                  for vid, cents in prices.items()]
+                                            for ref, prices in snapshot.prices.items()}), 200
+
+def snapshot_rollback_payload(snapshot_id, data):
+    """
+    (JSON body, status) for POST /api/snapshots/<id>/rollback: put back the
+    snapshot's prices, only where they still differ, several products at a time
+    within each shop's rate limit. `product_ids` limits it to some products,
+    `dry_run` only returns the diff against the cached catalog.
+    """
+    try:
+        snapshot = Snapshot.open(snapshot_id)
+    except KeyError as e:
+        return {"error": e.args[0]}, 404
+    try:
+        shop_ids = sorted({ref.split(":", 1)[0] for ref in snapshot.prices})
+        products = get_cached_catalog(shop_ids) if shop_ids else []
+    except Exception as e:
+        return {"error": str(e)}, 500
+    if data.get("dry_run"):
+        changes, unchanged, missing = rollback_changes(snapshot, products, data.get("product_ids"))
+        summary = {"products": len(changes) + unchanged + len(missing), "changed_products": len(changes),
+                   "changed_variants": sum(len(prices) for prices in changes.values()),
+                   "unchanged_products": unchanged, "missing": missing}
+        return {"snapshot": snapshot.summary(), "summary": summary, "products": describe_changes(changes, products)}, 200
+    refs = snapshot_refs(snapshot, data.get("product_ids"))
+    body = {"results": [], "updated": 0, "skipped": 0, "rejected": 0, "job_id": None,
+            "summary": {"products": 0, "changed_products": 0, "changed_variants": 0,
+                        "unchanged_products": 0, "missing": []}}
+    if refs:
+        body = rollback_prices(snapshot, refs, products)
+    body["snapshot"] = snapshot.summary()
+    return body, 200
+
+@app.route("/api/snapshots", methods=["GET"])
+def list_snapshots_route():
+    body, status = snapshots_payload()
+    return jsonify(body), status
+
+@app.route("/api/snapshots/<snapshot_id>", methods=["GET"])
+def snapshot_route(snapshot_id):
+    body, status = snapshot_payload(snapshot_id)
+    return jsonify(body), status
+
+@app.route("/api/snapshots/<snapshot_id>/rollback", methods=["POST"])
+def rollback_snapshot(snapshot_id):
+    """Restore a snapshot's prices (dry_run=true to preview)."""
+    body, status = snapshot_rollback_payload(snapshot_id, request.get_json(silent=True) or {})
+    return jsonify(body), status
+
+# Column order for the JSON/CSV default-variant report
+DEFAULT_VARIANT_COLUMNS = ("shop_id", "product_id", "title", "variant_id", "size", "color",
+                           "price", "key_variant_id", "is_key_variant")
+
+def default_variant_rows(products):
+    """
+    One row per product with its default variant (is_default, else the first),
+    resolved through the same option index as the dashboard; no Printify calls.
+    """
+    rows = []
+    for p in products:
+        default, key = p.default_variant, p.large_variant
+        rows.append({
+            "shop_id": p.shop_id,
+            "product_id": p.id,
+            "title": p.title or "Untitled",
+            "variant_id": default.id if default else "N/A",
+            "size": p.size_title(default),
+            "color": p.color_title(default),
+            "price": default.price if default else None,
+            "key_variant_id": key.id if key else "N/A",
+            "is_key_variant": bool(default and key and default.id == key.id),
+        })
+    return rows
+
+def rows_to_csv(rows, columns):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue()
+
+# Blueprint search results per page (?limit= overrides, 0 = all)
+BLUEPRINT_SEARCH_LIMIT = 50
+
+def blueprint_search(args):
+    """(results, total) for ?q=...&limit=...; no query lists the catalog by id."""
+    index = get_blueprint_index()
+    query = (args.get("q") or "").strip()
+    limit = args.get("limit", BLUEPRINT_SEARCH_LIMIT, type=int)
+    if not query:
+        results = index.all()
+        return (results[:limit] if limit else results), len(index)
+    return index.search(query, limit=limit), len(index)
+
+@app.route("/blueprints", methods=["GET"])
+def blueprint_browser():
+    try:
+        results, total = blueprint_search(request.args)
+    except Exception as e:
+        return f"<b>Error:</b> {e}", 502
+    return render_template_string(BLUEPRINTS_HTML, results=results, total=total,
+                                  query=request.args.get("q") or "")
+
+@app.route("/api/blueprints", methods=["GET"])
+def blueprint_search_api():
+    try:
+        results, total = blueprint_search(request.args)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 502
+    return jsonify({"query": request.args.get("q") or "", "total": total,
+                    "count": len(results), "blueprints": [bp.to_dict() for bp in results]})
+
+@app.route("/api/blueprints/<int:blueprint_id>", methods=["GET"])
+def blueprint_detail(blueprint_id):
+    try:
+        blueprint = find_blueprint(blueprint_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 502
+    if blueprint is None:
+        return jsonify({"error": f"Blueprint {blueprint_id} not found."}), 404
+    return jsonify(blueprint.to_dict())
+
+@app.route("/reports/default_variants", methods=["GET"])
+@app.route("/reports/default_variants.<fmt>", methods=["GET"])
+def default_variant_report(fmt="html"):
+    """Default variant of every product, from the cached catalog (HTML, JSON or CSV)."""
+    selection = request.args.get("shop") or ""
+    try:
+        shop_ids = resolve_shop_ids(selection)
+        rows = default_variant_rows(get_cached_catalog(shop_ids))
+    except Exception as e:
+        return f"<b>Error:</b> {e}", 400
+    if fmt == "json":
+        return jsonify({"products": rows})
+    if fmt == "csv":
+        resp = Response(rows_to_csv(rows, DEFAULT_VARIANT_COLUMNS), mimetype="text/csv")
+        resp.headers["Content-Disposition"] = "attachment; filename=default-variants.csv"
+        return resp
+    if fmt != "html":
+        return f"Unknown format {fmt}; use json or csv.", 404
+    return render_template_string(DEFAULT_VARIANTS_HTML, rows=rows, **shop_context(shop_ids, selection))
+
+def analytics_report(data):
+    """
+    (report, shop_ids, selection) for a query: the margin analytics of the
+    selected shops from the columns kept at sync time. `shipping=1` first
+    looks up the shipping costs not known yet (one call per provider and
+    print area).
+    """
+    selection = data.get("shop") or ""
+    shop_ids = resolve_shop_ids(selection)
+    products = get_cached_catalog(shop_ids)
+    if str(data.get("shipping") or "") == "1":
+        for p in products:
+            if p.shipping_cost is None:
+                attach_shipping_cost(p)
+    try:
+        lowest = max(0, min(MAX_LOWEST, int(data.get("lowest") or LOWEST)))
+    except ValueError:
+        raise ValueError("lowest must be a number.")
+    return margin_analytics.report(shop_ids, data.get("garment_type") or None, lowest), shop_ids, selection
+
+def analytics_payload(data):
+    """(JSON body, status) for GET /api/analytics."""
+    try:
+        report, _, _ = analytics_report(data)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        return {"error": str(e)}, 500
+    return report, 200
+
+def analytics_page(data):
+    """(HTML, status) for GET /analytics."""
+    try:
+        report, shop_ids, selection = analytics_report(data)
+    except Exception as e:
+        return f"<b>Error:</b> {e}", 400
+    garment_types = sorted({p.garment_type for p in get_cached_catalog(shop_ids)})
+    return render_template_string(ANALYTICS_HTML, report=report, garment_types=garment_types,
+                                  garment_type=data.get("garment_type") or "",
+                                  **shop_context(shop_ids, selection)), 200
+
+@app.route("/analytics", methods=["GET"])
+def margin_analytics_view():
+    """Store-wide margin, profit and cost-exposure analytics."""
+    return analytics_page(request.args)
+
+@app.route("/api/analytics", methods=["GET"])
+def margin_analytics_api():
+    body, status = analytics_payload(request.args)
+    return jsonify(body), status
+
+def stats_payload():
+    return {
+        "coalescing": {"catalog": catalog_flight.stats(), "product_detail": detail_flight.stats(),
+                       "shipping": shipping_flight.stats()},
+        "circuit": printify_breaker.stats(),
+        "catalogs": {shop_id: catalog_snapshot([shop_id]) for shop_id in catalog_cache},
+        "budgets": shop_budgets.stats(),
+        "thumbnails": thumbnails.stats(),
+        "warmup": warmup.status() if warmup is not None else None,
+    }
+
+# ---------- Thumbnails ----------
+
+def thumbnail_signature(src):
+    """Only image URLs the dashboard itself rendered are fetched; the proxy is not open to any URL."""
+    return hmac.new(app.secret_key.encode("utf-8"), src.encode("utf-8"), hashlib.sha256).hexdigest()[:20]
+
+def thumbnail_params(src):
+    return {"src": src, "sig": thumbnail_signature(src)}
+
+def thumbnail_hosts():
+    """PRINTIFY_IMAGE_HOSTS plus the API host, which serves the mockups when it is mock_printify.py."""
+    api = urlsplit(API_BASE)
+    return IMAGE_HOSTS + ((f"{api.hostname}:{api.port}" if api.port else api.hostname or "").lower(),)
+
+def load_thumbnail(args):
+    """
+    The Thumbnail for a /thumbnail request; ValueError when the signature does
+    not match or `src` is not on an allowed image host. The host check does not
+    depend on FLASK_SECRET_KEY, which falls back to a well-known value.
+    """
+    src = args.get("src") or ""
+    if not src or not hmac.compare_digest(args.get("sig") or "", thumbnail_signature(src)):
+        raise ValueError("Bad thumbnail signature")
+    if not allowed_image_url(src, thumbnail_hosts()):
+        raise ValueError("Image host not allowed")
+    return thumbnails.get(src)
+
+def thumbnail_headers(thumb):
+    return {"Cache-Control": f"public, max-age={THUMB_MAX_AGE}, immutable", "ETag": f'"{thumb.key[:20]}"'}
+
+@app.route("/thumbnail", methods=["GET"])
+def thumbnail():
+    """A product mockup at card size, from the on-disk cache; the full image if it cannot be made."""
+    try:
+        thumb = load_thumbnail(request.args)
+    except ValueError as e:
+        return str(e), 403
+    except Exception as e:
+        print(f"[WARN] Thumbnail of {request.args.get('src')} failed: {e}")
+        return redirect(request.args["src"])
+    resp = Response(thumb.data, mimetype=thumb.mimetype, headers=thumbnail_headers(thumb))
+    return resp.make_conditional(request)
+
+def thumbnail_src(src):
+    """Whether a card may load `src` through /thumbnail; images elsewhere are linked directly."""
+    return allowed_image_url(src, thumbnail_hosts())
+
+app.jinja_env.globals["thumb_url"] = lambda src: url_for("thumbnail", **thumbnail_params(src)) if thumbnail_src(src) else src
+
+# ---------- Static assets and response encoding ----------
+
+@app.route("/assets/<path:filename>", methods=["GET"])
+def asset(filename):
+    """A fingerprinted static asset, pre-compressed, cacheable for a year."""
+    found = assets.lookup(filename)
+    if found is None:
+        return "Not found", 404
+    encoding = choose_encoding(request.accept_encodings)
+    body = found.encoded.get(encoding) if encoding else None
+    resp = Response(body or found.body, mimetype=found.mimetype)
+    if body:
+        resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    resp.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    resp.set_etag(found.digest)
+    return resp.make_conditional(request)
+
+app.jinja_env.globals["asset_url"] = lambda name: url_for("asset", filename=assets.fingerprinted(name))
+
+@app.after_request
+def encode_response(resp):
+    """
+    JSON GETs get a weak ETag (answered 304 when unchanged), then text bodies are
+    gzip/brotli compressed when the client accepts it. Streamed and file
+    responses go out untouched.
+    """
+    if resp.is_streamed or resp.direct_passthrough:
+        return resp
+    if request.method == "GET" and resp.status_code == 200 and resp.mimetype == "application/json" \
+            and not resp.headers.get("ETag"):
+        resp.add_etag(weak=True)
+        resp.make_conditional(request)
+    if resp.status_code != 200:
+        return resp
+    data = resp.get_data()
+    if not should_compress(resp.mimetype, len(data), resp.headers.get("Content-Encoding")):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding:
+        resp.set_data(compress(data, encoding))
+        resp.headers["Content-Encoding"] = encoding
+    return resp
+
+# ---------- Profiling ----------
+
+# Downloads carry the token too, but are not worth profiling
+PROFILE_ENDPOINTS = {"list_profiles", "download_profile"}
+
+@app.before_request
+def start_profile():
+    """Run this request under the profiler when it carries PRINTIFY_PROFILE_TOKEN (see profiling.py)."""
+    if profiling.PROFILE_TOKEN is None or request.endpoint in PROFILE_ENDPOINTS \
+            or not profiling.token_matches(request.args, request.headers):
+        return
+    g.profile = profiling.begin(f"{request.method} {request.path}")
+
+@app.after_request
+def attach_profile(resp):
+    session = g.pop("profile", None)
+    if session is None:
+        if profiling.PROFILE_TOKEN is not None and request.endpoint not in PROFILE_ENDPOINTS \
+                and profiling.token_matches(request.args, request.headers):
+            resp.headers["X-Profile"] = "busy"  # another request is being profiled
+        return resp
+    resp.headers["X-Profile-Id"] = session.id
+    # stopped once the body is sent, so streamed pages are profiled to the end
+    resp.call_on_close(session.stop)
+    return resp
+
+@app.teardown_request
+def abandon_profile(error=None):
+    session = g.pop("profile", None)
+    if session is not None:  # the view failed before a response was made
+        session.stop()
+
+def profile_access(args, headers):
+    """(error body, status) when profile downloads are off or the token is missing; None when allowed."""
+    if profiling.PROFILE_TOKEN is None:
+        return {"error": "Profiling is off; set PRINTIFY_PROFILE_TOKEN to enable it."}, 404
+    if not profiling.token_matches(args, headers):
+        return {"error": "A valid profile token is required."}, 403
+    return None
+
+@app.route("/api/profiles", methods=["GET"])
+def list_profiles():
+    denied = profile_access(request.args, request.headers)
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    return jsonify({"profiles": profiling.list_profiles()})
+
+@app.route("/api/profiles/<profile_id>.<fmt>", methods=["GET"])
+def download_profile(profile_id, fmt):
+    """A saved profile as pstats, folded (flamegraph) or txt (summary)."""
+    denied = profile_access(request.args, request.headers)
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    path = profiling.profile_path(profile_id, fmt)
+    if path is None:
+        return jsonify({"error": f"No {fmt} report for profile {profile_id}."}), 404
+    return send_file(path, mimetype=profiling.FORMATS[fmt], as_attachment=fmt == "pstats",
+                     download_name=os.path.basename(path))
+
+@app.route("/api/stats", methods=["GET"])
+def stats():
+    """Request coalescing counters and per-shop rate limit budgets."""
+    return jsonify(stats_payload())
+
+@app.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify({"jobs": list_journals()})
+
+@app.route("/api/jobs/<job_id>/resume", methods=["POST"])
+def resume_job_route(job_id):
+    force = request.args.get("force") == "1"
+    try:
+        journal, results = resume_job(job_id, force=force)
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"job": journal.summary(), "results": results})
+
+# ---------- Warm-up and health ----------
+
+# PRINTIFY_WARMUP=0 leaves every cache to be filled by the first request that needs it
+WARMUP_ENABLED = os.environ.get("PRINTIFY_WARMUP", "1") != "0"
+# A failed warm-up is started again by the next /readyz probe after this many seconds
+WARMUP_RETRY_SECONDS = float(os.environ.get("PRINTIFY_WARMUP_RETRY", "30"))
+STARTED_AT = time.time()
+warmup = None
+_warmup_lock = threading.Lock()
+
+def warm_shops():
+    if not API_KEY:
+        raise Exception("PRINTIFY_API_KEY is not set.")
+    return f"{len(get_shops())} shop(s)"
+
+def warm_blueprints():
+    return f"{len(get_blueprint_index())} blueprints"
+
+def load_persisted(shop_ids):
+    """What earlier runs left on disk: catalogs and shipping rates in the shared cache, cost histories."""
+    refresh_from_shared(shop_ids)
+    for shop_id in shop_ids:
+        history_for(shop_id)
+    on_disk = sum(1 for s in shop_ids if catalog_cache.get(str(s)))
+    return f"{on_disk} of {len(shop_ids)} catalog(s) on disk"
+
+def warm_catalog(shop_id):
+    """A shop's catalog: the copy on disk if there is one (refreshed in the background when stale), else loaded now."""
+    if catalog_cache.get(str(shop_id)):
+        if stale_shops([shop_id]):
+            refresh_catalogs_in_background([shop_id])
+            return f"{len(catalog_cache[str(shop_id)])} products from disk, refreshing"
+        return f"{len(catalog_cache[str(shop_id)])} products from disk"
+    load_missing_catalogs([shop_id])
+    return f"{len(catalog_cache.get(str(shop_id), {}))} products loaded"
+
+def warm_shipping(shop_ids):
+    """One shipping lookup per distinct provider and print area, side by side, then every card's cost from cache."""
+    products = [p for s in shop_ids for p in catalog_cache.get(str(s), {}).values()]
+    keys = {(p.provider_id, p.print_area_key) for p in products if p.provider_id and p.print_area_key}
+    for _ in parallel_map(lambda key: get_variant_shipping_cost(*key), keys, max_workers=8):
+        pass
+    for p in products:
+        attach_shipping_cost(p)
+    return f"{len(keys)} rate(s)"
+
+def warm_up(w):
+    """
+    The startup plan: shops, then the shared cache and cost histories from disk
+    alongside the blueprint catalog, then every shop's catalog at once, then
+    shipping rates. Ready once the catalogs are there; shipping is optional.
+    """
+    w.step("shops", warm_shops)
+    shop_ids = [s["id"] for s in get_shops()]
+    w.concurrently([("disk", lambda: load_persisted(shop_ids)), ("blueprints", warm_blueprints)])
+    w.concurrently([(f"catalog:{shop_id}", lambda shop_id=shop_id: warm_catalog(shop_id)) for shop_id in shop_ids])
+    w.step("shipping", lambda: warm_shipping(shop_ids), required=False)
+
+def start_warmup():
+    """
+    Start the warm-up in the background unless one is running or has finished;
+    a failed one is retried after WARMUP_RETRY_SECONDS. None when disabled.
+    """
+    global warmup
+    if not WARMUP_ENABLED:
+        return None
+    with _warmup_lock:
+        w = warmup
+        if w is None or (w.finished is not None and not w.ready
+                         and time.time() - w.finished >= WARMUP_RETRY_SECONDS):
+            warmup = w = Warmup(warm_up).start()
+        return w
+
+def health_payload():
+    """Liveness: the process serves requests; says nothing about Printify or the caches."""
+    return {"status": "ok", "pid": os.getpid(), "uptime": round(time.time() - STARTED_AT, 1),
+            "circuit": printify_breaker.state}, 200
+
+def readiness_payload():
+    """Readiness: 200 once the warm-up has filled the caches, 503 with its progress until then."""
+    w = start_warmup()
+    if w is None:
+        return {"ready": True, "warmup": "disabled"}, 200
+    body = w.status()
+    body["circuit"] = printify_breaker.state
+    return body, 200 if body["ready"] else 503
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    body, status = health_payload()
+    resp = jsonify(body)
+    resp.headers["Cache-Control"] = "no-store"
+    return resp, status
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    body, status = readiness_payload()
+    resp = jsonify(body)
+    resp.headers["Cache-Control"] = "no-store"
+    return resp, status
 
 if __name__ == "__main__":
+    # the reloader runs this file in a watching parent too; only the serving child warms up
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warmup()
     app.run(port=5000, debug=True)
@@ -0,0 +1,56 @@
+# assets.py
+
+"""
+Fingerprinted static assets: the dashboard's CSS and JS live in static/ and
+are served as /assets/<name>.<digest>.<ext>, so their URLs change whenever
+their content does and browsers can cache them for a year. Each file is read,
+hashed and pre-compressed once at startup.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from compression import brotli
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# A fingerprinted URL never changes content
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+class Asset:
+    __slots__ = ("name", "fingerprinted", "digest", "mimetype", "body", "encoded")
+
+    def __init__(self, name, body):
+        self.name = name
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        self.fingerprinted = f"{stem}.{self.digest}{ext}"
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        # best compression once, instead of a fast one per request
+        self.encoded = {"gzip": gzip.compress(body, compresslevel=9)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(body, quality=11)
+
+class AssetRegistry:
+    def __init__(self, directory=STATIC_DIR):
+        self.by_name = {}
+        self.by_fingerprint = {}
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if os.path.isfile(path):
+                    with open(path, "rb") as fh:
+                        asset = Asset(name, fh.read())
+                    self.by_name[name] = asset
+                    self.by_fingerprint[asset.fingerprinted] = asset
+        # changes whenever any asset does; part of the dashboard's ETag
+        self.version = hashlib.sha256("".join(a.digest for a in self.by_name.values()).encode()).hexdigest()[:12]
+
+    def fingerprinted(self, name):
+        """"dashboard.css" -> "dashboard.<digest>.css"."""
+        return self.by_name[name].fingerprinted
+
+    def lookup(self, fingerprinted):
+        return self.by_fingerprint.get(fingerprinted)
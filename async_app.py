@@ -0,0 +1,800 @@
+# async_app.py
+
+"""
+Async (ASGI) serving mode: the same dashboard and API as app.py, on Quart.
+
+The Printify fan-out (catalog loads, shipping lookups, bulk price PUTs and
+publishes) runs as coroutines on one httpx.AsyncClient via asyncio.gather, so a
+single process can serve many dashboard users at once instead of tying up a
+thread per request for hundreds of round-trips. Each shop is limited by a
+semaphore (PRINTIFY_ASYNC_CONCURRENCY in-flight requests, default 16) and by the
+same per-shop request budget as the sync app. Caches, journals, pricing and
+templates are shared with app.py; single-product and local-only routes reuse its
+functions on a worker thread.
+
+    pip install quart httpx uvicorn
+    uvicorn async_app:app --port 5000
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+
+import httpx
+from quart import Quart, Response, flash, g, get_flashed_messages, jsonify, redirect, render_template_string, request, send_file, url_for
+from quart.utils import run_sync
+from quart.wrappers.response import DataBody
+
+import app as core
+from cache import MISSING
+from compression import choose_encoding, compress, should_compress
+from journal import Journal, list_journals
+from models import Product
+from pipeline import AsyncSingleFlight
+from preflight import check_update
+from pricesheet import FORMATS, SheetError, iter_csv, write_parquet
+import profiling
+from snapshots import Snapshot
+
+app = Quart(__name__)
+app.secret_key = core.app.secret_key
+
+ASYNC_CONCURRENCY = int(os.environ.get("PRINTIFY_ASYNC_CONCURRENCY", "16"))
+# Concurrent loads of the same shop catalog / product detail / shipping rate share one fetch
+catalog_flight = AsyncSingleFlight()
+detail_flight = AsyncSingleFlight()
+shipping_flight = AsyncSingleFlight()
+
+# ---------- Async Printify client ----------
+
+class AsyncPrintify:
+    """One pooled httpx.AsyncClient; per-shop semaphores plus the sync app's request budgets and circuit breaker."""
+
+    def __init__(self, concurrency=ASYNC_CONCURRENCY):
+        self.concurrency = concurrency
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {core.API_KEY}"},
+            timeout=httpx.Timeout(core.REQUEST_TIMEOUT),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=100),
+        )
+        self.semaphores = {}
+
+    def semaphore(self, shop_id):
+        key = str(shop_id)
+        if key not in self.semaphores:
+            self.semaphores[key] = asyncio.Semaphore(self.concurrency)
+        return self.semaphores[key]
+
+    async def request(self, method, path, shop_id=None, **kwargs):
+        async with self.semaphore(shop_id):
+            if shop_id is not None:
+                wait = core.shop_budgets.reserve(shop_id)
+                if wait:
+                    await asyncio.sleep(wait)
+            core.printify_breaker.before_call()
+            try:
+                resp = await self.client.request(method, f"{core.API_BASE}{path}", **kwargs)
+            except Exception as e:
+                core.printify_breaker.record_failure(e)
+                raise
+            if resp.status_code >= 500:
+                core.printify_breaker.record_failure(f"HTTP {resp.status_code} from {path.split('?')[0]}")
+            else:
+                core.printify_breaker.record_success()
+            return resp
+
+    async def aclose(self):
+        await self.client.aclose()
+
+printify = None
+
+@app.before_serving
+async def open_client():
+    global printify
+    printify = AsyncPrintify()
+    # fills app.py's caches on a background thread; /readyz reports progress
+    core.start_warmup()
+
+@app.after_serving
+async def close_client():
+    if printify is not None:
+        await printify.aclose()
+
+# ---------- Async API helpers ----------
+
+async def list_shop_products(shop_id):
+    """All product summaries for the shop, following the list endpoint's pagination."""
+    first = (await printify.request("GET", f"/shops/{shop_id}/products.json?limit=50&page=1", shop_id)).json()
+    pages = [first]
+    last_page = first.get("last_page") or 1
+    if last_page > 1:
+        rest = await asyncio.gather(*(
+            printify.request("GET", f"/shops/{shop_id}/products.json?limit=50&page={page}", shop_id)
+            for page in range(2, last_page + 1)
+        ))
+        pages.extend(resp.json() for resp in rest)
+    products = [p for body in pages for p in body.get("data", []) or []]
+    if not products:
+        raise Exception("No products found for this shop.")
+    return products
+
+async def fetch_product(shop_id, product_id):
+    return (await printify.request("GET", f"/shops/{shop_id}/products/{product_id}.json", shop_id)).json()
+
+async def load_product_details(shop_id, prod):
+    data = await detail_flight.do(core.product_ref(shop_id, prod["id"]), lambda: fetch_product(shop_id, prod["id"]))
+    product = Product.from_api(data, core.garment_type_for(data.get("blueprint_id")), shop_id=shop_id)
+    core.log_key_variant(product)
+    return product
+
+async def warm_blueprints():
+    if core.BLUEPRINT_MAP is None:
+        await run_sync(core.garment_type_for)(None)
+
+async def load_shop_catalog(shop_id):
+    """
+    One shop's Products in list order, every detail fetched concurrently and
+    cached in app.catalog_cache. Callers arriving while the shop is already
+    loading share that load.
+    """
+    async def load():
+        summaries = await list_shop_products(shop_id)
+        loaded = await asyncio.gather(*(load_product_details(shop_id, p) for p in summaries), return_exceptions=True)
+        products = []
+        for prod, product in zip(summaries, loaded):
+            if isinstance(product, Exception):
+                print(f"[ERROR] Product '{prod.get('id')}' — failed to load details: {product}")
+                continue
+            products.append(product)
+        await run_sync(core.remember_catalog)(shop_id, products)
+        return products
+    return await catalog_flight.do(str(shop_id), load)
+
+async def get_catalogs(shop_ids):
+    await warm_blueprints()
+    by_shop = await asyncio.gather(*(load_shop_catalog(s) for s in shop_ids))
+    detailed = [p for products in by_shop for p in products]
+    return detailed, sorted({p.garment_type for p in detailed})
+
+async def load_missing_catalogs(shop_ids):
+    """Async app.load_missing_catalogs(): the lease holder crawls with the async fan-out, other workers wait."""
+    if core.shared_cache is None:
+        await get_catalogs(shop_ids)
+        return
+    pending = [str(s) for s in shop_ids]
+    while pending:
+        mine = await run_sync(core.claim_catalog_loads)(pending)
+        if mine:
+            try:
+                todo = [s for s in mine if s not in core.catalog_cache]
+                if todo:
+                    await get_catalogs(todo)
+            finally:
+                await run_sync(core.release_catalog_loads)(mine)
+        await run_sync(core.refresh_from_shared)(pending)
+        pending = [s for s in pending if s not in core.catalog_cache]
+        if pending:
+            await asyncio.sleep(0.2)
+
+async def get_cached_catalog(shop_ids):
+    await run_sync(core.refresh_from_shared)(shop_ids)
+    missing = [s for s in shop_ids if not core.catalog_cache.get(str(s))]
+    if missing:
+        await load_missing_catalogs(missing)
+    return [p for s in shop_ids for p in core.catalog_cache.get(str(s), {}).values()]
+
+async def shipping_cost(provider_id, print_area_key, country_code="US"):
+    key = (provider_id, print_area_key, country_code)
+    cost = core.cached_shipping_cost(key)
+    if cost is not MISSING:
+        return cost
+    if not provider_id or not print_area_key:
+        return None
+
+    async def fetch():
+        resp = await printify.request(
+            "GET", f"/shipping.json?country={country_code}&provider_id={provider_id}&print_area_key={print_area_key}"
+        )
+        return await run_sync(core.remember_shipping_cost)(key, core.standard_shipping_cost(resp))
+    return await shipping_flight.do(key, fetch)
+
+async def attach_shipping_costs(products):
+    """One lookup per distinct (provider, print area) not cached yet, all at once."""
+    keys = {(p.provider_id, p.print_area_key) for p in products}
+    costs = dict(zip(keys, await asyncio.gather(*(shipping_cost(*k) for k in keys))))
+    for p in products:
+        p.shipping_cost = costs[(p.provider_id, p.print_area_key)]
+        core.margin_analytics.set_shipping(p, p.shipping_cost)
+
+async def write_product_prices(shop_id, product_id, price_fn, journal=None, expected_updated_at=None, journal_key=None,
+                               snapshot=None):
+    """Async app.write_product_prices(): same result dict, journaling, snapshot and conflict check."""
+    pid = str(product_id)
+    journal_key = journal_key or core.product_ref(shop_id, pid)
+    prod_data = await fetch_product(shop_id, pid)
+    product_options = prod_data.get("options", []) or []
+    variants = prod_data.get("variants", []) or []
+    result = {
+        "id": pid, "status": None, "error": None, "resp": None,
+        "variants": variants, "product_options": product_options,
+        "updated": [], "changed": [], "updated_at": prod_data.get("updated_at"),
+    }
+
+    async def finish(status, error=None):
+        result["status"] = status
+        result["error"] = error
+        if journal is not None:
+            await run_sync(journal.record_outcome)(journal_key, status, None if error is None else str(error))
+        return result
+
+    if expected_updated_at and result["updated_at"] != expected_updated_at:
+        return await finish("conflict", f"Product changed in Printify since it was loaded ({result['updated_at']}).")
+
+    try:
+        prices = price_fn(variants, product_options)
+    except ValueError as ex:
+        return await finish("failed", str(ex))
+    result["updated"] = core.build_price_update(variants, prices)
+    result["changed"] = core.changed_price_rows(variants, result["updated"])
+    if not result["changed"]:
+        return await finish("skipped")
+    checked = check_update(variants, result["changed"])
+    result["preflight"] = checked.to_dict()
+    if not checked.ok:
+        return await finish("rejected", checked.message())
+    result["payload"] = checked.payload
+
+    # both fsync; keep them off the event loop
+    if snapshot is not None:
+        await run_sync(snapshot.record)(journal_key, variants, result["payload"], result["updated_at"])
+    if journal is not None:
+        await run_sync(journal.record_intent)(journal_key, result["updated_at"], result["payload"])
+    try:
+        resp = await printify.request("PUT", f"/shops/{shop_id}/products/{pid}.json", shop_id,
+                                      json={"variants": result["payload"]})
+    except Exception as ex:
+        return await finish("failed", str(ex))
+    result["resp"] = resp
+    if resp.status_code != 200:
+        return await finish("failed", core.response_error(resp))
+    return await finish("done")
+
+async def reprice_product(shop_id, product_id, mode, value, flat_prices, journal=None, expected_updated_at=None,
+                          snapshot=None):
+    return await write_product_prices(shop_id, product_id, core.mode_price_fn(mode, value, flat_prices),
+                                      journal, expected_updated_at, snapshot=snapshot)
+
+async def publish_product(shop_id, product_id):
+    """Publish one product's retail prices; returns (success, error)."""
+    try:
+        resp = await printify.request("POST", f"/shops/{shop_id}/products/{product_id}/publish.json", shop_id,
+                                      json=core.PUBLISH_PAYLOAD)
+        if resp.status_code == 200:
+            return True, None
+        return False, str(resp.json() if resp.content else resp.text)
+    except Exception as ex:
+        return False, str(ex)
+
+async def gather_outcomes(fn, keys, journal):
+    """{key: fn(*key)} for (shop_id, product_id) keys, all at once; exceptions become failed results."""
+    outcomes = await asyncio.gather(*(fn(*key) for key in keys), return_exceptions=True)
+    results = {}
+    for key, res in zip(keys, outcomes):
+        if isinstance(res, Exception):
+            await run_sync(journal.record_outcome)(core.product_ref(*key), "failed", str(res))
+            res = {"status": "failed", "error": str(res), "changed": []}
+        results[key] = res
+    return results
+
+# ---------- Routes ----------
+
+_background = set()
+
+def refresh_in_background(shop_ids):
+    """Async app.refresh_catalogs_in_background(): the reload runs as a task on the serving loop."""
+    todo = core.claim_refresh(shop_ids)
+    if not todo:
+        return
+
+    async def run():
+        try:
+            await get_catalogs(todo)
+        except Exception as e:
+            print(f"[WARN] Background catalog refresh failed: {e}")
+        finally:
+            core.release_refresh(todo)
+    task = asyncio.create_task(run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+async def dashboard_catalog(shop_ids, force=False):
+    """Async app.dashboard_catalog(): serve the cached catalog, refresh stale shops in the background."""
+    await run_sync(core.refresh_from_shared)(shop_ids)
+    missing = [s for s in shop_ids if not core.catalog_cache.get(str(s))]
+    error = None
+    if force or missing:
+        try:
+            if force:
+                await get_catalogs(shop_ids)
+            else:
+                await load_missing_catalogs(missing)
+        except Exception as e:
+            if force and not missing:
+                error = e
+            else:
+                raise
+    stale = core.stale_shops(shop_ids)
+    if stale:
+        refresh_in_background(stale)
+    detailed = [p for s in shop_ids for p in core.catalog_cache.get(str(s), {}).values()]
+    return detailed, sorted({p.garment_type for p in detailed}), core.catalog_snapshot(shop_ids, error)
+
+@app.route("/", methods=["GET"])
+async def index():
+    messages = get_flashed_messages(with_categories=True)
+    selection = request.args.get("shop") or ""
+    try:
+        shop_ids = await run_sync(core.resolve_shop_ids)(selection)
+    except Exception as e:
+        return str(e), 400
+    try:
+        detailed, found_types, snapshot = await dashboard_catalog(shop_ids, force=request.args.get("refresh") == "1")
+    except Exception as e:
+        return core.unavailable_page(e)
+    cost_drift = await run_sync(core.drifted_refs)(detailed)
+    etag = None if messages else core.dashboard_etag(shop_ids, selection, snapshot, cost_drift)
+    if etag and request.if_none_match.contains_weak(etag):
+        return core.with_dashboard_etag(Response(b"", status=304), etag)
+    try:
+        await attach_shipping_costs(detailed)
+    except Exception:
+        pass  # shipping shows as N/A while Printify is unreachable
+    body = await render_template_string(core.DASHBOARD_HTML, products=detailed, found_types=found_types,
+                                        messages=messages, snapshot=snapshot, cost_drift=cost_drift,
+                                        **core.shop_context(shop_ids, selection))
+    return core.with_dashboard_etag(Response(body, mimetype="text/html"), etag)
+
+@app.route("/bulk_edit", methods=["POST"])
+async def bulk_edit():
+    form = await request.form
+    refs = [ref for ref in form.get("product_ids", "").split(",") if ref]
+    if not refs:
+        await flash("No products selected.", "error")
+        return redirect(url_for("index"))
+    try:
+        grouped = await run_sync(core.group_by_shop)(refs)
+        detailed = await get_cached_catalog(list(grouped))
+        mode, value, flat_prices, msg_title = core.parse_bulk_form(form)
+    except Exception as e:
+        await flash(str(e), "error")
+        return redirect(url_for("index"))
+
+    cached = {core.product_ref(p.shop_id, p.id): p for p in detailed}
+    product_lookup = {ref: p.title or str(p.id) for ref, p in cached.items()}
+    ordered = [(shop_id, pid) for shop_id, pids in grouped.items() for pid in pids]
+    journal = await run_sync(Journal.create)(
+        "price", {"mode": mode, "value": value, "flat": flat_prices, "source": "bulk_edit"},
+        [core.product_ref(shop_id, pid) for shop_id, pid in ordered]
+    )
+    snapshot = await run_sync(Snapshot.create)("bulk_edit", journal.params, snapshot_id=journal.job_id)
+    rejected = await run_sync(core.preflight_rejections)(ordered, cached, mode, value, flat_prices, journal)
+
+    async def reprice_one(shop_id, pid):
+        res = await reprice_product(shop_id, pid, mode, value, flat_prices, journal=journal, snapshot=snapshot)
+        await run_sync(core.sync_cached_product)(cached.get(core.product_ref(shop_id, pid)), res)
+        return res
+
+    results = await gather_outcomes(reprice_one, [key for key in ordered if key not in rejected], journal)
+    results.update(rejected)
+    await run_sync(journal.finish)()
+    await flash(core.bulk_edit_summary(msg_title, ordered, results, product_lookup, journal.job_id), "success")
+    return redirect(url_for("index"))
+
+@app.route("/edit_price_all", methods=["POST"])
+async def edit_price_all():
+    form = await request.form
+    try:
+        shop_id = form.get("shop_id") or await run_sync(core.get_shop_id)()
+    except Exception as e:
+        await flash(str(e), "error")
+        return redirect(url_for("index"))
+    # a single product: the sync editor on a worker thread is enough
+    category, message = await run_sync(core.edit_product_prices)(shop_id, form.get("product_id"), form)
+    await flash(message, category)
+    return redirect(url_for("index"))
+
+@app.route("/publish_selected", methods=["POST"])
+async def publish_selected():
+    data = await request.get_json()
+    try:
+        grouped = await run_sync(core.group_by_shop)(data.get("product_ids", []))
+        detailed = await get_cached_catalog(list(grouped))
+    except Exception as e:
+        return jsonify({"results": [{"id": None, "success": False, "error": str(e)}]}), 500
+
+    id_title = {core.product_ref(p.shop_id, p.id): p.title for p in detailed}
+    ordered = [(shop_id, pid) for shop_id, pids in grouped.items() for pid in pids]
+    journal = await run_sync(Journal.create)("publish", {"retail_price": True},
+                                             [core.product_ref(s, p) for s, p in ordered])
+
+    async def publish_one(shop_id, pid):
+        key = core.product_ref(shop_id, pid)
+        await run_sync(journal.record_intent)(key, None, {"retail_price": True})
+        ok, error = await publish_product(shop_id, pid)
+        await run_sync(journal.record_outcome)(key, "done" if ok else "failed", error)
+        return ok, error
+
+    outcomes = await asyncio.gather(*(publish_one(s, p) for s, p in ordered))
+    await run_sync(journal.finish)()
+    return jsonify({"results": core.publish_results(ordered, dict(zip(ordered, outcomes)), id_title),
+                    "job_id": journal.job_id})
+
+@app.route("/api/price_preview", methods=["POST"])
+async def price_preview():
+    data = await request.get_json(silent=True) or {}
+    try:
+        # load missing shops with the async fan-out; the preview itself is local math
+        await get_cached_catalog(await run_sync(core.resolve_shop_ids)(data.get("shop")))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    body, status = await run_sync(core.price_preview_payload)(data)
+    return jsonify(body), status
+
+@app.route("/api/price_apply", methods=["POST"])
+async def price_apply():
+    data = await request.get_json(silent=True) or {}
+    try:
+        await get_cached_catalog(await run_sync(core.resolve_shop_ids)(data.get("shop")))
+        mode, value, flat, selected, changed, rejected = core.plan_price_apply(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    journal = await run_sync(Journal.create)(
+        "price",
+        {"mode": mode, "value": value, "flat": flat, "source": "price_apply"},
+        [core.product_ref(product.shop_id, product.id) for product in changed]
+    )
+    snapshot = await run_sync(Snapshot.create)("price_apply", journal.params, snapshot_id=journal.job_id)
+    for (shop_id, pid), res in rejected.items():
+        await run_sync(journal.record_outcome)(core.product_ref(shop_id, pid), "rejected", res["error"])
+    products = {(p.shop_id, p.id): p for p in changed if (p.shop_id, p.id) not in rejected}
+
+    async def apply_one(shop_id, pid):
+        product = products[(shop_id, pid)]
+        res = await reprice_product(shop_id, pid, mode, value, flat, journal=journal,
+                                    expected_updated_at=product.updated_at, snapshot=snapshot)
+        await run_sync(core.sync_cached_product)(product, res)
+        return res
+
+    outcomes = await gather_outcomes(apply_one, list(products), journal)
+    outcomes.update(rejected)
+    await run_sync(journal.finish)()
+    return jsonify(core.price_apply_payload(selected, changed, outcomes, journal.job_id))
+
+@app.route("/export/prices.<fmt>", methods=["GET"])
+async def export_price_sheet(fmt):
+    if fmt not in FORMATS:
+        return f"Unknown format {fmt}; use one of {', '.join(FORMATS)}.", 404
+    try:
+        products = await get_cached_catalog(await run_sync(core.resolve_shop_ids)(request.args.get("shop")))
+    except Exception as e:
+        return str(e), 400
+    await attach_shipping_costs(products)
+    headers = {"Content-Disposition": f"attachment; filename=printify-prices.{fmt}"}
+    if fmt == "csv":
+        async def chunks():
+            for chunk in iter_csv(products):
+                yield chunk.encode("utf-8")
+        return Response(chunks(), mimetype="text/csv", headers=headers)
+
+    sink = tempfile.TemporaryFile()
+    try:
+        await run_sync(write_parquet)(products, sink)
+    except SheetError as e:
+        sink.close()
+        return str(e), 501
+    sink.seek(0)
+
+    async def file_chunks():
+        try:
+            while chunk := await run_sync(sink.read)(64 * 1024):
+                yield chunk
+        finally:
+            sink.close()
+    return Response(file_chunks(), mimetype="application/vnd.apache.parquet", headers=headers)
+
+@app.route("/api/price_sheet", methods=["POST"])
+async def import_price_sheet():
+    files = await request.files
+    upload = files.get("sheet")
+    fmt = core.sheet_format(upload, request.args.get("format"))
+    stream = upload.stream if upload is not None else io.BytesIO(await request.get_data())
+    try:
+        await get_cached_catalog(await run_sync(core.resolve_shop_ids)(request.args.get("shop")))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    # validation and the writes reuse the sync pipeline on a worker thread
+    body, status = await run_sync(core.price_sheet_payload)(
+        stream, fmt, request.args.get("shop"), request.args.get("dry_run") == "1")
+    return jsonify(body), status
+
+@app.route("/api/cost_drift", methods=["GET"])
+async def cost_drift():
+    data = {k: request.args.get(k) for k in ("shop", "garment_type", "blueprint_id", "refresh")}
+    if request.args.get("ids"):
+        data["product_ids"] = request.args.get("ids").split(",")
+    body, status = await run_sync(core.cost_drift_payload)(data)
+    return jsonify(body), status
+
+@app.route("/api/cost_drift/apply", methods=["POST"])
+async def cost_drift_apply():
+    data = await request.get_json(silent=True) or {}
+    body, status = await run_sync(core.cost_drift_apply_payload)(data)
+    return jsonify(body), status
+
+@app.route("/api/cost_drift/acknowledge", methods=["POST"])
+async def cost_drift_acknowledge():
+    data = await request.get_json(silent=True) or {}
+    body, status = await run_sync(core.cost_drift_acknowledge_payload)(data)
+    return jsonify(body), status
+
+@app.route("/api/rule_sets", methods=["GET"])
+async def list_rule_sets():
+    body, status = await run_sync(core.rule_sets_payload)()
+    return jsonify(body), status
+
+@app.route("/api/rule_sets/<name>", methods=["PUT"])
+async def save_rule_set(name):
+    data = await request.get_json(silent=True) or {}
+    body, status = await run_sync(core.save_rule_set_payload)(name, data)
+    return jsonify(body), status
+
+@app.route("/api/rule_sets/<name>", methods=["DELETE"])
+async def delete_rule_set(name):
+    body, status = await run_sync(core.delete_rule_set_payload)(name)
+    return jsonify(body), status
+
+@app.route("/api/rule_sets/<name>/apply", methods=["POST"])
+async def apply_rule_set(name):
+    data = await request.get_json(silent=True) or {}
+    body, status = await run_sync(core.rule_set_apply_payload)(name, data)
+    return jsonify(body), status
+
+@app.route("/api/snapshots", methods=["GET"])
+async def list_snapshots():
+    body, status = await run_sync(core.snapshots_payload)()
+    return jsonify(body), status
+
+@app.route("/api/snapshots/<snapshot_id>", methods=["GET"])
+async def snapshot(snapshot_id):
+    body, status = await run_sync(core.snapshot_payload)(snapshot_id)
+    return jsonify(body), status
+
+@app.route("/api/snapshots/<snapshot_id>/rollback", methods=["POST"])
+async def rollback_snapshot(snapshot_id):
+    data = await request.get_json(silent=True) or {}
+    body, status = await run_sync(core.snapshot_rollback_payload)(snapshot_id, data)
+    return jsonify(body), status
+
+@app.route("/blueprints", methods=["GET"])
+async def blueprint_browser():
+    try:
+        results, total = await run_sync(core.blueprint_search)(request.args)
+    except Exception as e:
+        return f"<b>Error:</b> {e}", 502
+    return await render_template_string(core.BLUEPRINTS_HTML, results=results, total=total,
+                                        query=request.args.get("q") or "")
+
+@app.route("/api/blueprints", methods=["GET"])
+async def blueprint_search_api():
+    try:
+        results, total = await run_sync(core.blueprint_search)(request.args)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 502
+    return jsonify({"query": request.args.get("q") or "", "total": total,
+                    "count": len(results), "blueprints": [bp.to_dict() for bp in results]})
+
+@app.route("/api/blueprints/<int:blueprint_id>", methods=["GET"])
+async def blueprint_detail(blueprint_id):
+    try:
+        blueprint = await run_sync(core.find_blueprint)(blueprint_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 502
+    if blueprint is None:
+        return jsonify({"error": f"Blueprint {blueprint_id} not found."}), 404
+    return jsonify(blueprint.to_dict())
+
+@app.route("/reports/default_variants", methods=["GET"])
+@app.route("/reports/default_variants.<fmt>", methods=["GET"])
+async def default_variant_report(fmt="html"):
+    selection = request.args.get("shop") or ""
+    try:
+        shop_ids = await run_sync(core.resolve_shop_ids)(selection)
+        rows = core.default_variant_rows(await get_cached_catalog(shop_ids))
+    except Exception as e:
+        return f"<b>Error:</b> {e}", 400
+    if fmt == "json":
+        return jsonify({"products": rows})
+    if fmt == "csv":
+        return Response(core.rows_to_csv(rows, core.DEFAULT_VARIANT_COLUMNS), mimetype="text/csv",
+                        headers={"Content-Disposition": "attachment; filename=default-variants.csv"})
+    if fmt != "html":
+        return f"Unknown format {fmt}; use json or csv.", 404
+    return await render_template_string(core.DEFAULT_VARIANTS_HTML, rows=rows,
+                                        **core.shop_context(shop_ids, selection))
+
+async def analytics_report(args):
+    """Async app.analytics_report(): missing shipping costs (shipping=1) are looked up all at once."""
+    selection = args.get("shop") or ""
+    shop_ids = await run_sync(core.resolve_shop_ids)(selection)
+    products = await get_cached_catalog(shop_ids)
+    if args.get("shipping") == "1":
+        await attach_shipping_costs([p for p in products if p.shipping_cost is None])
+    try:
+        lowest = max(0, min(core.MAX_LOWEST, int(args.get("lowest") or core.LOWEST)))
+    except ValueError:
+        raise ValueError("lowest must be a number.")
+    report = await run_sync(core.margin_analytics.report)(shop_ids, args.get("garment_type") or None, lowest)
+    return report, shop_ids, selection, products
+
+@app.route("/analytics", methods=["GET"])
+async def margin_analytics_view():
+    try:
+        report, shop_ids, selection, products = await analytics_report(request.args)
+    except Exception as e:
+        return f"<b>Error:</b> {e}", 400
+    return await render_template_string(core.ANALYTICS_HTML, report=report,
+                                        garment_types=sorted({p.garment_type for p in products}),
+                                        garment_type=request.args.get("garment_type") or "",
+                                        **core.shop_context(shop_ids, selection))
+
+@app.route("/api/analytics", methods=["GET"])
+async def margin_analytics_api():
+    try:
+        report, _, _, _ = await analytics_report(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify(report)
+
+# ---------- Static assets and response encoding ----------
+
+@app.route("/assets/<path:filename>", methods=["GET"])
+async def asset(filename):
+    found = core.assets.lookup(filename)
+    if found is None:
+        return "Not found", 404
+    encoding = choose_encoding(request.accept_encodings)
+    body = found.encoded.get(encoding) if encoding else None
+    resp = Response(body or found.body, mimetype=found.mimetype)
+    if body:
+        resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    resp.headers["Cache-Control"] = f"public, max-age={core.ASSET_MAX_AGE}, immutable"
+    resp.set_etag(found.digest)
+    return await resp.make_conditional(request)
+
+@app.route("/thumbnail", methods=["GET"])
+async def thumbnail():
+    try:
+        thumb = await run_sync(core.load_thumbnail)(request.args)
+    except ValueError as e:
+        return str(e), 403
+    except Exception as e:
+        print(f"[WARN] Thumbnail of {request.args.get('src')} failed: {e}")
+        return redirect(request.args["src"])
+    resp = Response(thumb.data, mimetype=thumb.mimetype, headers=core.thumbnail_headers(thumb))
+    return await resp.make_conditional(request)
+
+app.jinja_env.globals["thumb_url"] = lambda src: (url_for("thumbnail", **core.thumbnail_params(src))
+                                                  if core.thumbnail_src(src) else src)
+app.jinja_env.globals["asset_url"] = lambda name: url_for("asset", filename=core.assets.fingerprinted(name))
+
+@app.after_request
+async def encode_response(resp):
+    """app.encode_response(): weak ETags on JSON GETs, gzip/brotli on whole text bodies."""
+    if not isinstance(resp.response, DataBody):
+        return resp  # streamed or file bodies
+    if request.method == "GET" and resp.status_code == 200 and resp.mimetype == "application/json" \
+            and not resp.headers.get("ETag"):
+        await resp.add_etag(weak=True)
+        await resp.make_conditional(request)
+    if resp.status_code != 200:
+        return resp
+    data = await resp.get_data()
+    if not should_compress(resp.mimetype, len(data), resp.headers.get("Content-Encoding")):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding:
+        resp.set_data(compress(data, encoding))
+        resp.headers["Content-Encoding"] = encoding
+    return resp
+
+# ---------- Profiling ----------
+
+@app.before_request
+async def start_profile():
+    """
+    app.start_profile(). The profiler runs on the event loop thread, so requests
+    served concurrently on the loop show up in the report too.
+    """
+    if profiling.PROFILE_TOKEN is None or request.endpoint in core.PROFILE_ENDPOINTS \
+            or not profiling.token_matches(request.args, request.headers):
+        return
+    g.profile = profiling.begin(f"{request.method} {request.path}")
+
+@app.after_request
+async def attach_profile(resp):
+    session = g.pop("profile", None)
+    if session is None:
+        if profiling.PROFILE_TOKEN is not None and request.endpoint not in core.PROFILE_ENDPOINTS \
+                and profiling.token_matches(request.args, request.headers):
+            resp.headers["X-Profile"] = "busy"
+        return resp
+    resp.headers["X-Profile-Id"] = session.id
+    session.stop()  # must run on the thread that started it
+    return resp
+
+@app.teardown_request
+async def abandon_profile(error=None):
+    session = g.pop("profile", None)
+    if session is not None:
+        session.stop()
+
+@app.route("/api/profiles", methods=["GET"])
+async def list_profiles():
+    denied = core.profile_access(request.args, request.headers)
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    return jsonify({"profiles": await run_sync(profiling.list_profiles)()})
+
+@app.route("/api/profiles/<profile_id>.<fmt>", methods=["GET"])
+async def download_profile(profile_id, fmt):
+    denied = core.profile_access(request.args, request.headers)
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    path = profiling.profile_path(profile_id, fmt)
+    if path is None:
+        return jsonify({"error": f"No {fmt} report for profile {profile_id}."}), 404
+    return await send_file(path, mimetype=profiling.FORMATS[fmt], as_attachment=fmt == "pstats",
+                           attachment_filename=os.path.basename(path))
+
+@app.route("/api/stats", methods=["GET"])
+async def stats():
+    body = core.stats_payload()
+    body["coalescing"] = {"catalog": catalog_flight.stats(), "product_detail": detail_flight.stats(),
+                          "shipping": shipping_flight.stats()}
+    return jsonify(body)
+
+@app.route("/healthz", methods=["GET"])
+async def healthz():
+    body, status = core.health_payload()
+    return jsonify(body), status, {"Cache-Control": "no-store"}
+
+@app.route("/readyz", methods=["GET"])
+async def readyz():
+    body, status = core.readiness_payload()
+    return jsonify(body), status, {"Cache-Control": "no-store"}
+
+@app.route("/api/jobs", methods=["GET"])
+async def list_jobs():
+    return jsonify({"jobs": await run_sync(list_journals)()})
+
+@app.route("/api/jobs/<job_id>/resume", methods=["POST"])
+async def resume_job_route(job_id):
+    force = request.args.get("force") == "1"
+    try:
+        journal, results = await run_sync(core.resume_job)(job_id, force)
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"job": journal.summary(), "results": results})
+
+if __name__ == "__main__":
+    app.run(port=5000, debug=True)
@@ -0,0 +1,137 @@
+# benchmarks/bench_app.py
+
+"""
+End-to-end benchmarks against the local mock Printify server; no API key needed.
+
+    python -m benchmarks.bench_app --products 1000 --latency-ms 20
+    python -m benchmarks.bench_app --json bench_output.json
+
+Measures index() (buffered and streamed), bulk_edit on 10/100/1000 products
+and publish_selected, reporting wall time and upstream request/429 counts.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from mock_printify import MockPrintify, generate_catalog, start_mock_server
+
+def load_app(api_base):
+    """Import app.py pointed at the mock server, with its journal, cost history and snapshots in scratch directories."""
+    os.environ["PRINTIFY_API_BASE"] = api_base
+    os.environ["PRINTIFY_API_KEY"] = "offline-benchmark"
+    os.environ.setdefault("PRINTIFY_JOURNAL_DIR", tempfile.mkdtemp(prefix="printify-bench-journal-"))
+    os.environ.setdefault("PRINTIFY_COST_DIR", tempfile.mkdtemp(prefix="printify-bench-costs-"))
+    os.environ.setdefault("PRINTIFY_SNAPSHOT_DIR", tempfile.mkdtemp(prefix="printify-bench-snapshots-"))
+    # the mock enforces --rate-limit itself; don't also throttle client-side
+    os.environ.setdefault("PRINTIFY_REQUESTS_PER_MINUTE", "0")
+    for name in ("journal", "pipeline", "costs", "snapshots", "app"):
+        sys.modules.pop(name, None)
+    return importlib.import_module("app")
+
+def cold(app_module):
+    """Drop the app's in-process caches so each run pays the same warm-up cost."""
+    app_module.BLUEPRINT_MAP = None
+    app_module.BLUEPRINT_INDEX = None
+    app_module.SHOPS = None
+    app_module.shipping_cache.clear()
+    app_module.catalog_cache.clear()
+
+def measure(name, state, fn, n=None):
+    state.reset_stats()
+    started = time.perf_counter()
+    status = fn()
+    elapsed = time.perf_counter() - started
+    stats = state.stats
+    return {
+        "name": name,
+        "n": n,
+        "seconds": round(elapsed, 4),
+        "per_item_ms": round(elapsed / n * 1000, 3) if n else None,
+        "upstream_requests": stats["requests"],
+        "throttled": stats["throttled"],
+        "status": status,
+    }
+
+def run(args):
+    fixtures = generate_catalog(args.products, args.variants)
+    state = MockPrintify(fixtures, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                         rate_limit_per_minute=args.rate_limit, error_rate=args.error_rate)
+    server, api_base = start_mock_server(state)
+    try:
+        app_module = load_app(api_base)
+        app_module.app.logger.disabled = True
+        client = app_module.app.test_client()
+        product_ids = [p["id"] for p in next(iter(fixtures["products"].values()))]
+        results = []
+
+        def index(path):
+            def go():
+                cold(app_module)
+                resp = client.get(path)
+                resp.get_data()  # drain the stream for ?stream=1
+                return resp.status_code
+            return go
+
+        for _ in range(args.repeat):
+            results.append(measure("index", state, index("/"), len(product_ids)))
+            results.append(measure("index?stream=1", state, index("/?stream=1"), len(product_ids)))
+
+        for size in args.sizes:
+            ids = ",".join(product_ids[:size])
+            for i in range(args.repeat):
+                # alternate margins so every run really changes prices
+                margin = str(40 + i % 2)
+                results.append(measure(
+                    "bulk_edit", state,
+                    lambda: client.post("/bulk_edit", data={"product_ids": ids, "percent_val": margin}).status_code,
+                    min(size, len(product_ids)),
+                ))
+            results.append(measure(
+                "publish_selected", state,
+                lambda: client.post("/publish_selected", json={"product_ids": product_ids[:size]}).status_code,
+                min(size, len(product_ids)),
+            ))
+        return results
+    finally:
+        server.shutdown()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmarks against mock_printify.")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--variants", type=int, default=30)
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON (e.g. to diff against a baseline)")
+    args = parser.parse_args(argv)
+
+    # keep the app's per-product log lines out of the report
+    sys.stdout, real_stdout = open(os.devnull, "w"), sys.stdout
+    try:
+        results = run(args)
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    print(f"{'benchmark':<18} {'n':>6} {'seconds':>10} {'ms/item':>10} {'upstream':>9} {'429s':>6} {'status':>7}")
+    for r in results:
+        print(f"{r['name']:<18} {r['n'] or '':>6} {r['seconds']:>10.3f} {r['per_item_ms'] or 0:>10.2f} "
+              f"{r['upstream_requests']:>9} {r['throttled']:>6} {r['status']:>7}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"args": vars(args), "results": results}, fh, indent=2)
+
+if __name__ == "__main__":
+    main()
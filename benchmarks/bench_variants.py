@@ -0,0 +1,174 @@
+# benchmarks/bench_variants.py
+
+"""
+Micro-benchmarks for the per-variant hot paths: size/color resolution,
+the title fallback, Large-variant lookup and the pricing/margin loops.
+
+    python -m benchmarks.bench_variants --variants 100000
+    python -m benchmarks.bench_variants --shapes list,dict --json baseline.json
+    python -m benchmarks.bench_variants --compare baseline.json
+
+Cases are written pytest-benchmark style (`bench_*(benchmark, catalog)`),
+but run with a small built-in timer so no plugin is needed.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from mock_printify import generate_product
+
+SHAPES = ("list", "dict", "title", "mixed")
+
+def synthetic_catalog(total_variants, variants_per_product=30, shape="list", seed=0):
+    """
+    Product JSON dicts totalling about `total_variants` variants.
+    shape is an options shape from mock_printify ("list", "dict", "title"),
+    or "mixed" to rotate through all three product by product.
+    """
+    rng = random.Random(seed)
+    n_products = max(1, -(-total_variants // variants_per_product))
+    shapes = ("list", "dict", "title") if shape == "mixed" else (shape,)
+    return [
+        generate_product(i, variants_per_product, random.Random(rng.random()), shapes[i % len(shapes)])
+        for i in range(n_products)
+    ]
+
+class Benchmark:
+    """Minimal stand-in for pytest-benchmark's fixture: benchmark(fn, *args) times fn and returns its result."""
+
+    def __init__(self, rounds=5):
+        self.rounds = rounds
+        self.timings = []
+
+    def __call__(self, fn, *args, **kwargs):
+        result = None
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            result = fn(*args, **kwargs)
+            self.timings.append(time.perf_counter() - started)
+        return result
+
+# ---------- Cases ----------
+
+def bench_extract_size_color_titles(benchmark, catalog):
+    import app
+    def run():
+        for prod in catalog:
+            options = prod["options"]
+            for v in prod["variants"]:
+                app.extract_size_color_titles(v, options)
+    benchmark(run)
+
+def bench_parse_from_title_fallback(benchmark, catalog):
+    import app
+    def run():
+        for prod in catalog:
+            options = prod["options"]
+            for v in prod["variants"]:
+                app._parse_from_title_fallback(v["title"], options)
+    benchmark(run)
+
+def bench_get_large_variant(benchmark, catalog):
+    import app
+    def run():
+        for prod in catalog:
+            app.get_large_variant(prod["variants"], prod["options"])
+    benchmark(run)
+
+def bench_margin_loop(benchmark, catalog):
+    """Per-variant margin pricing plus the confirmation-table profit/margin math, on raw dicts."""
+    import app
+    from pricing import compute_prices, profit_margin
+    def run():
+        for prod in catalog:
+            variants = prod["variants"]
+            large = app.get_large_variant(variants, prod["options"])
+            prices = compute_prices([v["cost"] for v in variants], large["cost"], "margin", 40)
+            for v, price in zip(variants, prices):
+                profit_margin(price, v["cost"])
+    benchmark(run)
+
+def bench_product_from_api(benchmark, catalog):
+    from models import Product
+    benchmark(lambda: [Product.from_api(prod) for prod in catalog])
+
+def bench_preview_product(benchmark, catalog):
+    from models import Product
+    from pricing import preview_product
+    products = [Product.from_api(prod) for prod in catalog]
+    benchmark(lambda: [preview_product(p, "margin", 40) for p in products])
+
+CASES = [
+    bench_extract_size_color_titles,
+    bench_parse_from_title_fallback,
+    bench_get_large_variant,
+    bench_margin_loop,
+    bench_product_from_api,
+    bench_preview_product,
+]
+
+def run(args):
+    results = []
+    for shape in args.shapes:
+        catalog = synthetic_catalog(args.variants, args.per_product, shape)
+        n_variants = sum(len(p["variants"]) for p in catalog)
+        for case in CASES:
+            if args.only and args.only not in case.__name__:
+                continue
+            benchmark = Benchmark(args.rounds)
+            case(benchmark, catalog)
+            best = min(benchmark.timings)
+            results.append({
+                "name": case.__name__[len("bench_"):],
+                "shape": shape,
+                "variants": n_variants,
+                "min_s": round(best, 5),
+                "median_s": round(statistics.median(benchmark.timings), 5),
+                "ns_per_variant": round(best / n_variants * 1e9, 1),
+            })
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for variant resolution and pricing.")
+    parser.add_argument("--variants", type=int, default=100000, help="total variants in the synthetic catalog")
+    parser.add_argument("--per-product", type=int, default=30, help="variants per product")
+    parser.add_argument("--shapes", type=lambda s: s.split(","), default=["list", "dict"],
+                        help=f"comma-separated options shapes: {', '.join(SHAPES)}")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--only", help="run only cases whose name contains this")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON (a baseline for --compare)")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON to compare against")
+    args = parser.parse_args(argv)
+    for shape in args.shapes:
+        if shape not in SHAPES:
+            parser.error(f"unknown shape {shape!r}")
+
+    results = run(args)
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = {(r["name"], r["shape"]): r for r in json.load(fh)["results"]}
+
+    print(f"{'case':<30} {'shape':<6} {'variants':>9} {'min s':>9} {'median s':>9} {'ns/var':>9}" + ("  vs base" if baseline else ""))
+    for r in results:
+        line = (f"{r['name']:<30} {r['shape']:<6} {r['variants']:>9} {r['min_s']:>9.4f} "
+                f"{r['median_s']:>9.4f} {r['ns_per_variant']:>9.1f}")
+        base = baseline.get((r["name"], r["shape"]))
+        if base:
+            line += f"  {base['ns_per_variant'] / r['ns_per_variant']:>6.2f}x"
+        print(line)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"args": vars(args), "results": results}, fh, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,77 @@
-import requests
+# blooops.py
+
+"""
+Browse the Printify blueprint catalog from the command line.
+
+Uses the same cached catalog and search index as the dashboard (blueprints.py),
+in PRINTIFY_CACHE_DB or cache/printify-cache.sqlite3, so after the first run
+lookups are instant and --offline works without Printify.
+
+    python blooops.py                        # every blueprint id and title
+    python blooops.py search heavy hoo       # prefix search over title, brand and model
+    python blooops.py show 77                # one blueprint by id
+    python blooops.py --offline search gildan
+"""
+
+import argparse
 import os
+import sys
+
 from dotenv import load_dotenv
 
+from blueprints import fetch_blueprint, fetch_blueprints, load_index, store_index
+from cache import CACHE_DB, DEFAULT_CACHE_DB, open_shared_cache
+
 load_dotenv()
 
 API_KEY = os.environ.get("PRINTIFY_API_KEY")
+# Point at a local stand-in (e.g. mock_printify.py) for offline runs
+API_BASE = os.environ.get("PRINTIFY_API_BASE", "https://api.printify.com/v1").rstrip("/")
+
+def print_blueprint(bp):
+    extra = " | ".join(x for x in (bp.brand, bp.model) if x)
+    print(f"ID: {bp.id} | Title: {bp.title}" + (f" | {extra}" if extra else ""))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List, search and look up Printify blueprints.")
+    parser.add_argument("--offline", action="store_true", help="use the cached catalog only; never call Printify")
+    parser.add_argument("--cache", help="cache database (default: PRINTIFY_CACHE_DB or cache/printify-cache.sqlite3)")
+    sub = parser.add_subparsers(dest="command")
+    search = sub.add_parser("search", help="blueprints matching every word (as a prefix)")
+    search.add_argument("query", nargs="+")
+    search.add_argument("--limit", type=int, default=20, help="0 = all matches")
+    show = sub.add_parser("show", help="one blueprint by id")
+    show.add_argument("blueprint_id", type=int)
+    args = parser.parse_args(argv)
+
+    path = args.cache or CACHE_DB or DEFAULT_CACHE_DB
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    cache = open_shared_cache(path)
+    try:
+        index = load_index(lambda: fetch_blueprints(API_BASE, API_KEY), cache, offline=args.offline)
+    except Exception as e:
+        print(f"Failed to load blueprints: {e}", file=sys.stderr)
+        return 2
+
+    if args.command == "search":
+        results = index.search(" ".join(args.query), limit=args.limit)
+        for bp in results:
+            print_blueprint(bp)
+        return 0 if results else 1
+    if args.command == "show":
+        bp = index.get(args.blueprint_id)
+        if bp is None and not args.offline:
+            bp = fetch_blueprint(API_BASE, API_KEY, args.blueprint_id)
+            if bp is not None:
+                store_index(cache, index.with_blueprint(bp))
+        if bp is None:
+            print(f"Blueprint {args.blueprint_id} not found.", file=sys.stderr)
+            return 1
+        print_blueprint(bp)
+        return 0
+    for bp in index.all():
+        print_blueprint(bp)
+    return 0
 
-resp = requests.get(
-    "https://api.printify.com/v1/catalog/blueprints.json",
-    headers={"Authorization": f"Bearer {API_KEY}"}
-)
-
-if resp.status_code == 200:
-    blueprints = resp.json()
-    for bp in blueprints:
-        print(f"ID: {bp['id']} | Title: {bp['title']}")
-else:
-    print("Failed to fetch blueprints:", resp.text)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# blueprints.py
+
+"""
+Printify blueprint catalog with a local search index.
+
+The catalog (id, title, brand, model of every blueprint) is downloaded once and
+kept in the shared cache under BLUEPRINT_KEY, the same entry the dashboard's
+blueprint map reads, so searching or looking up a blueprint never downloads the
+catalog again. When Printify cannot be reached the cached copy is used however
+old it is, and offline=True never calls Printify at all.
+
+Search is tokenized: every word of the query must match the start of a word in
+the title, brand or model ("hea hoo" finds "Unisex Heavy Blend™ Hooded
+Sweatshirt"). Title hits and whole-word hits rank first.
+"""
+
+import bisect
+import re
+from dataclasses import asdict, dataclass
+
+import requests
+
+from cache import CACHE_TTL, MISSING
+
+BLUEPRINT_KEY = "blueprint_catalog"
+# The full catalog is a large response; give it longer than a product call
+TIMEOUT = 60
+# Title words count more than brand/model words; a whole-word match doubles the weight
+FIELD_WEIGHTS = (("title", 3), ("brand", 2), ("model", 2))
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+def tokenize(text):
+    """Lowercased words and numbers ("Bella+Canvas 3001" -> ["bella", "canvas", "3001"])."""
+    return TOKEN_RE.findall((text or "").casefold())
+
+@dataclass(slots=True)
+class Blueprint:
+    id: int
+    title: str
+    brand: str = ""
+    model: str = ""
+
+    @classmethod
+    def from_api(cls, data):
+        return cls(
+            id=data["id"],
+            title=data.get("title") or f"Blueprint {data['id']}",
+            brand=data.get("brand") or "",
+            model=data.get("model") or "",
+        )
+
+    def to_dict(self):
+        return asdict(self)
+
+class BlueprintIndex:
+    """
+    Immutable inverted index over a blueprint list: word -> {blueprint id: weight},
+    plus the sorted word list for prefix lookups with bisect.
+    """
+    __slots__ = ("by_id", "postings", "tokens")
+
+    def __init__(self, blueprints):
+        self.by_id = {bp.id: bp for bp in blueprints}
+        self.postings = {}
+        for bp in self.by_id.values():
+            for name, weight in FIELD_WEIGHTS:
+                for token in tokenize(getattr(bp, name)):
+                    ids = self.postings.setdefault(token, {})
+                    if ids.get(bp.id, 0) < weight:
+                        ids[bp.id] = weight
+        self.tokens = sorted(self.postings)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def get(self, blueprint_id):
+        try:
+            return self.by_id.get(int(blueprint_id))
+        except (TypeError, ValueError):
+            return None
+
+    def titles(self):
+        """{blueprint id: title}, the dashboard's blueprint map."""
+        return {bp.id: bp.title for bp in self.by_id.values()}
+
+    def all(self):
+        return sorted(self.by_id.values(), key=lambda bp: bp.id)
+
+    def with_blueprint(self, blueprint):
+        """A new index that also holds `blueprint` (readers of the old one are unaffected)."""
+        return BlueprintIndex(list(self.by_id.values()) + [blueprint])
+
+    def _matches(self, term):
+        """{blueprint id: best weight} over every indexed word starting with `term`."""
+        hits = {}
+        i = bisect.bisect_left(self.tokens, term)
+        while i < len(self.tokens) and self.tokens[i].startswith(term):
+            token = self.tokens[i]
+            boost = 2 if token == term else 1
+            for bp_id, weight in self.postings[token].items():
+                if hits.get(bp_id, 0) < weight * boost:
+                    hits[bp_id] = weight * boost
+            i += 1
+        return hits
+
+    def search(self, query, limit=20):
+        """Blueprints matching every word of `query` (as a prefix), best first; a bare id matches that blueprint."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        scores = None
+        for term in terms:
+            hits = self._matches(term)
+            scores = hits if scores is None else {i: s + hits[i] for i, s in scores.items() if i in hits}
+            if not scores:
+                break
+        exact = self.get(query.strip()) if query.strip().isdigit() else None
+        ranked = sorted(scores or {}, key=lambda i: (-scores[i], len(self.by_id[i].title), i))
+        results = [self.by_id[i] for i in ranked if exact is None or i != exact.id]
+        if exact is not None:
+            results.insert(0, exact)
+        return results[:limit] if limit else results
+
+def _from_rows(rows):
+    return BlueprintIndex(Blueprint(**row) for row in rows)
+
+def store_index(cache, index):
+    if cache is not None:
+        cache.set(BLUEPRINT_KEY, [bp.to_dict() for bp in index.all()])
+
+def fetch_blueprints(api_base, api_key, request=requests.request):
+    """Download the whole blueprint catalog (`request` is requests.request or a wrapper like app.api_request)."""
+    resp = request(
+        "GET",
+        f"{api_base}/catalog/blueprints.json",
+        headers={"Authorization": f"Bearer {api_key}"},
+        timeout=TIMEOUT
+    )
+    resp.raise_for_status()
+    return [Blueprint.from_api(bp) for bp in resp.json()]
+
+def fetch_blueprint(api_base, api_key, blueprint_id, request=requests.request):
+    """One blueprint by id, or None when Printify has no such blueprint."""
+    resp = request(
+        "GET",
+        f"{api_base}/catalog/blueprints/{int(blueprint_id)}.json",
+        headers={"Authorization": f"Bearer {api_key}"},
+        timeout=TIMEOUT
+    )
+    if resp.status_code == 404:
+        return None
+    resp.raise_for_status()
+    return Blueprint.from_api(resp.json())
+
+def load_index(fetch, cache=None, offline=False):
+    """
+    BlueprintIndex from the shared cache while it is fresh (any age when offline),
+    else from fetch() (stored back to the cache). If fetch() fails, a stale cached
+    copy is used instead of failing.
+    """
+    if cache is not None:
+        rows = cache.get(BLUEPRINT_KEY, max_age=None if offline else CACHE_TTL)
+        if rows is not MISSING:
+            return _from_rows(rows)
+    if offline:
+        raise Exception("No cached blueprint catalog; run once online (or set PRINTIFY_CACHE_DB) first.")
+    try:
+        index = BlueprintIndex(fetch())
+    except Exception as e:
+        rows = cache.get(BLUEPRINT_KEY, max_age=None) if cache is not None else MISSING
+        if rows is MISSING:
+            raise
+        print(f"[WARN] Could not refresh the blueprint catalog ({e}); using the cached copy.")
+        return _from_rows(rows)
+    store_index(cache, index)
+    return index
@@ -0,0 +1,207 @@
+# cache.py
+
+"""
+Cross-process cache in one SQLite file (WAL mode), so every gunicorn worker
+shares the catalog, blueprint map and shipping costs instead of warming its own.
+
+Enabled by PRINTIFY_CACHE_DB (gunicorn.conf.py sets it); without it the app
+keeps its in-process caches only. WAL lets readers in all workers proceed while
+one writer commits; writes are short transactions.
+
+Catalogs are stored one row per product with a change sequence number, so a
+worker only re-reads the products other workers changed since its last look.
+A full reload of a shop bumps the shop's generation and replaces every row.
+
+Leases (kv rows with an owner and an expiry) let one worker do a job the
+others would otherwise repeat, such as the first crawl of a shop.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DB = os.environ.get("PRINTIFY_CACHE_DB")
+# Where tools that always want a cache (blooops.py) put it; gunicorn.conf.py defaults to the same file
+DEFAULT_CACHE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "printify-cache.sqlite3")
+# Blueprints and shipping rates change rarely; re-fetch them after this many seconds
+CACHE_TTL = float(os.environ.get("PRINTIFY_CACHE_TTL", "86400"))
+
+MISSING = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS catalog (
+    shop_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (shop_id, product_id)
+);
+CREATE INDEX IF NOT EXISTS catalog_seq ON catalog (shop_id, seq);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    shop_id TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    loaded REAL NOT NULL
+);
+"""
+
+class SharedCache:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        """One connection per thread (sqlite3 connections are not shared across threads)."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        """Run fn(conn) in one IMMEDIATE transaction (takes the write lock up front)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    # ---------- Key/value (blueprints, shipping) ----------
+
+    def get(self, key, max_age=CACHE_TTL):
+        """Stored JSON value, or MISSING when absent or older than `max_age` seconds."""
+        row = self._conn().execute("SELECT value, updated FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            return MISSING
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        self._conn().execute(
+            "INSERT INTO kv (key, value, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+            (key, json.dumps(value), time.time())
+        )
+
+    # ---------- Leases ----------
+
+    def claim(self, key, owner, ttl):
+        """Take lease `key` for `owner` for `ttl` seconds unless another owner holds it; True when taken."""
+        def write(conn):
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is not None:
+                held = json.loads(row[0])
+                if held["owner"] != owner and held["expires"] > now:
+                    return False
+            conn.execute("INSERT OR REPLACE INTO kv (key, value, updated) VALUES (?, ?, ?)",
+                         (key, json.dumps({"owner": owner, "expires": now + ttl}), now))
+            return True
+        return self._write(write)
+
+    def release(self, key, owner):
+        """Give up lease `key` if `owner` still holds it."""
+        def write(conn):
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            if row is not None and json.loads(row[0])["owner"] == owner:
+                conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+        self._write(write)
+
+    def is_claimed(self, key):
+        """True while some owner holds lease `key`."""
+        row = self._conn().execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return row is not None and json.loads(row[0])["expires"] > time.time()
+
+    # ---------- Catalogs ----------
+
+    def replace_catalog(self, shop_id, products):
+        """Store a freshly loaded shop catalog (list of dicts, in display order); returns (generation, seq)."""
+        shop_id = str(shop_id)
+
+        def write(conn):
+            row = conn.execute("SELECT generation, seq FROM catalog_meta WHERE shop_id = ?", (shop_id,)).fetchone()
+            generation, seq = (row[0] + 1, row[1] + 1) if row else (1, 1)
+            conn.execute("DELETE FROM catalog WHERE shop_id = ?", (shop_id,))
+            conn.executemany(
+                "INSERT INTO catalog (shop_id, product_id, position, seq, data) VALUES (?, ?, ?, ?, ?)",
+                [(shop_id, str(p["id"]), i, seq, json.dumps(p)) for i, p in enumerate(products)]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO catalog_meta (shop_id, generation, seq, loaded) VALUES (?, ?, ?, ?)",
+                (shop_id, generation, seq, time.time())
+            )
+            return generation, seq
+        return self._write(write)
+
+    def put_products(self, shop_id, products):
+        """Update cached products in place (e.g. after a price change); unknown ones are ignored."""
+        shop_id = str(shop_id)
+
+        def write(conn):
+            row = conn.execute("SELECT seq FROM catalog_meta WHERE shop_id = ?", (shop_id,)).fetchone()
+            if row is None:
+                return None
+            seq = row[0] + 1
+            conn.executemany(
+                "UPDATE catalog SET seq = ?, data = ? WHERE shop_id = ? AND product_id = ?",
+                [(seq, json.dumps(p), shop_id, str(p["id"])) for p in products]
+            )
+            conn.execute("UPDATE catalog_meta SET seq = ? WHERE shop_id = ?", (seq, shop_id))
+            return seq
+        return self._write(write)
+
+    def catalog_since(self, shop_id, generation=None, seq=0):
+        """
+        What changed in a shop's catalog since (generation, seq):
+        (generation, seq, rows, full) where rows are product dicts, `full` means
+        they replace the whole catalog, and generation None means nothing is stored.
+        """
+        shop_id = str(shop_id)
+        conn = self._conn()
+        # one read transaction: meta and rows come from the same WAL snapshot
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT generation, seq FROM catalog_meta WHERE shop_id = ?", (shop_id,)).fetchone()
+            if row is None:
+                return None, 0, [], False
+            stored_generation, stored_seq = row
+            if stored_generation != generation:
+                rows = conn.execute("SELECT data FROM catalog WHERE shop_id = ? ORDER BY position", (shop_id,))
+                return stored_generation, stored_seq, [json.loads(r[0]) for r in rows], True
+            if stored_seq == seq:
+                return generation, seq, [], False
+            rows = conn.execute("SELECT data FROM catalog WHERE shop_id = ? AND seq > ? ORDER BY position",
+                                (shop_id, seq))
+            return generation, stored_seq, [json.loads(r[0]) for r in rows], False
+        finally:
+            conn.execute("COMMIT")
+
+    def catalog_loaded(self, shop_id):
+        """When the shop's stored catalog was last fully loaded (epoch seconds), or None."""
+        row = self._conn().execute("SELECT loaded FROM catalog_meta WHERE shop_id = ?", (str(shop_id),)).fetchone()
+        return row[0] if row else None
+
+    def clear(self):
+        def write(conn):
+            for table in ("kv", "catalog", "catalog_meta"):
+                conn.execute(f"DELETE FROM {table}")
+        self._write(write)
+
+def open_shared_cache(path=None):
+    """The configured SharedCache, or None when PRINTIFY_CACHE_DB is not set."""
+    path = path or CACHE_DB
+    return SharedCache(path) if path else None
@@ -0,0 +1,214 @@
+# cli.py
+
+"""
+Headless bulk repricing and publishing, for nightly jobs and large batches that
+should not go through the web server. Uses the same pricing and Printify client
+code as the dashboard, and journals every run the same way (resume with
+POST /api/jobs/<job_id>/resume).
+
+Results stream to stdout as NDJSON: one line per product as it finishes, then
+one summary line. Log lines go to stderr.
+
+    python cli.py reprice --garment-type "Unisex Heavy Cotton Tee" --mode margin --value 45 --dry-run
+    python cli.py reprice --shop all --blueprint 6 --mode profit --value 8 --flat --publish
+    python cli.py publish --ids 1234:5f1a...,5f1b...
+    python cli.py rollback 20250101-120000-ab12cd --dry-run
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import threading
+
+import app
+from journal import Journal
+from snapshots import Snapshot
+from pipeline import parallel_map
+from pricing import MODES, preview_product
+
+class NDJSONWriter:
+    """Thread-safe line writer; every record is flushed as soon as it is written."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.counts = {}   # action -> status -> products
+
+    def write(self, record):
+        line = json.dumps(record, default=str)
+        with self.lock:
+            if record.get("type") == "product":
+                counts = self.counts.setdefault(record["action"], {})
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+def product_record(action, product, status, **extra):
+    rec = {"type": "product", "action": action, "shop_id": product.shop_id, "id": product.id,
+           "title": product.title, "status": status}
+    rec.update(extra)
+    return rec
+
+def load_selection(args):
+    """Load the chosen shops' catalogs (args.workers detail fetches per shop) and apply the filters."""
+    shop_ids = app.resolve_shop_ids(args.shop)
+    products, _ = app.get_catalogs(shop_ids, workers_per_shop=args.workers)
+    ids = [x.strip() for x in (args.ids or "").split(",") if x.strip()]
+    return app.select_products(products, product_ids=ids or None,
+                               garment_type=args.garment_type, blueprint_id=args.blueprint)
+
+def publish_products(products, args, out):
+    """Publish retail prices for `products`, journaled like publish_selected; returns the job id."""
+    if args.dry_run:
+        for product in products:
+            out.write(product_record("publish", product, "would_publish"))
+        return None
+    if not products:
+        return None
+    journal = Journal.create("publish", {"retail_price": True, "source": "cli"},
+                             [app.product_ref(p.shop_id, p.id) for p in products])
+
+    def publish_one(product):
+        key = app.product_ref(product.shop_id, product.id)
+        journal.record_intent(key, None, {"retail_price": True})
+        ok, error = app.publish_product(product.shop_id, product.id)
+        journal.record_outcome(key, "done" if ok else "failed", error)
+        return ok, error
+
+    for product, res, error in parallel_map(publish_one, products, max_workers=args.workers):
+        ok, publish_error = res if error is None else (False, str(error))
+        out.write(product_record("publish", product, "done" if ok else "failed",
+                                 error=publish_error, job_id=journal.job_id))
+    journal.finish()
+    return journal.job_id
+
+def run_reprice(args, out):
+    mode, value, flat = app.parse_pricing_request({"mode": args.mode, "value": args.value, "flat": args.flat})
+    selected = load_selection(args)
+
+    # same local preview as /api/price_preview: unchanged products never reach Printify
+    changed = []
+    for product in selected:
+        preview = preview_product(product, mode, value, flat)
+        moves = [r for r in preview["variants"] if r["price_after"] != r["price_before"]]
+        if not moves:
+            out.write(product_record("reprice", product, "skipped", changed_variants=0))
+            continue
+        checked = app.local_preflight(product, [r["price_after"] for r in preview["variants"]])
+        if not checked.ok:
+            out.write(product_record("reprice", product, "rejected", changed_variants=len(moves),
+                                     error=checked.message(), preflight=checked.to_dict()))
+        else:
+            changed.append(product)
+            if args.dry_run:
+                out.write(product_record("reprice", product, "would_update",
+                                         changed_variants=len(moves), variants=moves))
+
+    job_ids = {}
+    done = []
+    if changed and not args.dry_run:
+        journal = Journal.create("price", {"mode": mode, "value": value, "flat": flat, "source": "cli"},
+                                 [app.product_ref(p.shop_id, p.id) for p in changed])
+        job_ids["price"] = journal.job_id
+        snapshot = Snapshot.create("cli", journal.params, snapshot_id=journal.job_id)
+
+        def apply_one(product):
+            res = app.reprice_product(product.shop_id, product.id, mode, value, flat, journal=journal,
+                                      expected_updated_at=product.updated_at, snapshot=snapshot)
+            # the shared cache holds the catalog as loaded above; other workers must see the new prices
+            app.sync_cached_product(product, res)
+            return res
+
+        for product, res, error in parallel_map(apply_one, changed, max_workers=args.workers):
+            if error is not None:
+                journal.record_outcome(app.product_ref(product.shop_id, product.id), "failed", str(error))
+                res = {"status": "failed", "error": str(error), "changed": []}
+            if res["status"] == "done":
+                done.append(product)
+            out.write(product_record("reprice", product, res["status"], changed_variants=len(res["changed"]),
+                                     error=None if res["error"] is None else str(res["error"]),
+                                     job_id=journal.job_id))
+        journal.finish()
+
+    if args.publish:
+        # a dry run lists every product whose prices would move
+        job_ids["publish"] = publish_products(changed if args.dry_run else done, args, out)
+    return {"mode": mode, "value": value, "flat": flat, "selected": len(selected), "job_ids": job_ids}
+
+def run_publish(args, out):
+    selected = load_selection(args)
+    return {"selected": len(selected), "job_ids": {"publish": publish_products(selected, args, out)}}
+
+def run_rollback(args, out):
+    """Restore a price snapshot (see GET /api/snapshots); only variants whose prices still differ are written."""
+    ids = [x.strip() for x in (args.ids or "").split(",") if x.strip()]
+    body, status = app.snapshot_rollback_payload(args.snapshot_id, {"product_ids": ids or None, "dry_run": args.dry_run})
+    if status == 404:
+        raise ValueError(body["error"])
+    if status != 200:
+        raise RuntimeError(body["error"])
+    if args.dry_run:
+        for p in body["products"]:
+            out.write({"type": "product", "action": "rollback", "shop_id": p["shop_id"], "id": p["id"],
+                       "title": p["title"], "status": "would_update", "changed_variants": p["changed_variants"],
+                       "variants": p["variants"]})
+    else:
+        for r in body["results"]:
+            out.write({"type": "product", "action": "rollback", "shop_id": r["shop_id"], "id": r["id"],
+                       "title": r["title"], "status": "done" if r["success"] else r["status"],
+                       "changed_variants": r.get("changed_variants", 0), "error": r.get("error"),
+                       "job_id": body["job_id"]})
+    return {"snapshot_id": args.snapshot_id, "summary": body["summary"], "job_ids": {"rollback": body.get("job_id")}}
+
+def add_selection_args(parser):
+    parser.add_argument("--shop", help='shop id, or "all" (default: the first shop)')
+    parser.add_argument("--ids", help='comma-separated product ids or "<shop_id>:<product_id>" refs')
+    parser.add_argument("--garment-type", help="only products of this garment type")
+    parser.add_argument("--blueprint", type=int, help="only products of this blueprint id")
+    parser.add_argument("--workers", type=int, default=16,
+                        help="concurrent Printify calls (still capped by PRINTIFY_REQUESTS_PER_MINUTE)")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change; write nothing")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk reprice and publish Printify products without the web UI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    reprice = sub.add_parser("reprice", help="set retail, profit or margin on the selected products")
+    add_selection_args(reprice)
+    reprice.add_argument("--mode", choices=MODES, required=True)
+    reprice.add_argument("--value", type=float, required=True,
+                         help="retail dollars for the Large variant, profit dollars, or margin percent")
+    reprice.add_argument("--flat", action="store_true", help="one retail price for every variant")
+    reprice.add_argument("--publish", action="store_true", help="publish each product after it is repriced")
+
+    publish = sub.add_parser("publish", help="publish retail prices of the selected products")
+    add_selection_args(publish)
+
+    rollback = sub.add_parser("rollback", help="put back the prices saved in a snapshot")
+    rollback.add_argument("snapshot_id", help="snapshot id (the job id of a bulk run)")
+    rollback.add_argument("--ids", help="only these product ids or refs, comma-separated")
+    rollback.add_argument("--dry-run", action="store_true", help="report what would change; write nothing")
+
+    args = parser.parse_args(argv)
+    if getattr(args, "workers", 1) < 1:
+        parser.error("--workers must be at least 1")
+
+    out = NDJSONWriter(sys.stdout)
+    # the app logs progress with print(); keep stdout for NDJSON only
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            run = {"reprice": run_reprice, "publish": run_publish, "rollback": run_rollback}[args.command]
+            summary = run(args, out)
+        except ValueError as e:
+            parser.error(str(e))
+        except Exception as e:
+            out.write({"type": "error", "error": str(e)})
+            return 2
+    out.write(dict({"type": "summary", "command": args.command, "dry_run": args.dry_run,
+                    "counts": out.counts}, **summary))
+    failed = any(c.get("failed") or c.get("conflict") for c in out.counts.values())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
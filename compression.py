@@ -0,0 +1,38 @@
+# compression.py
+
+"""
+gzip/brotli for text responses (HTML, JSON, CSS, JS, CSV). Brotli is used when
+the `brotli` package is installed and the client accepts it; gzip otherwise.
+Responses are compressed whole, so streamed ones (the streaming dashboard,
+price sheet exports) are left alone to keep flushing as they are generated.
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:  # optional; gzip covers every browser
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/csv", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+}
+# Below this many bytes the headers cost more than compression saves
+MIN_SIZE = 1024
+# Per-request levels: most of the gain at a fraction of the CPU of the maximum
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def choose_encoding(accept_encodings):
+    """"br", "gzip" or None for a request's Accept-Encoding (a werkzeug Accept object)."""
+    offers = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return accept_encodings.best_match(offers)
+
+def should_compress(mimetype, size, content_encoding=None):
+    return mimetype in COMPRESSIBLE_TYPES and size >= MIN_SIZE and not content_encoding
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
@@ -0,0 +1,186 @@
+# costs.py
+
+"""
+Variant cost history and cost drift detection.
+
+Every catalog sync appends one record per shop to an append-only JSONL file:
+only the variant costs that moved since the previous sync (the first sync
+stores them all), so the series stays small however often the catalog is
+loaded. The latest costs and each product's baseline (the costs its prices
+were last set against) are rebuilt from the file and kept in memory, so
+finding drift across a whole catalog is one pass over its variants.
+
+A product has drifted when any variant's cost differs from its baseline.
+drift_report() prices those variants to keep the margin they had on the
+baseline cost; acknowledge() moves the baseline to the current costs once the
+new prices are applied or the change is accepted as is.
+"""
+
+import json
+import os
+import threading
+import time
+
+from pricing import margin_preserving_price, profit_margin
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; there only one process should sync at a time
+    fcntl = None
+
+COST_DIR = os.environ.get(
+    "PRINTIFY_COST_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "costs")
+)
+
+class CostHistory:
+    """Cost series of one shop; safe to share between threads, and between processes via flock."""
+
+    def __init__(self, shop_id, directory=None):
+        self.shop_id = str(shop_id)
+        self.directory = directory or COST_DIR
+        self.path = os.path.join(self.directory, f"{self.shop_id}.jsonl")
+        self.latest = {}       # product_id -> {variant_id: cost cents}
+        self.baseline = {}     # product_id -> {variant_id: cost cents}
+        self.changed_at = {}   # product_id -> ts of its last cost change
+        self.syncs = 0
+        self.last_sync = None
+        self.offset = 0        # bytes of the file already replayed
+        self.lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """Pick up syncs and acknowledgements other processes wrote."""
+        if os.path.exists(self.path):
+            with self.lock, open(self.path, "rb") as fh:
+                self._catch_up(fh)
+
+    def _catch_up(self, fh):
+        """Apply records appended since our last look (by this or another process)."""
+        fh.seek(self.offset)
+        for line in fh:
+            if not line.endswith(b"\n"):
+                break  # torn last line from a crash mid-write
+            self.offset += len(line)
+            try:
+                self._apply(json.loads(line))
+            except ValueError:
+                continue
+
+    def _apply(self, rec):
+        typ = rec.get("type")
+        if typ == "costs":
+            for pid, costs in rec["costs"].items():
+                latest = self.latest.setdefault(pid, {})
+                base = self.baseline.setdefault(pid, {})
+                for vid, cost in costs.items():
+                    vid = int(vid)
+                    if vid in latest:
+                        self.changed_at[pid] = rec["ts"]
+                    base.setdefault(vid, cost)  # new variants start without drift
+                    latest[vid] = cost
+            self.syncs += 1
+            self.last_sync = rec["ts"]
+        elif typ == "ack":
+            for pid in rec["products"]:
+                self.baseline[pid] = dict(self.latest.get(pid, {}))
+
+    def _append(self, rec):
+        """Catch up, then append `rec` and apply it, all under an exclusive file lock."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock, open(self.path, "a+b") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                self._catch_up(fh)
+                rec = rec() if callable(rec) else rec
+                rec["ts"] = time.time()
+                line = (json.dumps(rec) + "\n").encode("utf-8")
+                fh.write(line)
+                fh.flush()
+                self.offset += len(line)
+                self._apply(rec)
+                return rec
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def record(self, products):
+        """Snapshot the costs of a freshly synced catalog; returns {product_id: {variant_id: cost}} that moved."""
+        def delta():
+            moved = {}
+            for p in products:
+                known = self.latest.get(str(p.id), {})
+                costs = {v.id: v.cost for v in p.variants if known.get(v.id) != v.cost}
+                if costs:
+                    moved[str(p.id)] = costs
+            return {"type": "costs", "costs": moved}
+        return self._append(delta)["costs"]
+
+    def acknowledge(self, product_ids):
+        """Take the current costs as the new baseline of these products."""
+        product_ids = [str(pid) for pid in product_ids]
+        if product_ids:
+            self._append({"type": "ack", "products": product_ids})
+
+    def drifted(self, product):
+        """{variant_id: baseline cost} of the product's variants whose cost moved; empty when none did."""
+        base = self.baseline.get(str(product.id))
+        if not base:
+            return {}
+        return {v.id: base[v.id] for v in product.variants if v.id in base and base[v.id] != v.cost}
+
+_histories = {}
+_histories_lock = threading.Lock()
+
+def history_for(shop_id, directory=None):
+    """The process-wide CostHistory of a shop."""
+    key = (directory or COST_DIR, str(shop_id))
+    with _histories_lock:
+        if key not in _histories:
+            _histories[key] = CostHistory(shop_id, directory)
+        return _histories[key]
+
+def drift_report(products):
+    """
+    One entry per product whose costs drifted: each moved variant with its old
+    and new cost, margin before and now, and the margin-keeping price_after.
+    """
+    report = []
+    refreshed = set()
+    for p in products:
+        history = history_for(p.shop_id)
+        if history.shop_id not in refreshed:
+            history.refresh()
+            refreshed.add(history.shop_id)
+        moved = history.drifted(p)
+        if not moved:
+            continue
+        rows = []
+        for v in p.variants:
+            if v.id not in moved:
+                continue
+            old_cost = moved[v.id]
+            price_after = margin_preserving_price(v.price, old_cost, v.cost)
+            rows.append({
+                "id": v.id,
+                "size": p.size_title(v),
+                "color": p.color_title(v),
+                "cost_before": old_cost,
+                "cost": v.cost,
+                "price_before": v.price,
+                "price_after": price_after,
+                "margin_before": round(profit_margin(v.price, old_cost)[1], 2),
+                "margin_now": round(profit_margin(v.price, v.cost)[1], 2),
+                "margin_after": round(profit_margin(price_after, v.cost)[1], 2),
+            })
+        report.append({
+            "id": p.id,
+            "shop_id": p.shop_id,
+            "title": p.title,
+            "garment_type": p.garment_type,
+            "changed_at": history.changed_at.get(str(p.id)),
+            "drifted_variants": len(rows),
+            "variants": rows,
+        })
+    return report
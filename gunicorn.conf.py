@@ -0,0 +1,44 @@
+# gunicorn.conf.py
+
+"""
+Production profile: several gunicorn workers sharing one SQLite cache.
+
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py app:app
+
+Every worker reads and writes the catalog, blueprint map and shipping costs in
+PRINTIFY_CACHE_DB, so adding workers does not multiply the warm-up API calls.
+The account's request budget is divided between the workers.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count())))
+# bulk jobs wait on Printify, not the CPU: a few threads per worker keep them from blocking the dashboard
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+# a bulk edit over a large selection can take minutes
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "600"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+# Set before the workers import app.py (they inherit the master's environment)
+os.environ.setdefault(
+    "PRINTIFY_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "printify-cache.sqlite3")
+)
+os.makedirs(os.path.dirname(os.environ["PRINTIFY_CACHE_DB"]), exist_ok=True)
+# Each worker keeps its own token buckets, so give each its share of the account limit
+os.environ.setdefault(
+    "PRINTIFY_REQUESTS_PER_MINUTE",
+    str(int(os.environ.get("PRINTIFY_ACCOUNT_REQUESTS_PER_MINUTE", "600")) // workers)
+)
+
+def post_worker_init(worker):
+    # each worker fills its caches in the background; /readyz turns 200 when it is done.
+    # A shop missing from the shared cache is crawled by one worker while the others wait.
+    import app
+    app.start_warmup()
@@ -0,0 +1,144 @@
+# journal.py
+
+"""
+Write-ahead journal for bulk operations (price updates, publishes).
+
+Each job is one append-only JSONL file. Before a product is written we
+record the intended payload and the product's `updated_at` as we saw it;
+after the call we record the outcome. A run that dies midway can then be
+resumed: finished products are skipped and in-flight ones are checked
+against Printify before anything is re-sent.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+JOURNAL_DIR = os.environ.get(
+    "PRINTIFY_JOURNAL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "journal")
+)
+
+# Outcomes that mean "nothing left to do for this product"
+FINAL_STATUSES = {"done", "skipped"}
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.job_id = os.path.splitext(os.path.basename(path))[0]
+        self.kind = None
+        self.params = {}
+        self.product_ids = []
+        self.intents = {}    # product_id -> last intent record
+        self.outcomes = {}   # product_id -> last outcome record
+        self.finished = False
+        self.created = None
+        # bulk jobs write from one worker per shop
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            self._replay()
+
+    @classmethod
+    def create(cls, kind, params, product_ids, directory=None):
+        directory = directory or JOURNAL_DIR
+        os.makedirs(directory, exist_ok=True)
+        job_id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        journal = cls(os.path.join(directory, f"{job_id}.jsonl"))
+        journal.kind = kind
+        journal.params = params
+        journal.product_ids = [str(pid) for pid in product_ids]
+        journal._append({"type": "begin", "kind": kind, "params": params, "product_ids": journal.product_ids})
+        return journal
+
+    @classmethod
+    def open(cls, job_id, directory=None):
+        path = os.path.join(directory or JOURNAL_DIR, f"{os.path.basename(job_id)}.jsonl")
+        if not os.path.exists(path):
+            raise KeyError(f"No journal found for job {job_id}.")
+        return cls(path)
+
+    def _replay(self):
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # a torn last line from a crash mid-write; everything before it is intact
+                    continue
+                typ = rec.get("type")
+                if typ == "begin":
+                    self.kind = rec.get("kind")
+                    self.params = rec.get("params") or {}
+                    self.product_ids = rec.get("product_ids") or []
+                    self.created = rec.get("ts")
+                elif typ == "intent":
+                    self.intents[rec["product_id"]] = rec
+                elif typ == "outcome":
+                    self.outcomes[rec["product_id"]] = rec
+                elif typ == "end":
+                    self.finished = True
+
+    def _append(self, rec):
+        with self.lock:
+            rec["ts"] = time.time()
+            if rec.get("type") == "begin":
+                self.created = rec["ts"]
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(rec) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+            if rec["type"] == "intent":
+                self.intents[rec["product_id"]] = rec
+            elif rec["type"] == "outcome":
+                self.outcomes[rec["product_id"]] = rec
+
+    def record_intent(self, product_id, updated_at, payload):
+        self._append({"type": "intent", "product_id": str(product_id), "updated_at": updated_at, "payload": payload})
+
+    def record_outcome(self, product_id, status, detail=None):
+        self._append({"type": "outcome", "product_id": str(product_id), "status": status, "detail": detail})
+
+    def finish(self):
+        self._append({"type": "end"})
+        self.finished = True
+
+    def is_complete(self, product_id):
+        rec = self.outcomes.get(str(product_id))
+        return bool(rec) and rec["status"] in FINAL_STATUSES
+
+    def in_flight(self, product_id):
+        """Intent recorded but no outcome after it: the write may or may not have landed."""
+        intent = self.intents.get(str(product_id))
+        outcome = self.outcomes.get(str(product_id))
+        return bool(intent) and (not outcome or outcome["ts"] < intent["ts"])
+
+    def pending(self):
+        return [pid for pid in self.product_ids if not self.is_complete(pid)]
+
+    def summary(self):
+        counts = {}
+        for rec in self.outcomes.values():
+            counts[rec["status"]] = counts.get(rec["status"], 0) + 1
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "params": self.params,
+            "created": self.created,
+            "finished": self.finished,
+            "total": len(self.product_ids),
+            "pending": len(self.pending()),
+            "outcomes": counts,
+        }
+
+def list_journals(directory=None):
+    """Summaries of every journal, newest first."""
+    directory = directory or JOURNAL_DIR
+    if not os.path.isdir(directory):
+        return []
+    jobs = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith(".jsonl"):
+            jobs.append(Journal(os.path.join(directory, name)).summary())
+    return jobs
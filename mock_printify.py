@@ -0,0 +1,389 @@
+# mock_printify.py
+
+"""
+Local stand-in for the Printify API, for offline development and benchmarks.
+
+Serves shops, paginated products, product details, blueprints, shipping,
+product PUT and publish from generated or recorded fixtures, with optional
+latency and 429 rate limiting. Generated mockup images are served too (as
+full-size PNGs under /__images/), standing in for Printify's image CDN. Point the app at it with PRINTIFY_API_BASE:
+
+    python mock_printify.py --products 500 --latency-ms 80
+    PRINTIFY_API_BASE=http://127.0.0.1:5050/v1 python app.py
+"""
+
+import argparse
+import copy
+import functools
+import json
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+from flask import Flask, jsonify, request
+
+BLUEPRINTS = [
+    {"id": 5, "title": "Unisex Cotton Crew Tee", "brand": "Next Level", "model": "3600"},
+    {"id": 6, "title": "Unisex Heavy Cotton Tee", "brand": "Gildan", "model": "5000"},
+    {"id": 12, "title": "Unisex Jersey Short Sleeve Tee", "brand": "Bella+Canvas", "model": "3001"},
+    {"id": 77, "title": "Unisex Heavy Blend™ Hooded Sweatshirt", "brand": "Gildan", "model": "18500"},
+    {"id": 49, "title": "Unisex Heavy Blend™ Crewneck Sweatshirt", "brand": "Gildan", "model": "18000"},
+    {"id": 450, "title": "All Over Print Hoodie (AOP)", "brand": "Generic brand", "model": "AOP-H"},
+]
+SIZES = ["XS", "S", "M", "L", "XL", "2XL", "3XL", "4XL", "5XL"]
+COLORS = [
+    "Black", "White", "Navy", "Sport Grey", "Dark Heather", "Red", "Royal", "Forest Green",
+    "Maroon", "Military Green", "Purple", "Charcoal", "Light Blue", "Sand", "Orange",
+    "Gold", "Irish Green", "Light Pink", "Ash", "Cardinal Red",
+]
+SIZE_UPCHARGE = {"2XL": 200, "3XL": 400, "4XL": 600, "5XL": 800}
+# Generated products point their images here; the mock rewrites it to its own /__images/
+IMAGE_HOST = "https://images.example.invalid"
+# Printify mockups are large; so are the stand-ins
+MOCKUP_SIZE = 1200
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S+00:00")
+
+def generate_product(index, variants_per_product=30, rng=None, options_shape="list", shop_id=1):
+    """
+    One synthetic product shaped like the Products API response.
+    options_shape: "list" (value ids, as the Products API sends), "dict" (titles
+    keyed by option name, as some catalog objects do) or "title" (no options;
+    only the "Color / Size" variant title).
+    """
+    rng = rng or random.Random(index)
+    blueprint = BLUEPRINTS[index % len(BLUEPRINTS)]
+    n_sizes = max(1, min(6, variants_per_product))
+    n_colors = max(1, -(-variants_per_product // n_sizes))
+    sizes = SIZES[1:1 + n_sizes]
+    colors = rng.sample(COLORS, min(n_colors, len(COLORS)))
+    color_values = [{"id": 500 + COLORS.index(c), "title": c} for c in colors]
+    size_values = [{"id": 1000 + SIZES.index(s), "title": s} for s in sizes]
+    base_cost = rng.choice([899, 1029, 1195, 1450, 2150, 2890])
+
+    variants = []
+    for c in color_values:
+        for s in size_values:
+            if len(variants) >= variants_per_product:
+                break
+            cost = base_cost + SIZE_UPCHARGE.get(s["title"], 0)
+            variant = {
+                "id": index * 1000 + len(variants) + 1,
+                "sku": f"SKU-{index}-{len(variants) + 1}",
+                "cost": cost,
+                "price": int(round(cost * 1.6 / 100, 2) * 100),
+                "title": f"{c['title']} / {s['title']}",
+                "grams": 180,
+                "is_enabled": True,
+                "is_default": not variants,
+                "is_available": True,
+                "print_area_key": "front",
+            }
+            if options_shape == "list":
+                variant["options"] = [c["id"], s["id"]]
+            elif options_shape == "dict":
+                variant["options"] = {"color": c["title"], "size": s["title"]}
+            variants.append(variant)
+
+    return {
+        "id": f"{index:024x}",
+        "title": f"{blueprint['title']} #{index}",
+        "description": "Synthetic product for offline runs. " * 8,
+        "tags": ["synthetic", blueprint["brand"]],
+        "options": [
+            {"name": "Colors", "type": "color", "values": color_values},
+            {"name": "Sizes", "type": "size", "values": size_values},
+        ],
+        "variants": variants,
+        "images": [
+            {"src": f"{IMAGE_HOST}/mockup/{index}/{i}.png", "variant_ids": [], "position": "front", "is_default": i == 0}
+            for i in range(4)
+        ],
+        "created_at": "2025-01-01 00:00:00+00:00",
+        "updated_at": "2025-01-01 00:00:00+00:00",
+        "visible": True,
+        "is_locked": False,
+        "blueprint_id": blueprint["id"],
+        "user_id": 1,
+        "shop_id": shop_id,
+        "print_provider_id": 29 + index % 3,
+        "print_areas": [{"variant_ids": [v["id"] for v in variants], "placeholders": [{"position": "front", "images": []}]}],
+        "vendor": blueprint["brand"],
+    }
+
+def generate_catalog(products=100, variants_per_product=30, shops=1, seed=0, options_shape="list"):
+    """Fixture dict for MockPrintify: {"shops", "products": {shop_id: [...]}, "blueprints", "shipping"}."""
+    rng = random.Random(seed)
+    shop_list = [{"id": 1000 + i, "title": f"Shop {i + 1}", "sales_channel": "custom_integration"} for i in range(shops)]
+    by_shop = {}
+    index = 0
+    for shop in shop_list:
+        by_shop[str(shop["id"])] = []
+        for _ in range(products):
+            by_shop[str(shop["id"])].append(
+                generate_product(index, variants_per_product, random.Random(rng.random()), options_shape, shop["id"])
+            )
+            index += 1
+    return {"shops": shop_list, "products": by_shop, "blueprints": BLUEPRINTS, "shipping": {"standard": {"cost": 475}}}
+
+def load_fixtures(path):
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+def record_fixtures(path, api_key, api_base="https://api.printify.com/v1"):
+    """Snapshot a real account (shops, every product's details, blueprints) into a fixture file."""
+    import requests
+    headers = {"Authorization": f"Bearer {api_key}"}
+    shops = requests.get(f"{api_base}/shops.json", headers=headers).json()
+    by_shop = {}
+    for shop in shops:
+        products, page = [], 1
+        while True:
+            body = requests.get(f"{api_base}/shops/{shop['id']}/products.json?limit=50&page={page}", headers=headers).json()
+            products.extend(body.get("data", []) or [])
+            if page >= (body.get("last_page") or 1):
+                break
+            page += 1
+        by_shop[str(shop["id"])] = [
+            requests.get(f"{api_base}/shops/{shop['id']}/products/{p['id']}.json", headers=headers).json()
+            for p in products
+        ]
+    blueprints = requests.get(f"{api_base}/catalog/blueprints.json", headers=headers).json()
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump({"shops": shops, "products": by_shop, "blueprints": blueprints, "shipping": {"standard": {"cost": 475}}}, fh)
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+@functools.lru_cache(maxsize=64)
+def mockup_png(index, image, size=MOCKUP_SIZE):
+    """A size x size RGBA PNG: a garment-coloured block with a print area on a transparent background."""
+    rng = random.Random(index * 31 + image)
+    garment = bytes(rng.randrange(256) for _ in range(3)) + b"\xff"
+    art = bytes(rng.randrange(256) for _ in range(3)) + b"\xff"
+    clear = b"\x00\x00\x00\x00"
+    m, p = size // 8, size // 3
+    body = b"\x00" + clear * m + garment * (size - 2 * m) + clear * m
+    printed = b"\x00" + clear * m + garment * (p - m) + art * (size - 2 * p) + garment * (p - m) + clear * m
+    blank = b"\x00" + clear * size
+    rows = [blank if y < m or y >= size - m else printed if p <= y < size - p else body for y in range(size)]
+    header = struct.pack(">IIBBBBB", size, size, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(b"".join(rows), 6)) + _png_chunk(b"IEND", b""))
+
+class MockPrintify:
+    """Fixture state plus the knobs that make the stand-in behave like the real API under load."""
+
+    def __init__(self, fixtures, latency_ms=0, jitter_ms=0, rate_limit_per_minute=0, error_rate=0.0, seed=0):
+        self.fixtures = fixtures
+        self.products = {
+            shop_id: {p["id"]: p for p in products}
+            for shop_id, products in fixtures.get("products", {}).items()
+        }
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {"requests": 0, "throttled": 0, "by_endpoint": {}, "images": 0}
+            self._window = []
+
+    def _throttle(self):
+        """True when this request should get a 429 (random error rate or requests/minute budget)."""
+        with self.lock:
+            if self.error_rate and self.rng.random() < self.error_rate:
+                return True
+            if self.rate_limit_per_minute:
+                now = time.monotonic()
+                self._window = [t for t in self._window if now - t < 60]
+                if len(self._window) >= self.rate_limit_per_minute:
+                    return True
+                self._window.append(now)
+        return False
+
+    def before(self, endpoint):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["by_endpoint"][endpoint] = self.stats["by_endpoint"].get(endpoint, 0) + 1
+        delay = self.latency_ms + (self.rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+        if self._throttle():
+            with self.lock:
+                self.stats["throttled"] += 1
+            resp = jsonify({"status": "error", "code": 429, "message": "Too Many Attempts."})
+            resp.status_code = 429
+            resp.headers["Retry-After"] = "1"
+            return resp
+        return None
+
+def create_mock_app(state):
+    app = Flask("mock_printify")
+
+    @app.before_request
+    def simulate():
+        if request.path.startswith("/__"):
+            return None
+        return state.before(request.url_rule.endpoint if request.url_rule else "unknown")
+
+    def shop_products(shop_id):
+        products = state.products.get(str(shop_id))
+        if products is None:
+            return None
+        return products
+
+    def with_local_images(prod):
+        """Point generated mockup URLs at this server's /__images/."""
+        images = prod.get("images") or []
+        if not any(img.get("src", "").startswith(IMAGE_HOST) for img in images):
+            return prod
+        base = request.host_url.rstrip("/") + "/__images"
+        return dict(prod, images=[dict(img, src=img["src"].replace(IMAGE_HOST, base, 1)) for img in images])
+
+    @app.route("/v1/shops.json")
+    def shops():
+        return jsonify(state.fixtures.get("shops", []))
+
+    @app.route("/v1/catalog/blueprints.json")
+    def blueprints():
+        return jsonify(state.fixtures.get("blueprints", []))
+
+    @app.route("/v1/catalog/blueprints/<int:blueprint_id>.json")
+    def blueprint(blueprint_id):
+        bp = next((b for b in state.fixtures.get("blueprints", []) if b["id"] == blueprint_id), None)
+        if bp is None:
+            return jsonify({"error": "Not found"}), 404
+        return jsonify(bp)
+
+    @app.route("/v1/shipping.json")
+    def shipping():
+        return jsonify(state.fixtures.get("shipping", {}))
+
+    @app.route("/v1/shops/<shop_id>/products.json")
+    def products(shop_id):
+        products = shop_products(shop_id)
+        if products is None:
+            return jsonify({"error": "Shop not found"}), 404
+        limit = max(1, min(int(request.args.get("limit", 10)), 50))
+        page = max(1, int(request.args.get("page", 1)))
+        items = list(products.values())
+        last_page = max(1, -(-len(items) // limit))
+        return jsonify({
+            "current_page": page,
+            "data": [with_local_images(p) for p in items[(page - 1) * limit: page * limit]],
+            "last_page": last_page,
+            "per_page": limit,
+            "total": len(items),
+        })
+
+    @app.route("/v1/shops/<shop_id>/products/<product_id>.json", methods=["GET"])
+    def product(shop_id, product_id):
+        prod = (shop_products(shop_id) or {}).get(product_id)
+        if prod is None:
+            return jsonify({"error": "Product not found"}), 404
+        return jsonify(with_local_images(prod))
+
+    @app.route("/v1/shops/<shop_id>/products/<product_id>.json", methods=["PUT"])
+    def update_product(shop_id, product_id):
+        prod = (shop_products(shop_id) or {}).get(product_id)
+        if prod is None:
+            return jsonify({"error": "Product not found"}), 404
+        body = request.get_json(silent=True) or {}
+        with state.lock:
+            updated = copy.deepcopy(prod)
+            by_id = {v["id"]: v for v in updated["variants"]}
+            for change in body.get("variants", []) or []:
+                variant = by_id.get(change.get("id"))
+                if variant is None:
+                    continue
+                for key in ("price", "is_enabled", "is_visible"):
+                    if key in change:
+                        variant[key] = change[key]
+            if sum(1 for v in updated["variants"] if v.get("is_enabled")) > 100:
+                return jsonify({
+                    "status": "error", "code": 8251, "message": "Validation failed.",
+                    "errors": {"reason": "Product can have up to 100 enabled variants.", "code": 8251},
+                }), 400
+            updated["updated_at"] = _now()
+            state.products[str(shop_id)][product_id] = updated
+        return jsonify(updated)
+
+    @app.route("/v1/shops/<shop_id>/products/<product_id>/publish.json", methods=["POST"])
+    def publish(shop_id, product_id):
+        if product_id not in (shop_products(shop_id) or {}):
+            return jsonify({"error": "Product not found"}), 404
+        return jsonify({})
+
+    @app.route("/__images/mockup/<int:index>/<int:image>.png")
+    def mockup_image(index, image):
+        """Image CDN stand-in: not rate limited or delayed like the API, but counted."""
+        with state.lock:
+            state.stats["images"] += 1
+        return app.response_class(mockup_png(index, image), mimetype="image/png")
+
+    @app.route("/__stats")
+    def stats():
+        with state.lock:
+            return jsonify(copy.deepcopy(state.stats))
+
+    @app.route("/__reset", methods=["POST"])
+    def reset():
+        state.reset_stats()
+        return jsonify({"ok": True})
+
+    return app
+
+def start_mock_server(state, host="127.0.0.1", port=0, quiet=True):
+    """Serve `state` from a background thread; returns (server, api_base). Call server.shutdown() to stop."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server(host, port, create_mock_app(state), threaded=True,
+                         request_handler=QuietHandler if quiet else None)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_port}/v1"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Printify API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--fixtures", help="JSON fixture file (see --record); generated data is used otherwise")
+    parser.add_argument("--record", metavar="PATH", help="snapshot the real account into PATH and exit")
+    parser.add_argument("--products", type=int, default=100, help="generated products per shop")
+    parser.add_argument("--variants", type=int, default=30, help="generated variants per product")
+    parser.add_argument("--shops", type=int, default=1)
+    parser.add_argument("--options-shape", choices=["list", "dict", "title"], default="list")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record_fixtures(args.record, os.environ.get("PRINTIFY_API_KEY"))
+        print(f"Recorded fixtures to {args.record}")
+        return
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else generate_catalog(
+        args.products, args.variants, args.shops, options_shape=args.options_shape
+    )
+    state = MockPrintify(fixtures, args.latency_ms, args.jitter_ms, args.rate_limit, args.error_rate)
+    print(f"Mock Printify API on http://{args.host}:{args.port}/v1")
+    create_mock_app(state).run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    main()
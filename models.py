@@ -0,0 +1,198 @@
+# models.py
+
+from dataclasses import asdict, dataclass, field
+
+LARGE_TITLES = {"large", "l"}
+
+def _option_kind(opt):
+    name = (opt.get("name") or "").lower()
+    typ = (opt.get("type") or "").lower()
+    if typ == "size" or "size" in name:
+        return "size"
+    if typ == "color" or "colour" in name or "color" in name:
+        return "color"
+    return "other"
+
+class OptionIndex:
+    """
+    Per-product option table, built once from product_options.
+    Resolves a variant to (size_key, color_key), where a key is the option
+    value id (or the title itself when the variant only carries titles),
+    and `titles` maps each key back to its display title.
+    """
+    __slots__ = ("kinds", "titles", "size_keys", "color_keys")
+
+    def __init__(self, product_options):
+        self.kinds = {}       # value id -> "size" | "color" | "other"
+        self.titles = {}      # value id -> title (size/color only)
+        self.size_keys = {}   # title -> first value id with that title
+        self.color_keys = {}
+        for opt in product_options or []:
+            kind = _option_kind(opt)
+            for v in opt.get("values", []) or []:
+                vid = str(v.get("id"))
+                title = v.get("title") or vid
+                self.kinds[vid] = kind
+                if kind == "size":
+                    self.titles[vid] = title
+                    self.size_keys.setdefault(v.get("title"), vid)
+                elif kind == "color":
+                    self.titles[vid] = title
+                    self.color_keys.setdefault(v.get("title"), vid)
+
+    def _key_for_title(self, title, keys):
+        key = keys.get(title)
+        if key is None:
+            key = title
+            self.titles.setdefault(key, title)
+        return key
+
+    def resolve(self, variant):
+        """Same precedence as extract_size_color_titles: ids, then dict titles, then variant.title."""
+        size_key, color_key = None, None
+        opts = variant.get("options")
+        if isinstance(opts, list):
+            for raw_val in opts:
+                vid = str(raw_val)
+                kind = self.kinds.get(vid)
+                if kind == "size" and not size_key:
+                    size_key = vid
+                elif kind == "color" and not color_key:
+                    color_key = vid
+        elif isinstance(opts, dict):
+            for k, v in opts.items():
+                key = (k or "").lower()
+                val = str(v) if v is not None else ""
+                if "size" in key and not size_key and val:
+                    size_key = self._key_for_title(val, self.size_keys)
+                if ("color" in key or "colour" in key) and not color_key and val:
+                    color_key = self._key_for_title(val, self.color_keys)
+
+        if not (size_key and color_key):
+            tokens = [t.strip() for part in (variant.get("title") or "").split("/") for t in part.split("-")]
+            tokens = [t for t in tokens if t]
+            if not size_key:
+                size_key = next((self.size_keys[t] for t in tokens if t in self.size_keys), None)
+            if not color_key:
+                color_key = next((self.color_keys[t] for t in tokens if t in self.color_keys), None)
+        return size_key, color_key
+
+@dataclass(slots=True)
+class Variant:
+    id: int
+    cost: int
+    price: int
+    is_enabled: bool = True
+    is_visible: bool = True
+    is_default: bool = False
+    size_id: str = None
+    color_id: str = None
+
+    @classmethod
+    def from_api(cls, data, option_index):
+        size_id, color_id = option_index.resolve(data)
+        return cls(
+            id=data["id"],
+            cost=int(data.get("cost") or 0),
+            price=int(data.get("price") or 0),
+            is_enabled=bool(data.get("is_enabled", True)),
+            is_visible=bool(data.get("is_visible", True)),
+            is_default=bool(data.get("is_default", False)),
+            size_id=size_id,
+            color_id=color_id,
+        )
+
+@dataclass(slots=True)
+class Product:
+    id: str
+    title: str
+    shop_id: str = None
+    vendor: str = ""
+    blueprint_id: int = None
+    garment_type: str = ""
+    image_src: str = None
+    provider_id: int = None
+    print_area_key: str = None
+    updated_at: str = None
+    option_titles: dict = field(default_factory=dict)
+    variants: tuple = ()
+    large_index: int = None
+    shipping_cost: int = None
+
+    @classmethod
+    def from_api(cls, data, garment_type="", shop_id=None):
+        """Convert a Printify product JSON dict into the compact model; the dict can then be dropped."""
+        index = OptionIndex(data.get("options", []) or [])
+        raw_variants = data.get("variants", []) or []
+        variants = tuple(Variant.from_api(v, index) for v in raw_variants)
+
+        large_index = None
+        for i, v in enumerate(variants):
+            title = index.titles.get(v.size_id) if v.size_id else None
+            if title and title.strip().lower() in LARGE_TITLES:
+                large_index = i
+                break
+        if large_index is None and variants:
+            large_index = 0
+
+        raw_large = raw_variants[large_index] if large_index is not None else {}
+        images = data.get("images") or []
+        return cls(
+            id=data["id"],
+            title=data.get("title", ""),
+            shop_id=str(shop_id if shop_id is not None else data.get("shop_id", "")) or None,
+            vendor=data.get("vendor", "") or "",
+            blueprint_id=data.get("blueprint_id"),
+            garment_type=garment_type,
+            image_src=(images[0] or {}).get("src") if images else None,
+            provider_id=(
+                data.get("print_provider_id")
+                or (data.get("provider") or {}).get("id")
+                or raw_large.get("print_provider_id")
+            ),
+            print_area_key=raw_large.get("print_area_key"),
+            updated_at=data.get("updated_at"),
+            option_titles=index.titles,
+            variants=variants,
+            large_index=large_index,
+        )
+
+    def to_dict(self):
+        """Plain JSON-ready dict, e.g. for the shared cache; from_dict() restores it."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data["variants"] = tuple(Variant(**v) for v in data.get("variants") or ())
+        return cls(**data)
+
+    @property
+    def large_variant(self):
+        return self.variants[self.large_index] if self.large_index is not None else None
+
+    @property
+    def default_variant(self):
+        """The variant Printify marks is_default (the storefront's preselected one), else the first."""
+        return next((v for v in self.variants if v.is_default), self.variants[0] if self.variants else None)
+
+    @property
+    def summary_variants(self):
+        """One-line summary on the card (Large or first)."""
+        large = self.large_variant
+        return (large,) if large else ()
+
+    @property
+    def default_size(self):
+        large = self.large_variant
+        return self.size_title(large) if large else "N/A"
+
+    @property
+    def type_display(self):
+        return self.garment_type
+
+    def size_title(self, variant):
+        return self.option_titles.get(variant.size_id, "N/A") if variant and variant.size_id else "N/A"
+
+    def color_title(self, variant):
+        return self.option_titles.get(variant.color_id, "N/A") if variant and variant.color_id else "N/A"
@@ -0,0 +1,239 @@
+# pipeline.py
+
+"""
+Concurrency helpers for talking to Printify: per-shop request budgets, a
+small thread fan-out, single-flight coalescing and a circuit breaker. Each
+shop gets its own token bucket so one large shop cannot use up the whole
+account's request rate while the others wait.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Printify's documented account-wide limit; 0 disables throttling (e.g. against the mock server)
+REQUESTS_PER_MINUTE = int(os.environ.get("PRINTIFY_REQUESTS_PER_MINUTE", "600"))
+# Consecutive failed calls (errors, timeouts, 5xx) that open the circuit, and seconds before it probes again
+BREAKER_FAILURES = int(os.environ.get("PRINTIFY_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("PRINTIFY_BREAKER_RESET_SECONDS", "30"))
+
+class TokenBucket:
+    """Blocking token bucket: `rate_per_minute` sustained, up to `burst` at once."""
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, int(rate_per_minute / 6))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waited = 0.0
+
+    def reserve(self):
+        """
+        Take a token now, or book the next one; returns how long to wait before
+        the request (0 when a token was free). Lets async callers sleep without blocking.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            wait = -self.tokens / self.rate
+            self.waited += wait
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+class ShopBudgets:
+    """One TokenBucket per shop, splitting the account rate evenly between the shops in use."""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE):
+        self.requests_per_minute = requests_per_minute
+        self.shop_count = 1
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def set_shop_count(self, count):
+        with self.lock:
+            count = max(1, count)
+            if count != self.shop_count:
+                self.shop_count = count
+                self.buckets.clear()
+
+    def for_shop(self, shop_id):
+        key = str(shop_id)
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(self.requests_per_minute / self.shop_count)
+            return bucket
+
+    def acquire(self, shop_id):
+        self.for_shop(shop_id).acquire()
+
+    def reserve(self, shop_id):
+        return self.for_shop(shop_id).reserve()
+
+    def stats(self):
+        with self.lock:
+            return {key: {"rate_per_minute": round(b.rate * 60, 1), "waited_s": round(b.waited, 3)}
+                    for key, b in self.buckets.items()}
+
+class CircuitOpenError(Exception):
+    """Printify calls are suspended after repeated failures."""
+
+class CircuitBreaker:
+    """
+    closed: calls go through, consecutive failures are counted.
+    open: calls fail at once with CircuitOpenError until `reset_seconds` pass.
+    half_open: one probe call is let through; success closes the circuit,
+    failure opens it for another `reset_seconds`.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.max_failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.probe_started = 0.0
+        self.rejected = 0
+        self.last_error = None
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now."""
+        if self.max_failures <= 0:
+            return
+        with self.lock:
+            if self.state == "closed":
+                return
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            # a probe that never reported back (e.g. cancelled) stops blocking after reset_seconds
+            if self.state == "half_open" and (not self.probing or now - self.probe_started >= self.reset_seconds):
+                self.probing = True
+                self.probe_started = now
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_seconds - (now - self.opened_at))
+            raise CircuitOpenError(f"Printify is unavailable ({self.last_error}); retrying in {retry_in:.0f}s.")
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self, error):
+        with self.lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == "half_open" or self.failures >= self.max_failures:
+                if self.state != "open":
+                    print(f"[WARN] Printify circuit open after {self.failures} failure(s): {error}")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def stats(self):
+        with self.lock:
+            return {"state": self.state, "failures": self.failures, "rejected": self.rejected,
+                    "last_error": self.last_error}
+
+def parallel_map(fn, items, max_workers=8):
+    """
+    Run fn(item) on a thread pool and yield (item, result, error) as each finishes.
+    Exceptions are returned, not raised, so one bad item does not stop a batch.
+    """
+    items = list(items)
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        futures = {pool.submit(fn, item): item for item in items}
+        for fut in as_completed(futures):
+            item = futures[fut]
+            try:
+                yield item, fut.result(), None
+            except Exception as ex:
+                yield item, None, ex
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller runs the
+    fetch, callers arriving while it is in flight wait and share its result
+    (or exception). Nothing is cached once the fetch finishes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.fetches = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+                self.fetches += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self.lock:
+            return {"fetches": self.fetches, "coalesced": self.coalesced, "in_flight": len(self.flights)}
+
+class AsyncSingleFlight(SingleFlight):
+    """SingleFlight for coroutines on one event loop: waiters await the leader's task."""
+
+    async def do(self, key, fn):
+        with self.lock:
+            task = self.flights.get(key)
+            if task is None:
+                task = self.flights[key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda _: self._land(key))
+                self.fetches += 1
+            else:
+                self.coalesced += 1
+        # shield: one waiter being cancelled must not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _land(self, key):
+        with self.lock:
+            self.flights.pop(key, None)
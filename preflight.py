@@ -0,0 +1,110 @@
+# preflight.py
+
+"""
+Local checks of a price update against Printify's known constraints, run
+before the PUT so requests that are bound to fail never use the rate limit:
+
+- at most 100 enabled variants per product (Printify error 8251; hidden
+  variants count too)
+- no zero or negative prices
+- no enabled variant priced below its cost
+
+A product over the enabled-variant limit is trimmed when that is safe: its
+enabled but hidden variants (not offered in the store anyway) are disabled
+in the same PUT, as many as needed. If trimming is off or not enough, or a
+price fails, the product is rejected with the reasons.
+"""
+
+import os
+
+MAX_ENABLED_VARIANTS = int(os.environ.get("PRINTIFY_MAX_ENABLED_VARIANTS", "100"))
+# Disable enabled-but-hidden variants to get under the limit instead of rejecting
+TRIM_HIDDEN = os.environ.get("PRINTIFY_PREFLIGHT_TRIM", "1") != "0"
+# Below-cost prices are rejected unless this is set (e.g. for a deliberate clearance)
+ALLOW_BELOW_COST = os.environ.get("PRINTIFY_ALLOW_BELOW_COST", "0") == "1"
+
+def _ids(ids, limit=5):
+    shown = ", ".join(str(i) for i in ids[:limit])
+    return shown + (f" and {len(ids) - limit} more" if len(ids) > limit else "")
+
+class Preflight:
+    """Outcome of check_update(): `errors` (empty when the update may be sent), `trimmed` variant ids and the `payload` to PUT."""
+    __slots__ = ("errors", "trimmed", "payload", "enabled")
+
+    def __init__(self, errors, trimmed, payload, enabled):
+        self.errors = errors
+        self.trimmed = trimmed
+        self.payload = payload
+        self.enabled = enabled
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def message(self):
+        return "; ".join(self.errors)
+
+    def to_dict(self):
+        return {"ok": self.ok, "errors": self.errors, "trimmed": self.trimmed, "enabled_variants": self.enabled}
+
+class PreflightError(ValueError):
+    def __init__(self, result):
+        super().__init__(result.message())
+        self.result = result
+
+def check_update(variants, changed, max_enabled=None, trim=None, allow_below_cost=None):
+    """
+    Check `changed` (PUT rows: id, price, is_enabled, is_visible) against the
+    product's full `variants` (API dicts: id, cost, price, is_enabled, is_visible).
+    """
+    max_enabled = MAX_ENABLED_VARIANTS if max_enabled is None else max_enabled
+    trim = TRIM_HIDDEN if trim is None else trim
+    allow_below_cost = ALLOW_BELOW_COST if allow_below_cost is None else allow_below_cost
+    rows = {u["id"]: u for u in changed}
+    errors = []
+
+    not_positive = [vid for vid, u in rows.items() if u["price"] <= 0]
+    if not_positive:
+        errors.append(f"{len(not_positive)} variant(s) would be priced at $0 or less (ids {_ids(not_positive)})")
+
+    enabled = []
+    hidden = []
+    below_cost = []
+    for v in variants:
+        row = rows.get(v["id"])
+        if not (row["is_enabled"] if row is not None else v.get("is_enabled", True)):
+            continue
+        enabled.append(v["id"])
+        if not (row["is_visible"] if row is not None else v.get("is_visible", True)):
+            hidden.append(v["id"])
+        price = row["price"] if row is not None else v.get("price", 0)
+        if row is not None and 0 < price < (v.get("cost") or 0):
+            below_cost.append(v["id"])
+    if below_cost and not allow_below_cost:
+        errors.append(f"{len(below_cost)} enabled variant(s) would be priced below cost (ids {_ids(below_cost)})")
+
+    trimmed = []
+    excess = len(enabled) - max_enabled
+    if excess > 0:
+        if trim and len(hidden) >= excess:
+            trimmed = hidden[-excess:]
+        else:
+            errors.append(
+                f"{len(enabled)} enabled variants, over Printify's limit of {max_enabled} "
+                f"({len(hidden)} hidden ones could be disabled{'' if trim else ', trimming is off'}); "
+                "disable some in Printify first"
+            )
+
+    payload = list(changed)
+    if trimmed and not errors:
+        by_id = {v["id"]: v for v in variants}
+        trim_ids = set(trimmed)
+        payload = [dict(u, is_enabled=False) if u["id"] in trim_ids else u for u in payload]
+        payload += [{"id": vid, "price": by_id[vid].get("price", 0), "is_enabled": False, "is_visible": False}
+                    for vid in trimmed if vid not in rows]
+    return Preflight(errors, trimmed if not errors else [], payload, len(enabled) - (len(trimmed) if not errors else 0))
+
+def product_variants(product):
+    """API-shaped variant dicts of a cached models.Product, for checking before anything is fetched."""
+    return [{"id": v.id, "cost": v.cost, "price": v.price, "is_enabled": v.is_enabled, "is_visible": v.is_visible}
+            for v in product.variants]
@@ -0,0 +1,226 @@
+# pricesheet.py
+
+"""
+Price sheet export/import: one row per variant with its resolved size and
+color, cost, price, profit, margin and shipping, in dollars.
+
+Exports are generated product by product (CSV as text chunks, Parquet as one
+row group per batch), so memory stays flat however large the catalog is.
+Imports are read row by row, validated against the loaded catalog and reduced
+to just the prices that differ; applying them is up to the caller.
+
+Parquet needs pyarrow (`pip install pyarrow`); CSV has no extra dependencies.
+"""
+
+import csv
+import io
+import shutil
+import tempfile
+
+from pricing import profit_margin
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional; only the Parquet format needs it
+    pa = pq = None
+
+COLUMNS = (
+    "shop_id", "product_id", "product_title", "garment_type", "blueprint_id",
+    "variant_id", "size", "color", "is_enabled",
+    "cost", "price", "profit", "margin", "shipping",
+)
+# The columns an import needs; everything else in the sheet is informational
+REQUIRED_COLUMNS = ("product_id", "variant_id", "price")
+FORMATS = ("csv", "parquet")
+
+PARQUET_BATCH_ROWS = 10000
+
+class SheetError(Exception):
+    """The sheet cannot be read at all (bad format, missing columns, no pyarrow)."""
+
+def _dollars(cents):
+    return None if cents is None else round(cents / 100, 2)
+
+def iter_rows(products):
+    """One dict per variant of each Product, in COLUMNS order; money in dollars."""
+    for p in products:
+        for v in p.variants:
+            profit, margin = profit_margin(v.price, v.cost)
+            yield {
+                "shop_id": p.shop_id,
+                "product_id": p.id,
+                "product_title": p.title,
+                "garment_type": p.garment_type,
+                "blueprint_id": p.blueprint_id,
+                "variant_id": v.id,
+                "size": p.size_title(v),
+                "color": p.color_title(v),
+                "is_enabled": v.is_enabled,
+                "cost": _dollars(v.cost),
+                "price": _dollars(v.price),
+                "profit": _dollars(profit),
+                "margin": round(margin, 2),
+                "shipping": _dollars(p.shipping_cost),
+            }
+
+def iter_csv(products, prepare=None):
+    """
+    CSV text in chunks (header, then one chunk per product) for a streamed
+    response. `prepare(product)` runs just before a product is written, e.g. to
+    resolve its shipping cost lazily.
+    """
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=COLUMNS)
+    writer.writeheader()
+    yield buf.getvalue()
+    for p in products:
+        if prepare:
+            prepare(p)
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(iter_rows([p]))
+        yield buf.getvalue()
+
+def _require_pyarrow():
+    if pa is None:
+        raise SheetError("Parquet support needs pyarrow (pip install pyarrow).")
+
+def _parquet_schema():
+    return pa.schema([
+        ("shop_id", pa.string()), ("product_id", pa.string()), ("product_title", pa.string()),
+        ("garment_type", pa.string()), ("blueprint_id", pa.int64()), ("variant_id", pa.int64()),
+        ("size", pa.string()), ("color", pa.string()), ("is_enabled", pa.bool_()),
+        ("cost", pa.float64()), ("price", pa.float64()), ("profit", pa.float64()),
+        ("margin", pa.float64()), ("shipping", pa.float64()),
+    ])
+
+def write_parquet(products, sink, prepare=None, batch_rows=PARQUET_BATCH_ROWS):
+    """Write the sheet to `sink` (path or binary file), one row group per `batch_rows` variants."""
+    _require_pyarrow()
+    schema = _parquet_schema()
+    with pq.ParquetWriter(sink, schema) as writer:
+        batch = {name: [] for name in COLUMNS}
+        size = 0
+        for p in products:
+            if prepare:
+                prepare(p)
+            for row in iter_rows([p]):
+                for name in COLUMNS:
+                    batch[name].append(row[name])
+                size += 1
+            if size >= batch_rows:
+                writer.write_table(pa.table(batch, schema=schema))
+                batch = {name: [] for name in COLUMNS}
+                size = 0
+        if size:
+            writer.write_table(pa.table(batch, schema=schema))
+
+def read_rows(stream, fmt="csv"):
+    """Yield (row_number, dict) from a CSV text/binary stream or a Parquet file, batch by batch."""
+    if fmt == "parquet":
+        _require_pyarrow()
+        if not getattr(stream, "seekable", lambda: False)():
+            # the footer is at the end of a Parquet file: spool request bodies to disk first
+            spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+            shutil.copyfileobj(stream, spool)
+            spool.seek(0)
+            stream = spool
+        try:
+            parquet = pq.ParquetFile(stream)
+        except Exception as e:
+            raise SheetError(f"Not a readable Parquet file: {e}")
+        missing = [c for c in REQUIRED_COLUMNS if c not in parquet.schema_arrow.names]
+        if missing:
+            raise SheetError(f"Missing column(s): {', '.join(missing)}.")
+        row_number = 1
+        for batch in parquet.iter_batches(batch_size=PARQUET_BATCH_ROWS):
+            for row in batch.to_pylist():
+                yield row_number, row
+                row_number += 1
+        return
+    if fmt != "csv":
+        raise SheetError(f"format must be one of {', '.join(FORMATS)}.")
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(stream)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise SheetError(f"Missing column(s): {', '.join(missing)}.")
+    # row 1 is the header, so data rows start at 2 like in a spreadsheet
+    for row_number, row in enumerate(reader, start=2):
+        yield row_number, row
+
+def _parse_price(raw):
+    """Dollars from the sheet -> cents; None when it is not a valid positive price."""
+    try:
+        text = str(raw).strip().lstrip("$").replace(",", "")
+        cents = int(round(float(text) * 100))
+    except (TypeError, ValueError):
+        return None
+    return cents if cents > 0 else None
+
+def diff_sheet(rows, products, default_shop_id, max_errors=100):
+    """
+    Validate sheet rows against the catalog and keep only real price changes.
+
+    Returns (changes, errors, stats): `changes` maps (shop_id, product_id) to
+    {variant_id: new cents}; `errors` lists the first `max_errors` problems as
+    {"row", "error"}; stats counts rows, error_count and unchanged rows.
+    """
+    catalog = {(str(p.shop_id), str(p.id)): p for p in products}
+    variants = {}
+    changes = {}
+    seen = {}
+    errors = []
+    stats = {"rows": 0, "unchanged": 0, "error_count": 0}
+
+    def error(row_number, msg):
+        stats["error_count"] += 1
+        if len(errors) < max_errors:
+            errors.append({"row": row_number, "error": msg})
+
+    for row_number, row in rows:
+        stats["rows"] += 1
+        shop_id = str(row.get("shop_id") or default_shop_id).strip()
+        pid = str(row.get("product_id") or "").strip()
+        vid = str(row.get("variant_id") or "").strip()
+        product = catalog.get((shop_id, pid))
+        if product is None:
+            error(row_number, f"Unknown product {pid!r} in shop {shop_id}.")
+            continue
+        if (shop_id, pid) not in variants:
+            variants[(shop_id, pid)] = {str(v.id): v for v in product.variants}
+        variant = variants[(shop_id, pid)].get(vid)
+        if variant is None:
+            error(row_number, f"Product {pid} has no variant {vid!r}.")
+            continue
+        cents = _parse_price(row.get("price"))
+        if cents is None:
+            error(row_number, f"Invalid price {row.get('price')!r} for variant {vid}; expected a positive dollar amount.")
+            continue
+        key = (shop_id, pid, vid)
+        if key in seen and seen[key] != cents:
+            error(row_number, f"Variant {vid} of product {pid} is listed again with a different price.")
+            continue
+        seen[key] = cents
+        if cents == variant.price:
+            stats["unchanged"] += 1
+            continue
+        changes.setdefault((shop_id, pid), {})[variant.id] = cents
+    return changes, errors, stats
+
+def describe_changes(changes, products):
+    """JSON-ready per-product diff rows for a dry run."""
+    catalog = {(str(p.shop_id), str(p.id)): p for p in products}
+    out = []
+    for (shop_id, pid), prices in changes.items():
+        product = catalog[(shop_id, pid)]
+        rows = []
+        for v in product.variants:
+            if v.id in prices:
+                rows.append({"id": v.id, "size": product.size_title(v), "color": product.color_title(v),
+                             "cost": v.cost, "price_before": v.price, "price_after": prices[v.id]})
+        out.append({"id": pid, "shop_id": shop_id, "title": product.title,
+                    "changed_variants": len(rows), "variants": rows})
+    return out
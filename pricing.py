@@ -0,0 +1,87 @@
+# pricing.py
+
+"""
+Pricing math shared by the editors, the preview API and bulk jobs.
+Everything here is local computation on cents; no Printify calls.
+"""
+
+MODES = ("retail", "profit", "margin")
+
+def to_cents(dollars):
+    return int(round(float(dollars) * 100))
+
+def margin_price_cents(cost_cents, margin):
+    """Retail (cents) giving `margin` (0..1) on a cost, rounded to the cent the way the editors always have."""
+    v_cost = cost_cents / 100
+    v_price = round(v_cost / (1 - margin) + 0.00001, 2) if margin < 1.0 else v_cost
+    return int(round(v_price * 100))
+
+def margin_preserving_price(price_cents, old_cost_cents, new_cost_cents):
+    """Retail (cents) on a new cost keeping the margin `price_cents` had on the old cost."""
+    if price_cents <= 0:
+        return price_cents
+    margin = (price_cents - old_cost_cents) / price_cents
+    return margin_price_cents(new_cost_cents, margin)
+
+def compute_prices(costs, large_cost, mode, value, flat=False):
+    """
+    New retail cents for each cost in `costs` (cents), Large cost in cents:
+    - retail: Large gets `value`, others follow its margin (flat: all get `value`)
+    - profit: each cost + `value` (flat: Large cost + `value` for all)
+    - margin: each priced for `value` % (flat: Large's price for that margin for all)
+    """
+    value = float(value)
+    if mode == "retail":
+        if flat:
+            return [to_cents(value)] * len(costs)
+        margin = ((value - large_cost / 100) / value) if value > 0 else 0
+        return [margin_price_cents(c, margin) for c in costs]
+    if mode == "profit":
+        if flat:
+            return [to_cents(large_cost / 100 + value)] * len(costs)
+        return [int(round((c / 100 + value) * 100)) for c in costs]
+    if mode == "margin":
+        if value >= 100:
+            raise ValueError("Margin percent must be <100%.")
+        margin = value / 100.0
+        if flat:
+            target = (large_cost / 100 / (1 - margin)) if margin < 1.0 else large_cost / 100
+            return [to_cents(target)] * len(costs)
+        return [margin_price_cents(c, margin) for c in costs]
+    raise ValueError(f"Unknown pricing mode: {mode}")
+
+def profit_margin(price_cents, cost_cents):
+    """(profit cents, margin %) for one variant; margin is 0 when the price is 0."""
+    profit = price_cents - cost_cents
+    return profit, (profit / price_cents * 100) if price_cents > 0 else 0
+
+def preview_product(product, mode, value, flat=False):
+    """Before/after rows for one compact Product; `changed` counts variants whose price would move."""
+    large = product.large_variant
+    large_cost = large.cost if large else 0
+    new_prices = compute_prices([v.cost for v in product.variants], large_cost, mode, value, flat)
+    rows = []
+    changed = 0
+    for v, new_price in zip(product.variants, new_prices):
+        profit, margin = profit_margin(new_price, v.cost)
+        if new_price != v.price:
+            changed += 1
+        rows.append({
+            "id": v.id,
+            "size": product.size_title(v),
+            "color": product.color_title(v),
+            "is_enabled": v.is_enabled,
+            "cost": v.cost,
+            "price_before": v.price,
+            "price_after": new_price,
+            "profit": profit,
+            "margin": round(margin, 2),
+        })
+    return {
+        "id": product.id,
+        "shop_id": product.shop_id,
+        "title": product.title,
+        "garment_type": product.garment_type,
+        "changed_variants": changed,
+        "variants": rows,
+    }
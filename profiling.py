@@ -0,0 +1,210 @@
+# profiling.py
+
+"""
+On-demand profiling of single requests, for when one page load or bulk run
+is slow and the question is where the time went.
+
+Off unless PRINTIFY_PROFILE_TOKEN is set. A request carrying the token, as
+?profile=<token> or an X-Profile-Token header, runs under cProfile, a
+stack sampler and tracemalloc; anything else pays one dict lookup. Each run
+is saved to PRINTIFY_PROFILE_DIR as:
+
+    <id>.pstats   cProfile stats (python -m pstats, snakeviz)
+    <id>.folded   collapsed stacks of every thread the request used
+                  (flamegraph.pl, speedscope, inferno)
+    <id>.txt      top functions by cumulative time and top allocations
+
+cProfile sees only the request's own thread; the sampler also covers the
+worker threads the request starts (parallel catalog and price fan-out),
+plus any other request that happens to start at the same time. One request
+is profiled at a time; others carrying the token run normally.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+PROFILE_TOKEN = os.environ.get("PRINTIFY_PROFILE_TOKEN") or None
+PROFILE_DIR = os.environ.get(
+    "PRINTIFY_PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+)
+# Seconds between stack samples
+SAMPLE_INTERVAL = float(os.environ.get("PRINTIFY_PROFILE_INTERVAL", "0.005"))
+# Older reports are deleted beyond this many
+MAX_PROFILES = 50
+FORMATS = {"pstats": "application/octet-stream", "folded": "text/plain", "txt": "text/plain"}
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_active = threading.Lock()
+
+def token_matches(args, headers):
+    """True when profiling is configured and the request carries its token."""
+    if PROFILE_TOKEN is None:
+        return False
+    given = args.get("profile") or headers.get("X-Profile-Token")
+    return bool(given) and hmac.compare_digest(given, PROFILE_TOKEN)
+
+def _frame_label(code):
+    path = code.co_filename
+    if path.startswith(ROOT):
+        path = os.path.relpath(path, ROOT)
+    else:
+        path = "/".join(path.replace("\\", "/").split("/")[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+class StackSampler:
+    """Samples the stacks of `thread_id` and of threads started after it, every `interval` seconds."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.ignore = {t.ident for t in threading.enumerate()} - {thread_id}
+        self.names = {}
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+
+    def _run(self):
+        self.ignore.add(threading.get_ident())
+        while not self.stopping.wait(self.interval):
+            self.samples += 1
+            for tid, frame in sys._current_frames().items():
+                if tid in self.ignore:
+                    continue
+                if tid not in self.names:
+                    self.names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append("request" if tid == self.thread_id else self.names.get(tid, "thread"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        """Collapsed-stack text: one "root;caller;callee count" line per distinct stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class ProfileSession:
+    """One profiled request; start() and stop() must run on the request's thread."""
+
+    def __init__(self, label):
+        self.id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        self.label = label
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+        self.started_tracemalloc = False
+        self.started = None
+        self.finished = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self.sampler.start()
+        self.started = time.perf_counter()
+        self.profile.enable()
+
+    def stop(self):
+        """Stop profiling and write the report; safe to call twice."""
+        if self.finished:
+            return
+        self.finished = True
+        try:
+            self.profile.disable()
+            wall = time.perf_counter() - self.started
+            self.sampler.stop()
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+            self._write(wall, peak, snapshot)
+        except Exception as e:
+            print(f"[WARN] Could not save profile {self.id}: {e}")
+        finally:
+            _active.release()
+
+    def _write(self, wall, peak, snapshot):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, self.id)
+        self.profile.dump_stats(base + ".pstats")
+        with open(base + ".folded", "w", encoding="utf-8") as fh:
+            fh.write(self.sampler.folded())
+
+        out = io.StringIO()
+        out.write(f"{self.label}\nwall {wall:.3f}s, {self.sampler.samples} samples, "
+                  f"peak traced memory {peak / 1024 / 1024:.1f} MiB\n\n")
+        stats = pstats.Stats(self.profile, stream=out)
+        stats.sort_stats("cumulative").print_stats(40)
+        out.write("Top allocations (still held at the end of the request)\n")
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        for stat in snapshot.statistics("lineno")[:25]:
+            out.write(f"  {stat}\n")
+        with open(base + ".txt", "w", encoding="utf-8") as fh:
+            fh.write(out.getvalue())
+
+        with open(base + ".json", "w", encoding="utf-8") as fh:
+            json.dump({"id": self.id, "label": self.label, "created": time.time(), "wall": round(wall, 4),
+                       "samples": self.sampler.samples, "peak_bytes": peak}, fh)
+        _prune()
+
+def begin(label):
+    """A started ProfileSession, or None while another request is being profiled."""
+    if not _active.acquire(blocking=False):
+        return None
+    try:
+        session = ProfileSession(label)
+        session.start()
+    except Exception:
+        _active.release()
+        raise
+    return session
+
+def _prune():
+    metas = sorted(n for n in os.listdir(PROFILE_DIR) if n.endswith(".json"))
+    for name in metas[:-MAX_PROFILES]:
+        profile_id = name[:-len(".json")]
+        for ext in ["json"] + list(FORMATS):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, f"{profile_id}.{ext}"))
+            except FileNotFoundError:
+                pass
+
+def list_profiles():
+    """Saved profile summaries, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(PROFILE_DIR, name), encoding="utf-8") as fh:
+                    profiles.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+    return profiles
+
+def profile_path(profile_id, fmt):
+    """Path of a saved report file, or None when there is no such profile/format."""
+    if fmt not in FORMATS:
+        return None
+    path = os.path.join(PROFILE_DIR, f"{os.path.basename(profile_id)}.{fmt}")
+    return path if os.path.exists(path) else None
@@ -0,0 +1,265 @@
+# rules.py
+
+"""
+Named pricing rule sets: declarative rules targeting garment type, blueprint,
+size or color, evaluated over a whole catalog in one local pass.
+
+A rule set is an ordered list of rules. Every rule whose `match` fits a
+variant applies, later rules overriding the fields earlier ones set (like
+CSS), so a catch-all rule can come first and specific ones after it:
+
+    {"description": "Spring pricing",
+     "rules": [
+        {"margin": 40, "min_profit": 6, "charm": 0.99},
+        {"match": {"garment_type": "Hoodie"}, "margin": 45},
+        {"match": {"size": ["2XL", "3XL"]}, "size_upcharge": {"2XL": 2, "3XL": 4}},
+        {"match": {"blueprint_id": 6, "color": ["White"]}, "retail": 19.99}
+     ]}
+
+Fields (dollars unless noted):
+    match          garment_type / blueprint_id / size / color: a value or a list
+    retail         fixed price            } the last one set wins; without any,
+    profit         cost + profit          } the variant keeps its current price
+    margin         percent of the price   } (floors and rounding still apply)
+    size_upcharge  {size: dollars} added to the target price
+    min_profit     price never below cost + min_profit
+    charm          cents ending to round up to, e.g. 0.99 or 0.95
+
+A rule set is compiled once: matchers become casefolded sets, and the merged
+plan of each (garment type, blueprint, size, color) is resolved once and
+reused for every variant sharing it, so repricing thousands of variants is a
+dict lookup and a little arithmetic each.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from pricing import margin_price_cents, profit_margin, to_cents
+
+RULES_FILE = os.environ.get(
+    "PRINTIFY_RULES_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "pricing_rules.json")
+)
+MATCH_FIELDS = ("garment_type", "blueprint_id", "size", "color")
+TARGETS = ("retail", "profit", "margin")
+RULE_FIELDS = set(TARGETS) | {"match", "size_upcharge", "min_profit", "charm"}
+_UNRESOLVED = object()
+
+class RuleError(ValueError):
+    pass
+
+def _norm(value):
+    return str(value).strip().casefold()
+
+def charm_price(price_cents, ending_cents):
+    """Smallest price >= price_cents whose cents are ending_cents (1999 for 1950 and .99)."""
+    price = price_cents - price_cents % 100 + ending_cents
+    return price if price >= price_cents else price + 100
+
+class Rule:
+    __slots__ = ("match", "target", "upcharges", "min_profit", "charm")
+
+    def __init__(self, spec, position):
+        where = f"rule {position + 1}"
+        if not isinstance(spec, dict):
+            raise RuleError(f"{where}: expected an object.")
+        unknown = set(spec) - RULE_FIELDS
+        if unknown:
+            raise RuleError(f"{where}: unknown field(s) {', '.join(sorted(unknown))}.")
+        self.match = {}
+        for field, values in (spec.get("match") or {}).items():
+            if field not in MATCH_FIELDS:
+                raise RuleError(f"{where}: cannot match on {field}; use {', '.join(MATCH_FIELDS)}.")
+            values = values if isinstance(values, list) else [values]
+            self.match[field] = {_norm(v) for v in values}
+        targets = [t for t in TARGETS if spec.get(t) is not None]
+        if len(targets) > 1:
+            raise RuleError(f"{where}: set only one of retail, profit or margin.")
+        self.target = None
+        try:
+            if targets == ["margin"]:
+                margin = float(spec["margin"])
+                if not 0 <= margin < 100:
+                    raise RuleError(f"{where}: margin must be between 0 and 100.")
+                self.target = ("margin", margin / 100)
+            elif targets:
+                self.target = (targets[0], to_cents(spec[targets[0]]))
+            self.upcharges = {_norm(size): to_cents(v) for size, v in (spec.get("size_upcharge") or {}).items()}
+            self.min_profit = to_cents(spec["min_profit"]) if spec.get("min_profit") is not None else None
+            self.charm = to_cents(spec["charm"]) % 100 if spec.get("charm") is not None else None
+        except RuleError:
+            raise
+        except (TypeError, ValueError, AttributeError) as e:
+            raise RuleError(f"{where}: {e}")
+
+    def matches(self, keys):
+        return all(keys[field] in values for field, values in self.match.items())
+
+class Plan:
+    """What the matching rules of one (garment type, blueprint, size, color) add up to."""
+    __slots__ = ("target", "upcharge", "min_profit", "charm")
+
+    def __init__(self, target=None, upcharge=0, min_profit=None, charm=None):
+        self.target = target
+        self.upcharge = upcharge
+        self.min_profit = min_profit
+        self.charm = charm
+
+    def price(self, cost, current):
+        if self.target is None:
+            price = current
+        else:
+            kind, value = self.target
+            if kind == "retail":
+                price = value
+            elif kind == "profit":
+                price = cost + value
+            else:
+                price = margin_price_cents(cost, value)
+            price += self.upcharge
+        if self.min_profit is not None:
+            price = max(price, cost + self.min_profit)
+        if self.charm is not None:
+            price = charm_price(price, self.charm)
+        return price
+
+class RuleSet:
+    """A compiled rule set; build with RuleSet(name, spec), which raises RuleError on a bad spec."""
+
+    def __init__(self, name, spec):
+        self.name = name
+        rules = spec.get("rules") if isinstance(spec, dict) else None
+        if not isinstance(rules, list) or not rules:
+            raise RuleError("A rule set needs a non-empty \"rules\" list.")
+        self.rules = [Rule(r, i) for i, r in enumerate(rules)]
+        self.plans = {}
+        self.lock = threading.Lock()
+
+    def plan(self, garment_type, blueprint_id, size, color):
+        """The merged Plan for a variant, or None when no rule sets anything for it."""
+        key = (garment_type, blueprint_id, size, color)
+        plan = self.plans.get(key, _UNRESOLVED)
+        if plan is not _UNRESOLVED:
+            return plan
+        keys = {"garment_type": _norm(garment_type), "blueprint_id": _norm(blueprint_id),
+                "size": _norm(size), "color": _norm(color)}
+        plan = Plan()
+        matched = False
+        for rule in self.rules:
+            if not rule.matches(keys):
+                continue
+            matched = True
+            if rule.target is not None:
+                plan.target = rule.target
+            if keys["size"] in rule.upcharges:
+                plan.upcharge = rule.upcharges[keys["size"]]
+            if rule.min_profit is not None:
+                plan.min_profit = rule.min_profit
+            if rule.charm is not None:
+                plan.charm = rule.charm
+        plan = plan if matched else None
+        with self.lock:
+            self.plans[key] = plan
+        return plan
+
+    def evaluate(self, products):
+        """
+        (changes, report) over `products`: changes is {(shop_id, product_id):
+        {variant_id: new cents}} of the variants whose price moves, report one
+        entry per changed product with before/after rows of those variants.
+        """
+        changes = {}
+        report = []
+        for p in products:
+            prices = {}
+            rows = []
+            for v in p.variants:
+                size, color = p.size_title(v), p.color_title(v)
+                plan = self.plan(p.garment_type, p.blueprint_id, size, color)
+                if plan is None:
+                    continue
+                new_price = plan.price(v.cost, v.price)
+                if new_price == v.price:
+                    continue
+                prices[v.id] = new_price
+                profit, margin = profit_margin(new_price, v.cost)
+                rows.append({"id": v.id, "size": size, "color": color, "is_enabled": v.is_enabled, "cost": v.cost,
+                             "price_before": v.price, "price_after": new_price, "profit": profit,
+                             "margin": round(margin, 2)})
+            if prices:
+                changes[(str(p.shop_id), str(p.id))] = prices
+                report.append({"id": p.id, "shop_id": p.shop_id, "title": p.title, "garment_type": p.garment_type,
+                               "changed_variants": len(rows), "variants": rows})
+        return changes, report
+
+class RuleStore:
+    """Rule sets by name in one JSON file, re-read when another process changes it."""
+
+    def __init__(self, path=None):
+        self.path = path or RULES_FILE
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.specs = {}
+        self.compiled = {}
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self.mtime, self.specs, self.compiled = None, {}, {}
+            return
+        if mtime != self.mtime:
+            with open(self.path, encoding="utf-8") as fh:
+                self.specs = json.load(fh)
+            self.mtime = mtime
+            self.compiled = {}
+
+    def _write(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".rules-")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(self.specs, fh, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+        self.mtime = os.stat(self.path).st_mtime_ns
+
+    def all(self):
+        with self.lock:
+            self._load()
+            return {name: dict(spec) for name, spec in self.specs.items()}
+
+    def get(self, name):
+        """The compiled RuleSet `name`; KeyError when there is none."""
+        with self.lock:
+            self._load()
+            if name not in self.specs:
+                raise KeyError(f"No rule set named {name}.")
+            if name not in self.compiled:
+                self.compiled[name] = RuleSet(name, self.specs[name])
+            return self.compiled[name]
+
+    def save(self, name, spec):
+        """Validate and store a rule set; returns the stored spec."""
+        name = (name or "").strip()
+        if not name:
+            raise RuleError("A rule set needs a name.")
+        compiled = RuleSet(name, spec)
+        stored = {"description": spec.get("description") or "", "rules": spec["rules"], "updated": time.time()}
+        with self.lock:
+            self._load()
+            self.specs[name] = stored
+            self._write()
+            self.compiled[name] = compiled
+        return stored
+
+    def delete(self, name):
+        with self.lock:
+            self._load()
+            if name not in self.specs:
+                raise KeyError(f"No rule set named {name}.")
+            del self.specs[name]
+            self.compiled.pop(name, None)
+            self._write()
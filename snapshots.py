@@ -0,0 +1,151 @@
+# snapshots.py
+
+"""
+Pre-change price snapshots, so a bad bulk run can be undone.
+
+Every price write records the prices it is about to overwrite in the
+snapshot of its operation (a bulk edit, an apply, a single product edit)
+before the PUT is sent. Only the variants in the PUT are stored, one JSONL
+line per product: [variant_id, cents] for those whose price changes, and
+[variant_id, cents, is_enabled] for those whose enabled flag the PUT changes
+too (pre-flight disabling hidden variants to stay under the enabled-variant
+limit). The first row seen for a variant wins, so a resumed job keeps the
+prices from before it began. Snapshots of journaled jobs share the job's id.
+
+Rolling a snapshot back writes the stored prices and enabled flags again,
+skipping variants that already have them.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+SNAPSHOT_DIR = os.environ.get(
+    "PRINTIFY_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+)
+# Oldest snapshots are deleted beyond this many
+MAX_SNAPSHOTS = int(os.environ.get("PRINTIFY_SNAPSHOT_KEEP", "500"))
+
+class Snapshot:
+    """
+    One operation's pre-change prices. The file is written on the first
+    record(), so operations that change nothing leave no snapshot behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.snapshot_id = os.path.splitext(os.path.basename(path))[0]
+        self.source = None
+        self.params = {}
+        self.created = None
+        self.prices = {}      # product ref -> {variant_id: cents before the first write}
+        self.enabled = {}     # product ref -> {variant_id: is_enabled before a write that changed it}
+        self.updated_at = {}  # product ref -> updated_at as first read
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            self._replay()
+
+    @classmethod
+    def create(cls, source, params=None, snapshot_id=None, directory=None):
+        """A new snapshot, or the existing one with that id (a resumed job keeps adding to it)."""
+        directory = directory or SNAPSHOT_DIR
+        snapshot_id = snapshot_id or time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        snapshot = cls(os.path.join(directory, f"{os.path.basename(snapshot_id)}.jsonl"))
+        if snapshot.created is None:
+            snapshot.source = source
+            snapshot.params = params or {}
+        return snapshot
+
+    @classmethod
+    def open(cls, snapshot_id, directory=None):
+        path = os.path.join(directory or SNAPSHOT_DIR, f"{os.path.basename(snapshot_id)}.jsonl")
+        if not os.path.exists(path):
+            raise KeyError(f"No snapshot {snapshot_id}.")
+        return cls(path)
+
+    def _replay(self):
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # torn last line
+                if rec.get("type") == "begin":
+                    self.source = rec.get("source")
+                    self.params = rec.get("params") or {}
+                    self.created = rec.get("ts")
+                elif rec.get("type") == "prices":
+                    self._merge(rec)
+
+    def _merge(self, rec):
+        prices = self.prices.setdefault(rec["product_id"], {})
+        enabled = self.enabled.setdefault(rec["product_id"], {})
+        for row in rec["prices"]:
+            prices.setdefault(row[0], row[1])
+            if len(row) > 2:
+                enabled.setdefault(row[0], row[2])
+        self.updated_at.setdefault(rec["product_id"], rec.get("updated_at"))
+
+    def record(self, product_id, variants, sent, updated_at=None):
+        """
+        Store the current prices of the `sent` rows (PUT payload) of a product's
+        API `variants`, and the enabled flags the rows change.
+        """
+        product_id = str(product_id)
+        current = {v["id"]: v for v in variants or []}
+        pairs = []
+        with self.lock:
+            seen = self.prices.get(product_id, {})
+            for u in sent:
+                v = current.get(u["id"])
+                if u["id"] in seen or v is None or v.get("price") is None:
+                    continue
+                was = v.get("is_enabled", True)
+                pairs.append([u["id"], v["price"]] + ([was] if u.get("is_enabled", was) != was else []))
+            if not pairs:
+                return
+            rec = {"type": "prices", "product_id": product_id, "updated_at": updated_at, "prices": pairs}
+            self._write(rec)
+            self._merge(rec)
+
+    def _write(self, rec):
+        lines = []
+        if self.created is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.created = time.time()
+            lines.append({"type": "begin", "source": self.source, "params": self.params, "ts": self.created})
+            _prune(os.path.dirname(self.path))
+        lines.append(rec)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in lines))
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def summary(self):
+        return {
+            "snapshot_id": self.snapshot_id,
+            "source": self.source,
+            "params": self.params,
+            "created": self.created,
+            "products": len(self.prices),
+            "variants": sum(len(p) for p in self.prices.values()),
+        }
+
+def _prune(directory):
+    names = sorted(n for n in os.listdir(directory) if n.endswith(".jsonl"))
+    for name in names[:max(0, len(names) - MAX_SNAPSHOTS + 1)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+def list_snapshots(directory=None):
+    """Summaries of every snapshot, newest first."""
+    directory = directory or SNAPSHOT_DIR
+    if not os.path.isdir(directory):
+        return []
+    return [Snapshot(os.path.join(directory, name)).summary()
+            for name in sorted(os.listdir(directory), reverse=True) if name.endswith(".jsonl")]
@@ -0,0 +1,210 @@
+// Dashboard behaviour; served fingerprinted by app.py (see assets.py).
+// Route URLs and the current shop come from data- attributes on <body>.
+
+let selectedProducts = [];
+function updateBulkBar() {
+    let bar = document.getElementById("bulk-edit-bar");
+    if (selectedProducts.length > 0) {
+        bar.style.display = 'block';
+    } else {
+        bar.style.display = 'none';
+        document.getElementById("bulk_retail").value = "";
+        document.getElementById("bulk_profit").value = "";
+        document.getElementById("bulk_percent").value = "";
+    }
+    document.getElementById("bulk_count").innerText = selectedProducts.length;
+    document.getElementById("bulk_products").value = selectedProducts.join(",");
+}
+function updatePublishBar() {
+    let bar = document.getElementById("bulk-publish-bar");
+    if (selectedProducts.length > 0) {
+        bar.style.display = 'block';
+    } else {
+        bar.style.display = 'none';
+        document.getElementById("publish-status").style.display = "none";
+    }
+}
+function toggleProduct(id, checked) {
+    if (checked) {
+        if (!selectedProducts.includes(id)) selectedProducts.push(id);
+    } else {
+        selectedProducts = selectedProducts.filter(pid => pid !== id);
+    }
+    updateBulkBar();
+    updatePublishBar();
+}
+function selectAllVisible(checked) {
+    let products = document.querySelectorAll('.prod');
+    products.forEach(prod => {
+        if(prod.style.display !== "none") {
+            let cb = prod.querySelector('.select-checkbox');
+            cb.checked = checked;
+            toggleProduct(cb.value, checked);
+        }
+    });
+}
+function clearSelections() {
+    selectedProducts = [];
+    document.querySelectorAll('.select-checkbox').forEach(cb=>{ cb.checked=false; });
+    updateBulkBar();
+    updatePublishBar();
+}
+function filterByType() {
+    var t = document.getElementById('gtype').value;
+    document.querySelectorAll('.prod').forEach(function(p){
+        var thisType = p.getAttribute('data-gtype');
+        p.style.display = (!t || t=='all' || thisType==t) ? '' : 'none';
+    });
+}
+function showEdit(id) { document.getElementById("editbox_" + id).style.display = ""; }
+function hideEdit(id) { document.getElementById("editbox_" + id).style.display = "none"; }
+function updateFromProfit(id, costId, retailId, profitId, percentId) {
+    let cost = parseFloat(document.getElementById(costId).textContent);
+    let profit = parseFloat(document.getElementById(profitId).value);
+    let retail = cost + profit;
+    document.getElementById(retailId).value = retail.toFixed(2);
+    let percent = (profit / retail) * 100;
+    document.getElementById(percentId).value = isFinite(percent) ? Math.round(percent) : 0;
+}
+function updateFromPercent(id, costId, retailId, profitId, percentId) {
+    let cost = parseFloat(document.getElementById(costId).textContent);
+    let percent = parseFloat(document.getElementById(percentId).value);
+    let retail = cost / (1 - percent/100);
+    let profit = retail - cost;
+    document.getElementById(retailId).value = retail.toFixed(2);
+    document.getElementById(profitId).value = profit.toFixed(2);
+}
+function updateFromRetail(id, costId, retailId, profitId, percentId) {
+    let cost = parseFloat(document.getElementById(costId).textContent);
+    let retail = parseFloat(document.getElementById(retailId).value);
+    let profit = retail - cost;
+    let percent = (profit / retail) * 100;
+    document.getElementById(profitId).value = profit.toFixed(2);
+    document.getElementById(percentId).value = isFinite(percent) ? Math.round(percent) : 0;
+}
+async function previewBulk() {
+    let panel = document.getElementById("bulk-preview-panel");
+    let modes = [["retail", "bulk_retail"], ["profit", "bulk_profit"], ["margin", "bulk_percent"]]
+        .filter(m => document.getElementById(m[1]).value !== "");
+    if (modes.length !== 1) {
+        panel.textContent = "Set either Retail, Profit, or Margin %, not more than one.";
+        return;
+    }
+    panel.textContent = "Computing preview...";
+    let resp = await fetch(document.body.dataset.previewUrl, {
+        method: "POST",
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({
+            product_ids: selectedProducts,
+            shop: document.body.dataset.shop,
+            mode: modes[0][0],
+            value: document.getElementById(modes[0][1]).value,
+            flat: document.getElementById("bulk_flat").checked
+        })
+    });
+    let data = await resp.json();
+    if (data.error) { panel.textContent = data.error; return; }
+    let s = data.summary;
+    // titles, sizes and colors come from the shop; build cells as text, never as HTML
+    let table = document.createElement("table");
+    let addRow = (cells, tag, className) => {
+        let tr = table.insertRow();
+        if (className) tr.className = className;
+        cells.forEach(text => {
+            let cell = document.createElement(tag);
+            cell.textContent = text;
+            tr.appendChild(cell);
+        });
+    };
+    let money = cents => `$${(cents/100).toFixed(2)}`;
+    addRow(["Product", "Size", "Color", "Before", "After", "Cost", "Profit", "Margin %"], "th");
+    data.products.forEach(p => p.variants.filter(v => v.is_enabled).forEach(v => addRow(
+        [p.title, v.size, v.color, money(v.price_before), money(v.price_after), money(v.cost), money(v.profit),
+         `${Math.round(v.margin)}%`],
+        "td", v.price_after !== v.price_before ? "updated-row" : ""
+    )));
+    let wrap = document.createElement("div");
+    wrap.className = "scroll-table";
+    wrap.appendChild(table);
+    panel.textContent = `${s.changed_variants} of ${s.variants} variants in ${s.changed_products} of ${s.products} products would change (${data.elapsed_ms} ms).`;
+    panel.appendChild(wrap);
+}
+function toggleAllVariants(id){
+    const el = document.getElementById('allvars_' + id);
+    const btn = document.getElementById('expand_btn_' + id);
+    if(el.style.display === 'none' || el.style.display === ''){
+        el.style.display = 'block';
+        if(btn) btn.textContent = 'Hide all variants';
+    } else {
+        el.style.display = 'none';
+        if(btn) btn.textContent = 'Show all variants';
+    }
+}
+// Same wording as app.format_age; a page revalidated with a 304 still shows its true age
+function formatAge(seconds) {
+    if (seconds < 90) return Math.floor(seconds) + "s";
+    if (seconds < 90 * 60) return Math.floor(seconds / 60) + " min";
+    if (seconds < 48 * 3600) return (seconds / 3600).toFixed(1) + " h";
+    return (seconds / 86400).toFixed(1) + " days";
+}
+function updateSnapshotAge() {
+    document.querySelectorAll('[data-loaded]').forEach(function(el) {
+        let loaded = parseFloat(el.dataset.loaded);
+        if (loaded) el.textContent = formatAge(Math.max(0, Date.now() / 1000 - loaded));
+    });
+}
+document.addEventListener("DOMContentLoaded", function() {
+    updateSnapshotAge();
+    let shopSelect = document.getElementById("shop-select");
+    if (shopSelect) {
+        shopSelect.addEventListener("change", function() {
+            let params = new URLSearchParams(window.location.search);
+            params.set("shop", this.value);
+            window.location.search = params.toString();
+        });
+    }
+    document.getElementById("gtype").addEventListener("change", function(){
+        filterByType();
+        clearSelections();
+    });
+    document.getElementById("select-all-cb").addEventListener("change", function() {
+        selectAllVisible(this.checked);
+    });
+    document.getElementById("bulk-cancel").addEventListener("click", function() {
+        clearSelections();
+    });
+    document.getElementById("bulk-preview").addEventListener("click", previewBulk);
+    document.querySelectorAll('.select-checkbox').forEach(cb=>{
+        cb.addEventListener("change", function() {
+            toggleProduct(cb.value, cb.checked);
+        });
+    });
+    filterByType();
+    updateBulkBar();
+    updatePublishBar();
+    let closeBtn = document.getElementById('close-job-msg');
+    if (closeBtn) {
+        closeBtn.addEventListener('click', function() {
+            document.getElementById('job-flash-messages').style.display = 'none';
+        });
+    }
+    // Publish action
+    document.getElementById("bulk-publish-btn").addEventListener("click", async function() {
+        if(selectedProducts.length === 0) return;
+        let status = document.getElementById("publish-status");
+        status.style.display = "inline";
+        status.textContent = "Publishing...";
+        let resp = await fetch(document.body.dataset.publishUrl, {
+            method: "POST",
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({ product_ids: selectedProducts })
+        });
+        let data = await resp.json();
+        let msgs = data.results.map(
+            r => r.success
+                ? `✔️ ${r.title || r.id}: Published`
+                : `❌ ${r.title || r.id}: ${r.error || 'Failed'}`
+        ).join(" | ");
+        status.textContent = msgs;
+    });
+});
@@ -0,0 +1,58 @@
+# conftest.py
+
+"""
+Fixtures for the tests: app.py pointed at a mock_printify.py server, with its
+journal, snapshots, cost history and rules in scratch directories.
+"""
+
+import copy
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+for var, name in (("PRINTIFY_JOURNAL_DIR", "journal"), ("PRINTIFY_SNAPSHOT_DIR", "snapshots"),
+                  ("PRINTIFY_COST_DIR", "costs"), ("PRINTIFY_THUMB_DIR", "thumbs")):
+    os.environ[var] = tempfile.mkdtemp(prefix=f"printify-test-{name}-")
+os.environ["PRINTIFY_RULES_FILE"] = os.path.join(tempfile.mkdtemp(prefix="printify-test-rules-"), "rules.json")
+os.environ["PRINTIFY_API_KEY"] = "test"
+os.environ["PRINTIFY_REQUESTS_PER_MINUTE"] = "0"
+os.environ["PRINTIFY_WARMUP"] = "0"
+os.environ.pop("PRINTIFY_CACHE_DB", None)
+
+from mock_printify import MockPrintify, generate_catalog, start_mock_server
+
+SHOP = "1000"
+
+@pytest.fixture(scope="session")
+def server():
+    fixtures = generate_catalog(products=6, variants_per_product=12, shops=1)
+    state = MockPrintify(fixtures)
+    srv, api_base = start_mock_server(state)
+    os.environ["PRINTIFY_API_BASE"] = api_base
+    import app
+    app.API_BASE = api_base
+    yield state, app, copy.deepcopy(state.products)
+    srv.shutdown()
+
+@pytest.fixture
+def printify(server):
+    """(mock state, app module) with the mock's catalog and the app's caches reset."""
+    state, app, pristine = server
+    state.products = copy.deepcopy(pristine)
+    app.BLUEPRINT_MAP = None
+    app.BLUEPRINT_INDEX = None
+    app.SHOPS = None
+    app.shipping_cache.clear()
+    app.catalog_cache.clear()
+    return state, app
+
+def live_prices(state, shop_id=SHOP):
+    """{product_id: {variant_id: (price, is_enabled)}} as the mock holds them now."""
+    return {pid: {v["id"]: (v["price"], v["is_enabled"]) for v in p["variants"]}
+            for pid, p in state.products[shop_id].items()}
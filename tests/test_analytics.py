@@ -0,0 +1,29 @@
+# test_analytics.py
+
+"""Margin analytics reports over hand-built products."""
+
+import pytest
+
+from analytics import MarginAnalytics
+from models import Product, Variant
+
+def product(pid, variants, cost=1000):
+    """`variants` variants with margins spread from 5% upwards."""
+    return Product(id=pid, title=f"Tee {pid}", shop_id="1", garment_type="T-Shirt",
+                   variants=tuple(Variant(id=i, cost=cost, price=cost * 100 // (95 - i)) for i in range(variants)))
+
+@pytest.mark.parametrize("sizes, limit", [
+    ((40,), 25),
+    ((40, 40), 25),
+    ((3, 4), 25),
+    ((40,) * 30, 25),
+    ((2,) * 5, 8),
+])
+def test_lowest_margin_lists_the_limit_or_every_priced_variant(sizes, limit):
+    analytics = MarginAnalytics()
+    products = [product(str(n), size) for n, size in enumerate(sizes)]
+    analytics.update_shop("1", products)
+    rows = analytics.report(["1"], lowest=limit)["lowest_margin"]
+    assert len(rows) == min(limit, sum(sizes))
+    margins = sorted((v.price - v.cost) * 10000 // v.price for p in products for v in p.variants)
+    assert [r["margin"] for r in rows] == [m / 100 for m in margins[:limit]]
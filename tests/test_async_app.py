@@ -0,0 +1,51 @@
+# test_async_app.py
+
+"""async_app.py's write and catalog paths against mock_printify.py."""
+
+import asyncio
+import time
+
+import pytest
+
+from cache import SharedCache
+from conftest import SHOP, live_prices
+
+pytest.importorskip("quart")
+
+def run(coro):
+    return asyncio.run(coro)
+
+async def with_client(fn):
+    import async_app
+    async with async_app.app.test_app() as test_app:
+        return await fn(test_app.test_client())
+
+def test_price_apply_writes_syncs_and_rolls_back(printify):
+    state, app = printify
+    before = live_prices(state)
+
+    async def go(client):
+        resp = await client.post("/api/price_apply", json={"shop": SHOP, "mode": "profit", "value": 25})
+        return await resp.get_json()
+    body = run(with_client(go))
+    assert body["updated"] > 0
+    after = live_prices(state)
+    for p in app.get_cached_catalog([SHOP]):
+        assert {v.id: (v.price, v.is_enabled) for v in p.variants} == after[p.id]
+
+    app.app.test_client().post(f"/api/snapshots/{body['job_id']}/rollback", json={})
+    assert live_prices(state) == before
+
+def test_missing_catalog_waits_for_the_worker_holding_its_lease(printify, tmp_path, monkeypatch):
+    state, app = printify
+    import async_app
+    shared = SharedCache(str(tmp_path / "cache.db"))
+    monkeypatch.setattr(app, "shared_cache", shared)
+    # another worker is crawling the shop and dies without releasing the lease
+    assert shared.claim(f"loading:{SHOP}", "other-worker", 0.5)
+
+    started = time.time()
+    products = run(with_client(lambda client: async_app.get_cached_catalog([SHOP])))
+    assert time.time() - started >= 0.4
+    assert {p.id for p in products} == set(state.products[SHOP])
+    assert not shared.is_claimed(f"loading:{SHOP}")
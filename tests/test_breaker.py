@@ -0,0 +1,96 @@
+# test_breaker.py
+
+"""The circuit breaker in front of Printify, alone and behind app.api_request() and the dashboard."""
+
+import time
+
+import pytest
+import requests
+
+from conftest import SHOP
+from pipeline import CircuitBreaker, CircuitOpenError
+
+def test_breaker_opens_after_the_threshold_and_half_opens_after_the_cooldown():
+    breaker = CircuitBreaker(failures=3, reset_seconds=0.2)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure("HTTP 502")
+    assert breaker.state == "closed"
+    breaker.record_failure("HTTP 502")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.25)
+    breaker.before_call()  # the probe
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_failure("HTTP 503")
+    assert breaker.state == "open"  # one failed probe opens it again
+
+    time.sleep(0.25)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.stats() == {"state": "closed", "failures": 0, "rejected": 2, "last_error": "HTTP 503"}
+    breaker.before_call()
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failures=2, reset_seconds=60)
+    breaker.record_failure("timeout")
+    breaker.record_success()
+    breaker.record_failure("timeout")
+    assert breaker.state == "closed"
+
+@pytest.fixture
+def outage(printify, monkeypatch):
+    """
+    (app, calls, recover): a fresh breaker (2 failures, 0.3 s cooldown), Printify
+    refusing connections, the URLs that were tried and a function ending the outage.
+    """
+    state, app = printify
+    app.app.test_client().get(f"/?shop={SHOP}")  # catalog cached before the outage
+    monkeypatch.setattr(app, "printify_breaker", CircuitBreaker(failures=2, reset_seconds=0.3))
+    calls = []
+    real = requests.request
+
+    def down(method, url, **kwargs):
+        calls.append(url)
+        raise requests.ConnectionError("connection refused")
+    monkeypatch.setattr(app.requests, "request", down)
+    return app, calls, lambda: monkeypatch.setattr(app.requests, "request", real)
+
+def test_api_request_fails_fast_while_open_and_probes_after_the_cooldown(outage):
+    app, calls, recover = outage
+    url = f"{app.API_BASE}/shops.json"
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            app.api_request("GET", url)
+    assert app.printify_breaker.state == "open"
+
+    started = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        app.api_request("GET", url)
+    assert time.monotonic() - started < 0.05
+    assert len(calls) == 2  # nothing sent while open
+
+    time.sleep(0.35)
+    recover()
+    assert app.api_request("GET", url).status_code == 200
+    assert app.printify_breaker.state == "closed"
+
+def test_dashboard_serves_the_cached_catalog_while_open(outage):
+    app, calls, _ = outage
+    client = app.app.test_client()
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            app.api_request("GET", f"{app.API_BASE}/shops.json")
+
+    resp = client.get(f"/?shop={SHOP}&refresh=1")
+    assert resp.status_code == 200
+    assert len(calls) == 2
+
+    app.catalog_cache.clear()
+    resp = client.get(f"/?shop={SHOP}")
+    assert resp.status_code == 503
+    assert "Retry-After" in resp.headers
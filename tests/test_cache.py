@@ -0,0 +1,40 @@
+# test_cache.py
+
+"""The SQLite cache shared between gunicorn workers."""
+
+from cache import MISSING, SharedCache
+
+def test_values_expire_after_max_age(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"))
+    assert cache.get("shipping:1:front:US") is MISSING
+    cache.set("shipping:1:front:US", 499)
+    assert cache.get("shipping:1:front:US") == 499
+    assert cache.get("shipping:1:front:US", max_age=-1) is MISSING
+
+def test_catalog_since_returns_only_what_changed(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"))
+    other = SharedCache(str(tmp_path / "cache.db"))  # another worker
+    assert cache.catalog_since("1000") == (None, 0, [], False)
+    generation, seq = cache.replace_catalog("1000", [{"id": "a", "n": 1}, {"id": "b", "n": 1}])
+
+    assert other.catalog_since("1000") == (generation, seq, [{"id": "a", "n": 1}, {"id": "b", "n": 1}], True)
+    assert other.catalog_since("1000", generation, seq) == (generation, seq, [], False)
+    seq2 = cache.put_products("1000", [{"id": "b", "n": 2}])
+    assert other.catalog_since("1000", generation, seq) == (generation, seq2, [{"id": "b", "n": 2}], False)
+    assert cache.put_products("2000", [{"id": "c"}]) is None
+
+    generation2, _ = cache.replace_catalog("1000", [{"id": "c", "n": 1}])
+    assert generation2 == generation + 1
+    assert other.catalog_since("1000", generation, seq2)[2:] == ([{"id": "c", "n": 1}], True)
+
+def test_lease_is_held_by_one_owner_until_released_or_expired(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"))
+    assert cache.claim("loading:1000", "a", 60)
+    assert not cache.claim("loading:1000", "b", 60)
+    assert cache.claim("loading:1000", "a", 60)
+    cache.release("loading:1000", "b")
+    assert cache.is_claimed("loading:1000")
+    cache.release("loading:1000", "a")
+    assert not cache.is_claimed("loading:1000")
+    assert cache.claim("loading:1000", "b", -1)
+    assert cache.claim("loading:1000", "a", 60)
@@ -0,0 +1,67 @@
+# test_compression.py
+
+"""Weak ETags and 304s for the dashboard and JSON GETs, and gzip/brotli negotiation."""
+
+import gzip
+
+import pytest
+
+import compression
+from conftest import SHOP
+
+def test_unchanged_dashboard_is_answered_304(printify):
+    state, app = printify
+    client = app.app.test_client()
+    first = client.get(f"/?shop={SHOP}")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    again = client.get(f"/?shop={SHOP}", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers["ETag"] == etag
+
+    # a price change is a new page
+    client.post("/api/price_apply", json={"shop": SHOP, "mode": "profit", "value": 25})
+    assert client.get(f"/?shop={SHOP}", headers={"If-None-Match": etag}).status_code == 200
+
+def test_json_get_gets_a_weak_etag(printify):
+    state, app = printify
+    client = app.app.test_client()
+    first = client.get("/api/snapshots")
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert client.get("/api/snapshots", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/snapshots", headers={"If-None-Match": 'W/"other"'}).status_code == 200
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "br" if compression.brotli else "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_encoding_follows_accept_encoding(printify, accept, encoding):
+    state, app = printify
+    client = app.app.test_client()
+    plain = client.get(f"/?shop={SHOP}").data
+    resp = client.get(f"/?shop={SHOP}", headers={"Accept-Encoding": accept})
+    assert resp.headers.get("Content-Encoding") == encoding
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    if encoding == "gzip":
+        assert gzip.decompress(resp.data) == plain
+    elif encoding is None:
+        assert resp.data == plain
+
+def test_brotli_is_preferred_when_installed(monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    monkeypatch.setattr(compression, "brotli", brotli)
+    from werkzeug.datastructures import Accept
+    assert compression.choose_encoding(Accept([("gzip", 1), ("br", 1)])) == "br"
+
+def test_small_bodies_are_sent_uncompressed(printify):
+    state, app = printify
+    resp = app.app.test_client().get("/healthz", headers={"Accept-Encoding": "gzip"})
+    assert len(resp.data) < compression.MIN_SIZE
+    assert "Content-Encoding" not in resp.headers
+    assert not compression.should_compress("application/json", compression.MIN_SIZE - 1)
+    assert compression.should_compress("application/json", compression.MIN_SIZE)
+    assert not compression.should_compress("image/png", 10 * compression.MIN_SIZE)
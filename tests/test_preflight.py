@@ -0,0 +1,28 @@
+# test_preflight.py
+
+"""Pre-flight checks: trimming hidden variants over the enabled limit, and the updates Printify would refuse."""
+
+from preflight import check_update
+
+def variant(vid, price=2000, cost=1000, enabled=True, visible=True):
+    return {"id": vid, "price": price, "cost": cost, "is_enabled": enabled, "is_visible": visible}
+
+def row(v, price):
+    return {"id": v["id"], "price": price, "is_enabled": v["is_enabled"], "is_visible": v["is_visible"]}
+
+def test_preflight_trims_hidden_variants_over_the_limit():
+    variants = [variant(i, visible=i >= 3) for i in range(12)]
+    checked = check_update(variants, [row(variants[5], 2200)], max_enabled=10, trim=True)
+    assert checked.ok
+    assert checked.trimmed == [1, 2]
+    assert checked.enabled == 10
+    assert {u["id"]: u["is_enabled"] for u in checked.payload} == {5: True, 1: False, 2: False}
+
+def test_preflight_rejects_what_printify_would_refuse():
+    variants = [variant(i, visible=i >= 11) for i in range(12)]
+    assert not check_update(variants, [row(variants[0], 2200)], max_enabled=10, trim=False).ok
+    assert check_update(variants, [row(variants[0], 2200)], max_enabled=10, trim=True).ok
+    few = [variant(i) for i in range(3)]
+    assert "$0 or less" in check_update(few, [row(few[0], 0)]).message()
+    assert "below cost" in check_update(few, [row(few[1], 900)], allow_below_cost=False).message()
+    assert check_update(few, [row(few[1], 900)], allow_below_cost=True).ok
@@ -0,0 +1,163 @@
+# test_price_writes.py
+
+"""Every price write path against mock_printify.py, then a rollback of its snapshot."""
+
+import pytest
+
+from conftest import SHOP, live_prices
+from snapshots import list_snapshots
+
+def snapshot_ids():
+    return {s["snapshot_id"] for s in list_snapshots()}
+
+def first_product(app):
+    return app.get_cached_catalog([SHOP])[0]
+
+def flashes(client):
+    """(category, message) pairs flashed so far, not yet shown."""
+    with client.session_transaction() as session:
+        return session.get("_flashes", [])
+
+def write_bulk_edit(app, client):
+    refs = ",".join(app.product_ref(p.shop_id, p.id) for p in app.get_cached_catalog([SHOP]))
+    assert client.post("/bulk_edit", data={"product_ids": refs, "percent_val": "70"}).status_code == 302
+
+def edit_price_all(client, product):
+    resp = client.post("/edit_price_all", data={"shop_id": SHOP, "product_id": product.id, "new_price": "99",
+                                                "profit_val": "0", "percent_val": "0", "flat_prices": "on"})
+    assert resp.status_code == 302
+    ((category, message),) = flashes(client)
+    assert category == "success" and "variant prices updated" in message
+
+def write_edit_price_all(app, client):
+    edit_price_all(client, first_product(app))
+
+def write_price_apply(app, client):
+    body = client.post("/api/price_apply", json={"shop": SHOP, "mode": "profit", "value": 25}).get_json()
+    assert body["updated"] > 0
+
+def write_cli(app, client):
+    import cli
+    assert cli.main(["reprice", "--shop", SHOP, "--mode", "margin", "--value", "65"]) == 0
+
+@pytest.mark.parametrize("write", [write_bulk_edit, write_edit_price_all, write_price_apply, write_cli],
+                         ids=["bulk_edit", "edit_price_all", "price_apply", "cli"])
+def test_write_then_rollback_restores_live_prices(printify, write):
+    state, app = printify
+    client = app.app.test_client()
+    before = live_prices(state)
+    known = snapshot_ids()
+    write(app, client)
+    after = live_prices(state)
+    assert after != before
+    # the cached catalog follows the write, so the dashboard and other workers see it
+    for p in app.get_cached_catalog([SHOP]):
+        assert {v.id: (v.price, v.is_enabled) for v in p.variants} == after[p.id]
+
+    (snapshot_id,) = snapshot_ids() - known
+    body = client.post(f"/api/snapshots/{snapshot_id}/rollback", json={}).get_json()
+    assert body["summary"]["changed_products"] == sum(1 for pid in before if before[pid] != after[pid])
+    assert live_prices(state) == before
+
+    again = client.post(f"/api/snapshots/{snapshot_id}/rollback", json={}).get_json()
+    assert again["summary"]["changed_products"] == 0
+
+def test_rollback_undoes_writes_the_cache_missed(printify):
+    state, app = printify
+    client = app.app.test_client()
+    product = first_product(app)
+    before = live_prices(state)
+    known = snapshot_ids()
+    edit_price_all(client, product)
+    (snapshot_id,) = snapshot_ids() - known
+    # a cache that missed the write already looks rolled back
+    for v in product.variants:
+        v.price = before[product.id][v.id][0]
+    assert client.post(f"/api/snapshots/{snapshot_id}/rollback", json={"dry_run": True}).get_json()[
+        "summary"]["changed_products"] == 0
+    client.post(f"/api/snapshots/{snapshot_id}/rollback", json={})
+    assert live_prices(state) == before
+
+def grow_product(state, pid, hidden):
+    """110 enabled variants on one product, the first `hidden` of them hidden."""
+    base = state.products[SHOP][pid]["variants"]
+    variants = []
+    for i in range(110):
+        v = dict(base[i % len(base)], id=900000 + i, is_default=False, is_visible=i >= hidden)
+        variants.append(v)
+    variants[-1] = dict(base[4])  # keep a Large variant
+    state.products[SHOP][pid]["variants"] = variants
+
+def test_rollback_re_enables_trimmed_variants(printify):
+    state, app = printify
+    client = app.app.test_client()
+    pid = next(iter(state.products[SHOP]))
+    grow_product(state, pid, hidden=15)
+    before = live_prices(state)[pid]
+    body = client.post("/api/price_apply", json={"shop": SHOP, "mode": "margin", "value": 45,
+                                                 "product_ids": [f"{SHOP}:{pid}"]}).get_json()
+    after = live_prices(state)[pid]
+    trimmed = [vid for vid in after if before[vid][1] and not after[vid][1]]
+    assert len(trimmed) == 10
+
+    # the owner disables other variants, making room to enable the trimmed ones again
+    freed = [v["id"] for v in state.products[SHOP][pid]["variants"][50:60]]
+    for v in state.products[SHOP][pid]["variants"][50:60]:
+        v["is_enabled"] = False
+    client.post(f"/api/snapshots/{body['job_id']}/rollback", json={})
+    now = live_prices(state)[pid]
+    assert all(now[vid][1] for vid in trimmed)
+    assert not any(now[vid][1] for vid in freed)
+    assert {vid: price for vid, (price, _) in now.items()} == {vid: price for vid, (price, _) in before.items()}
+
+def test_resume_job_finishes_and_syncs_the_cache(printify):
+    state, app = printify
+    from journal import Journal
+    products = app.get_cached_catalog([SHOP])[:2]
+    refs = [app.product_ref(p.shop_id, p.id) for p in products]
+    journal = Journal.create("price", {"mode": "profit", "value": 30, "flat": False, "source": "bulk_edit"}, refs)
+    # interrupted after the first product's intent was journaled, before its PUT
+    first = products[0]
+    payload = [{"id": v.id, "price": v.cost + 3000, "is_enabled": v.is_enabled, "is_visible": v.is_visible}
+               for v in first.variants]
+    journal.record_intent(refs[0], first.updated_at, payload)
+
+    journal, results = app.resume_job(journal.job_id)
+    assert [r["status"] for r in results] == ["done", "done"]
+    live = live_prices(state)
+    assert all(live[first.id][u["id"]][0] == u["price"] for u in payload)
+    for p in products:
+        assert {v.id: (v.price, v.is_enabled) for v in p.variants} == live[p.id]
+    assert app.resume_job(journal.job_id)[1] == []
+
+def test_snapshot_detail_lists_prices(printify):
+    state, app = printify
+    client = app.app.test_client()
+    known = snapshot_ids()
+    client.post("/api/price_apply", json={"shop": SHOP, "mode": "retail", "value": 30})
+    (snapshot_id,) = snapshot_ids() - known
+    body = client.get(f"/api/snapshots/{snapshot_id}").get_json()
+    assert body["source"] == "price_apply"
+    assert body["variants"] == sum(len(rows) for rows in body["prices"].values())
+    assert client.get("/api/snapshots/nope").status_code == 404
+
+def test_result_flashes_escape_titles_and_errors(printify):
+    state, app = printify
+    client = app.app.test_client()
+    pid = next(iter(state.products[SHOP]))
+    state.products[SHOP][pid]["title"] = "<img src=x onerror=alert(1)>"
+    client.get(f"/?shop={SHOP}")
+    client.post("/bulk_edit", data={"product_ids": f"{SHOP}:{pid}", "percent_val": "40"})
+    page = client.get(f"/?shop={SHOP}").get_data(as_text=True)
+    assert "<img src=x" not in page
+    assert "&lt;img src=x onerror=alert(1)&gt;" in page
+    assert "<b>Updated 1 product(s)" in page  # the summary's own markup is kept
+
+    failed = {"status": "failed", "error": {"message": "<script>alert(1)</script>"}}
+    summary = app.bulk_edit_summary("Margin", [(SHOP, "p")], {(SHOP, "p"): failed}, {}, "job")
+    assert "<script>" not in summary and "&lt;script&gt;" in summary
+
+    # plain-text errors are escaped by the template now that it has no |safe
+    with client.session_transaction() as session:
+        session["_flashes"] = [("error", "<b>nope</b>")]
+    assert "&lt;b&gt;nope&lt;/b&gt;" in client.get(f"/?shop={SHOP}").get_data(as_text=True)
@@ -0,0 +1,35 @@
+# test_rules.py
+
+"""Rule set compilation: which rule wins for a variant, and the specs that are refused."""
+
+import pytest
+
+from rules import RuleError, RuleSet
+
+def test_rule_set_later_rules_override_earlier_ones():
+    rules = RuleSet("spring", {"rules": [
+        {"margin": 40, "min_profit": 6, "charm": 0.99},
+        {"match": {"garment_type": "hoodie"}, "margin": 50},
+        {"match": {"size": ["2XL", "3XL"]}, "size_upcharge": {"2XL": 2, "3XL": 4}},
+        {"match": {"color": "White", "blueprint_id": 6}, "retail": 19.99},
+    ]})
+    tee = rules.plan("Tee", 5, "L", "Black")
+    assert tee.target == ("margin", 0.4) and tee.charm == 99 and tee.min_profit == 600
+    assert tee.price(1000, 0) == 1699  # 1667 at 40%, charm .99
+    assert tee.price(500, 0) == 1199   # 834 at 40%, floored to cost + $6, charm .99
+    assert rules.plan("Hoodie", 5, "L", "Black").target == ("margin", 0.5)
+    assert rules.plan("Tee", 5, "2XL", "Black").upcharge == 200
+    assert rules.plan("Tee", 6, "L", "white").price(1000, 0) == 1999
+    assert rules.plan("Tee", 5, "L", "Black") is tee  # resolved once per key
+
+@pytest.mark.parametrize("spec", [
+    {},
+    {"rules": []},
+    {"rules": [{"margin": 40, "retail": 20}]},
+    {"rules": [{"margin": 120}]},
+    {"rules": [{"match": {"shop": 1}, "margin": 40}]},
+    {"rules": [{"margn": 40}]},
+])
+def test_rule_set_rejects_bad_specs(spec):
+    with pytest.raises(RuleError):
+        RuleSet("bad", spec)
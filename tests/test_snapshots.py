@@ -0,0 +1,31 @@
+# test_snapshots.py
+
+"""Snapshot record and replay."""
+
+import pytest
+
+from snapshots import Snapshot
+
+def variant(vid, price=2000, cost=1000, enabled=True, visible=True):
+    return {"id": vid, "price": price, "cost": cost, "is_enabled": enabled, "is_visible": visible}
+
+def row(v, price):
+    return {"id": v["id"], "price": price, "is_enabled": v["is_enabled"], "is_visible": v["is_visible"]}
+
+def test_snapshot_keeps_the_first_price_and_replays(tmp_path):
+    snap = Snapshot.create("test", {"a": 1}, directory=str(tmp_path))
+    assert not list(tmp_path.iterdir())  # nothing recorded, no file
+    variants = [variant(1, 2000), variant(2, 2500)]
+    snap.record("1000:p", variants, [row(variants[0], 3000), dict(row(variants[1], 2500), is_enabled=False)], "t1")
+    variants[0]["price"] = 3000
+    snap.record("1000:p", variants, [row(variants[0], 3500)], "t2")
+    assert snap.prices == {"1000:p": {1: 2000, 2: 2500}}
+    assert snap.enabled == {"1000:p": {2: True}}
+
+    again = Snapshot.open(snap.snapshot_id, directory=str(tmp_path))
+    assert (again.source, again.params, again.prices, again.enabled) == ("test", {"a": 1}, snap.prices, snap.enabled)
+    assert again.updated_at == {"1000:p": "t1"}
+    resumed = Snapshot.create("other", snapshot_id=snap.snapshot_id, directory=str(tmp_path))
+    assert resumed.source == "test" and resumed.prices == snap.prices
+    with pytest.raises(KeyError):
+        Snapshot.open("missing", directory=str(tmp_path))
@@ -0,0 +1,176 @@
+# thumbnails.py
+
+"""
+Product card thumbnails: each Printify mockup is downloaded once, shrunk to
+the card size and kept in a bounded on-disk cache keyed by its URL, so the
+dashboard sends a few KB per card instead of the full-size mockup.
+
+Thumbnails are JPEGs on the card background when Pillow is installed
+(pip install Pillow); without it the original image is cached and served
+as is, which still saves the repeated downloads. Least recently used files
+are removed once the cache grows past PRINTIFY_THUMB_CACHE_MB. Concurrent
+requests for the same image share one download.
+
+Only images on PRINTIFY_IMAGE_HOSTS (Printify's image CDN by default) are
+fetched, and only responses that are images are kept, so the proxy cannot
+be pointed at other hosts.
+"""
+
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+
+from cache import DEFAULT_CACHE_DB
+from pipeline import SingleFlight
+
+try:
+    from PIL import Image
+except ImportError:  # optional; originals are cached instead
+    Image = None
+
+THUMB_DIR = os.environ.get("PRINTIFY_THUMB_DIR", os.path.join(os.path.dirname(DEFAULT_CACHE_DB), "thumbs"))
+THUMB_CACHE_BYTES = int(float(os.environ.get("PRINTIFY_THUMB_CACHE_MB", "200")) * 1024 * 1024)
+# Cards show images at 80px; twice that stays sharp on high-DPI screens
+THUMB_SIZE = 160
+# Mockup URLs are unique per image, so a thumbnail can be cached by browsers for a long time
+THUMB_MAX_AGE = 30 * 24 * 3600
+# Same as the card's img background in static/dashboard.css, for transparent mockups
+BACKGROUND = (0xF2, 0xF2, 0xF2)
+JPEG_QUALITY = 82
+TIMEOUT = 20
+# Hosts mockups may be fetched from, comma-separated
+IMAGE_HOSTS = tuple(h.strip().lower() for h in
+                    os.environ.get("PRINTIFY_IMAGE_HOSTS", "images.printify.com,images-api.printify.com").split(",")
+                    if h.strip())
+
+def allowed_image_url(url, hosts=IMAGE_HOSTS):
+    """True for an http(s) URL on one of `hosts` (a bare host, or host:port)."""
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        netloc = f"{host}:{parts.port}" if parts.port else host
+    except ValueError:
+        return False
+    return parts.scheme in ("http", "https") and "@" not in parts.netloc and bool(host) \
+        and (host in hosts or netloc in hosts)
+
+class Thumbnail:
+    __slots__ = ("key", "data", "mimetype")
+
+    def __init__(self, key, data, mimetype):
+        self.key = key
+        self.data = data
+        self.mimetype = mimetype
+
+def make_thumbnail(data, size=THUMB_SIZE):
+    """JPEG bytes of the image scaled to fit size x size, transparency flattened onto BACKGROUND."""
+    with Image.open(io.BytesIO(data)) as im:
+        im.draft("RGB", (size, size))  # JPEG sources decode at a reduced scale
+        im.thumbnail((size, size))
+        if im.mode in ("RGBA", "LA", "P"):
+            im = im.convert("RGBA")
+            flat = Image.new("RGB", im.size, BACKGROUND)
+            flat.paste(im, mask=im.getchannel("A"))
+            im = flat
+        elif im.mode != "RGB":
+            im = im.convert("RGB")
+        out = io.BytesIO()
+        im.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+class ThumbnailCache:
+    """Thumbnails on disk as <sha256 of url>.<ext>, evicted least recently used first."""
+
+    def __init__(self, directory=None, max_bytes=THUMB_CACHE_BYTES, size=THUMB_SIZE, request=requests.request):
+        self.directory = directory or THUMB_DIR
+        self.max_bytes = max_bytes
+        self.size = size
+        self.request = request
+        self.lock = threading.Lock()
+        self.flight = SingleFlight()
+        self.entries = OrderedDict()  # url key -> (file name, bytes), oldest use first
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        if os.path.isdir(self.directory):
+            files = []
+            for name in os.listdir(self.directory):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                if not name.startswith("."):  # skip half-written temp files
+                    files.append((st.st_mtime, name, st.st_size))
+            for _, name, size in sorted(files):
+                self.entries[os.path.splitext(name)[0]] = (name, size)
+                self.total += size
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def get(self, url):
+        """The Thumbnail of the image at `url`, downloading and shrinking it on first use."""
+        key = self.key(url)
+        with self.lock:
+            name = self.entries[key][0] if key in self.entries else None
+            if name is not None:
+                self.entries.move_to_end(key)
+        if name is not None:
+            try:
+                with open(os.path.join(self.directory, name), "rb") as fh:
+                    data = fh.read()
+                os.utime(os.path.join(self.directory, name))  # LRU order survives restarts
+                self.hits += 1
+                return Thumbnail(key, data, mimetypes.guess_type(name)[0] or "application/octet-stream")
+            except FileNotFoundError:  # evicted by another worker
+                with self.lock:
+                    self.total -= self.entries.pop(key, (None, 0))[1]
+        return self.flight.do(key, lambda: self._create(key, url))
+
+    def _create(self, key, url):
+        resp = self.request("GET", url, timeout=TIMEOUT)
+        resp.raise_for_status()
+        self.misses += 1
+        mimetype = (resp.headers.get("Content-Type") or "").split(";")[0].strip()
+        data = resp.content
+        if Image is not None:
+            try:
+                data, mimetype = make_thumbnail(data, self.size), "image/jpeg"
+            except Exception as e:
+                if mimetype.startswith("image/"):
+                    print(f"[WARN] Could not make a thumbnail of {url} ({e}); caching the original.")
+        if not mimetype.startswith("image/"):
+            raise ValueError(f"Not an image ({mimetype or 'no content type'})")
+        ext = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif"}.get(mimetype, ".img")
+        self._store(key, key + ext, data)
+        return Thumbnail(key, data, mimetype)
+
+    def _store(self, key, name, data):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, os.path.join(self.directory, name))
+        with self.lock:
+            self.total += len(data) - self.entries.pop(key, (None, 0))[1]
+            self.entries[key] = (name, len(data))
+            while self.total > self.max_bytes and len(self.entries) > 1:
+                _, (old, size) = self.entries.popitem(last=False)
+                self.total -= size
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self.lock:
+            return {"files": len(self.entries), "bytes": self.total, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "resized": Image is not None}
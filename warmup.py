@@ -0,0 +1,118 @@
+# warmup.py
+
+"""
+Startup warm-up with progress, so a fresh worker can tell a load balancer
+when it is worth sending users to.
+
+A warm-up is a plan of named steps run on a background thread, some of
+them concurrently. Each step records its state (pending, running, done,
+failed), how long it took and a short detail. The worker is ready once
+every required step is done; optional ones (nice-to-have caches) only
+show up as progress. A failed warm-up can be started again.
+"""
+
+import threading
+import time
+
+from pipeline import parallel_map
+
+class Step:
+    __slots__ = ("name", "required", "state", "started", "finished", "detail", "error")
+
+    def __init__(self, name, required=True):
+        self.name = name
+        self.required = required
+        self.state = "pending"
+        self.started = None
+        self.finished = None
+        self.detail = None
+        self.error = None
+
+    def to_dict(self):
+        end = self.finished or (time.time() if self.started else None)
+        return {"name": self.name, "state": self.state, "required": self.required,
+                "seconds": round(end - self.started, 3) if self.started else None,
+                "detail": self.detail, "error": self.error}
+
+class Warmup:
+    """One warm-up run; `plan(warmup)` declares and runs the steps with step() and concurrently()."""
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.lock = threading.Lock()
+        self.steps = {}
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.thread = None
+
+    def start(self):
+        self.started = time.time()
+        self.thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.plan(self)
+        except Exception as e:
+            self.error = str(e)
+            print(f"[WARN] Warm-up stopped: {e}")
+        self.finished = time.time()
+        if self.ready:
+            print(f"[INFO] Warm-up finished in {self.finished - self.started:.1f}s.")
+
+    def declare(self, name, required=True):
+        """Register a step up front so progress shows it as pending."""
+        with self.lock:
+            if name not in self.steps:
+                self.steps[name] = Step(name, required)
+            return self.steps[name]
+
+    def step(self, name, fn, required=True):
+        """Run fn() as step `name`; its return value is the result, its string form (if short) the detail."""
+        s = self.declare(name, required)
+        s.state, s.started = "running", time.time()
+        try:
+            result = fn()
+        except Exception as e:
+            s.state, s.error, s.finished = "failed", str(e), time.time()
+            if required:
+                raise
+            print(f"[WARN] Warm-up step {name} failed: {e}")
+            return None
+        s.state, s.finished = "done", time.time()
+        if isinstance(result, str):
+            s.detail = result
+        return result
+
+    def concurrently(self, steps, required=True):
+        """Run [(name, fn)] side by side; raises the first failure of a required step once all have ended."""
+        for name, _ in steps:
+            self.declare(name, required)
+        errors = [error for _, _, error in parallel_map(lambda item: self.step(item[0], item[1], required),
+                                                        steps, max_workers=len(steps) or 1)
+                  if error is not None]
+        if errors and required:
+            raise errors[0]
+
+    @property
+    def ready(self):
+        with self.lock:
+            steps = list(self.steps.values())
+        return self.finished is not None and self.error is None and \
+            all(s.state == "done" for s in steps if s.required)
+
+    def status(self):
+        with self.lock:
+            steps = [s.to_dict() for s in self.steps.values()]
+        return {
+            "ready": self.ready,
+            "started": self.started,
+            "finished": self.finished,
+            "elapsed": round((self.finished or time.time()) - self.started, 3) if self.started else None,
+            "done": sum(1 for s in steps if s["state"] == "done"),
+            "total": len(steps),
+            "error": self.error,
+            "steps": steps,
+        }